@@ -1,8 +1,9 @@
 import streamlit as st
 import os
+import sys
+import time
+import shutil
 import pandas as pd
-import subprocess
-import platform
 
 from PIL import Image
 
@@ -71,13 +72,18 @@ st.markdown(
 
 # Get the absolute path of the export folder
 current_dir = os.path.dirname(os.path.abspath(__file__))
-if platform.system() == 'Windows':
-    venv_python = os.path.join(current_dir, '.venv', 'Scripts', 'python') #path to venv python for Windows
-else:
-    venv_python = os.path.join(current_dir, '.venv', 'bin', 'python') #path to venv python for Linux/MacOS
 export_folder = os.path.join(current_dir, 'export')
 env_file_path = os.path.join(current_dir, '.env')
 
+# Export and convert functions run in-process, scripts folder holds the modules
+sys.path.insert(0, os.path.join(current_dir, 'scripts'))
+import fmc_export
+import fmc_ipindex
+import fmc_trace
+import fmc_jobs
+import fmc_progress
+import fmc_prewarm
+
 # Function to read environment variables from .env
 def read_env_variables():
     env_dict = {}
@@ -179,8 +185,7 @@ with st.sidebar:
                 password_updated = update_env_variable('FMC_PASSWORD', new_password)
                     
                 if username_updated and password_updated:
-                    result = subprocess.run([venv_python, 'scripts/get_token.py'], capture_output=True, text=True)
-                    if result.returncode == 1:
+                    if fmc_export.update_token():
                         st.success(f"Success: Token updated")
                     else:
                         st.error(f"Error: Check credentials and try again")
@@ -190,7 +195,7 @@ with st.sidebar:
             # Only show Log Out button if FMC_TOKEN is present and not empty
             if 'FMC_TOKEN' in env_vars and env_vars['FMC_TOKEN']:
                 if st.button("Log Out", icon=":material/logout:"):
-                    if clear_env_values(['FMC_TOKEN', 'FMC_USERNAME', 'FMC_PASSWORD']):
+                    if clear_env_values(['FMC_TOKEN', 'FMC_REFRESH_TOKEN', 'FMC_TOKEN_ISSUED', 'FMC_TOKEN_REFRESHES', 'FMC_USERNAME', 'FMC_PASSWORD']):
                         st.toast("Logged out successfully!")
                         st.rerun()
         
@@ -248,12 +253,26 @@ with col4:
     get_portobjectgroups_button = st.button(label="Get .csv", help="Export and convert PortObjectGroups to csv", key="get_portobjectgroups_csv", icon=":material/csv:")
         
 
+col1, col2, col3, col4 = st.columns([1, 1, 2, 1], vertical_alignment="center")
+with col1:
+    export_all_button = st.button(label="Export all", help="Export and convert all four object types at once into one timestamped snapshot", key="export_all_csv", icon=":material/folder_zip:")
+with col2:
+    export_policies_button = st.button(label="All policies", help="Export AccessRules of every policy in FMC_ACCESS_POLICY_IDS / FMC_DOMAIN_IDS ('all' to discover) into one combined csv", key="export_policies_csv", icon=":material/policy:")
+with col3:
+    delta_sync = st.toggle("Delta sync objects", help="NetworkGroups, Networks and PortObjectGroups: fetch full details only for new or changed objects, reuse the rest from the last export. Changes are detected by the metadata timestamps of the listing, without them every sync is a full fetch")
+    if delta_sync:
+        # Most FMC versions leave metadata out of the non-expanded listing, see fmc_state.py
+        st.caption("Only saves requests when the FMC listing has metadata timestamps, else every sync fetches everything")
+with col4:
+    output_format = st.selectbox("Format", list(fmc_export.fmc_formats.FORMATS), help="csv, zstd compressed parquet or feather (Arrow IPC) for fast reloads in analytics", key="output_format")
+
 with st.expander("get .json", icon=":material/unfold_more:"):
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
         export_accessrules_button = st.button(label="Export", help="Export AccessRules from FMC to JSON", key="get_accessrules", icon=":material/file_save:")
         convert_accessrules_button = st.button(label="Convert", help="Convert AccessRules JSON to CSV", key="convert_accessrules", icon=":material/csv:")
+        analyze_accessrules_button = st.button(label="Analyze", help="Find shadowed, redundant and overlapping rules in the AccessRules JSON (export Networks, NetworkGroups and PortObjectGroups JSON too to resolve objects)", key="analyze_accessrules", icon=":material/rule:")
         
     with col2:
         export_networkgroups_button = st.button(label="Export", help="Export NetworkGroups from FMC to JSON", key="get_networkgroups", icon=":material/file_save:")
@@ -267,152 +286,257 @@ with st.expander("get .json", icon=":material/unfold_more:"):
         export_portobjectgroups_button = st.button(label="Export", help="Export PortObjectGroups from FMC to JSON", key="get_portobjectgroups", icon=":material/file_save:")
         convert_portobjectgroups_button = st.button(label="Convert", help="Convert PortObjectGroups JSON to CSV", key="convert_portobjectgroups", icon=":material/csv:")
 
-# Run scripts on button press
+# Run exports on button press as background jobs, in-process (see scripts/fmc_export.py and scripts/fmc_jobs.py)
+# One runner is shared by every session, a rerun of this page never waits for or restarts an export
+@st.cache_resource
+def get_job_runner():
+    return fmc_jobs.JobRunner()
+
+job_runner = get_job_runner()
+
+# Optional scheduled exports of FMC_PREWARM_TYPES, started once per process (see scripts/fmc_prewarm.py)
+@st.cache_resource
+def get_prewarmer():
+    return fmc_prewarm.start(get_job_runner())
+
+prewarmer = get_prewarmer()
+
+# Jobs started in this session, and the ones whose result was already shown
+if 'job_ids' not in st.session_state:
+    st.session_state.job_ids = []
+    st.session_state.jobs_notified = set()
+
+# FMC the exports of this page go to, part of the key of identical requests
+fmc_target = (env_vars.get('FMC_HOST'), env_vars.get('FMC_DOMAIN_ID'), env_vars.get('FMC_ACCESS_POLICY_ID'))
+
+# Function to describe how long ago a time.time() value was
+def format_age(timestamp):
+    minutes = (time.time() - timestamp) / 60
+    if minutes < 1:
+        return "just now"
+    if minutes < 120:
+        return f"{minutes:.0f} min ago"
+    if minutes < 2880:
+        return f"{minutes / 60:.0f} h ago"
+    return f"{minutes / 1440:.0f} days ago"
+
+# Function to start a job for this session, a running or fresh job with the same key is shared instead
+def start_job(key, label, func, *args, max_age=0, **kwargs):
+    # FMC exports (max_age set) serve an older result right away while it is refreshed
+    stale_for = fmc_jobs.STALE_FOR if max_age else 0
+    job, how, served = job_runner.request(key, label, func, *args, max_age=max_age, stale_for=stale_for, **kwargs)
+    if job.id not in st.session_state.job_ids:
+        st.session_state.job_ids.append(job.id)
+    if how == 'started':
+        st.toast(f"{label} started")
+    elif how == 'revalidating':
+        st.toast(f"{label}: serving the result of {format_age(served.finished)} below, refreshing it in the background")
+    elif how == 'joined':
+        st.toast(f"{label} is already running, its result is shown here too")
+    else:
+        # Shown again in this session, the files were written by the earlier export
+        st.session_state.jobs_notified.discard(job.id)
+        st.toast(f"{label} finished {format_age(job.finished)}, reusing its result")
+
+# Function to start an export step of one object type, identical requests (step, type, format, FMC target) share one job
+def start_step(label, step, object_type, max_age=0, **kwargs):
+    key = fmc_export.request_key(step.__name__, object_type, kwargs.get('output_format'), env_vars)
+    start_job(key, label, run_step, step, object_type, max_age=max_age, **kwargs)
+
+# Function to run one export step as a job, its result line is shown when it is done
+def run_step(job, step, *args, **kwargs):
+    result = step(*args, **kwargs)
+    job.update(message=fmc_export.describe_result(result))
+    return result
+
+# Function to export all object types into one zipped snapshot
+def run_export_all(job, delta_sync, output_format):
+    # All four fetches run at the same time under one rate budget and connection pool
+    summary = fmc_export.export_all(delta_sync=delta_sync, output_format=output_format)
+    lines = [fmc_export.describe_result(result) for result in summary['results']]
+    fmc_export.zip_snapshot(summary['path'])
+    lines.append(f"Snapshot {os.path.basename(summary['path'])}.zip ready in {summary['seconds']:.1f} s")
+    job.update(message="\n".join(lines))
+    return summary
+
+# Function to export the access rules of all policies into one zipped snapshot
+def run_export_policies(job):
+    # Called for every finished policy, updates the progress of the job
+    def show_policy_progress(result, done, total):
+        job.update(done / total, f"{done}/{total} policies, last: {fmc_export.describe_result(result)}")
+
+    summary = fmc_export.export_policies(on_done=show_policy_progress)
+    if summary['error']:
+        job.update(message=summary['error'])
+        return summary
+    lines = [fmc_export.describe_result(result) for result in summary['results'] if not result['ok']]
+    fmc_export.zip_snapshot(summary['path'])
+    exported = sum(1 for result in summary['results'] if result['ok'])
+    lines.append(f"{exported} of {len(summary['results'])} policies exported to {os.path.basename(summary['path'])}.zip in {summary['seconds']:.1f} s")
+    job.update(message="\n".join(lines))
+    return summary
+
+# all object types
+if export_all_button:
+    start_job(('export_all', delta_sync, output_format) + fmc_target, "Export all", run_export_all, delta_sync, output_format, max_age=fmc_jobs.FRESH_FOR)
+
+# ---------------------
+
+# access rules of all policies
+if export_policies_button:
+    start_job(('export_policies', env_vars.get('FMC_DOMAIN_IDS'), env_vars.get('FMC_ACCESS_POLICY_IDS')) + fmc_target, "All policies", run_export_policies, max_age=fmc_jobs.FRESH_FOR)
+
+# ---------------------
+
 # accessrules
 if export_accessrules_button:
-    with st.spinner("Exporting AccessRules from FMC to JSON..."):
-        result = subprocess.run([venv_python, 'scripts/get_accessrules.py'], capture_output=True, text=True)        
-        st.toast(f'{result.stdout} ')
+    start_step("AccessRules to JSON", fmc_export.export_json, 'accessrules', max_age=fmc_jobs.FRESH_FOR)
 
 if convert_accessrules_button:
-    with st.spinner("Converting AccessRules JSON to CSV..."):
-        result = subprocess.run([venv_python, 'scripts/accessrules_to_csv.py'], capture_output=True, text=True)
-        if result.stderr:
-            st.toast(f"fmc_accessrules.json not found, run Export first")
-        else:      
-            st.toast(f'{result.stdout} ')
-            
+    start_step("AccessRules JSON to CSV", fmc_export.convert_json, 'accessrules', output_format=output_format)
+
+if analyze_accessrules_button:
+    start_job(('analyze_json',), "AccessRules analysis", run_step, fmc_export.analyze_json)
+
 # --- single button ---
 if get_accessrules_button:
-    with st.spinner("Exporting AccessRules from FMC to JSON..."):
-        export_result = subprocess.run([venv_python, 'scripts/get_accessrules.py'], capture_output=True, text=True)
-        st.toast(f'{export_result.stdout}')
-
-    if export_result.returncode == 0:  # Check if the export script ran successfully
-        with st.spinner("Converting AccessRules JSON to CSV..."):
-            convert_result = subprocess.run([venv_python, 'scripts/accessrules_to_csv.py'], capture_output=True, text=True)
-            if convert_result.stderr:
-                st.toast("fmc_accessrules.json not found, run Export first")
-            else:
-                st.toast(f'{convert_result.stdout}')
-                
-            # Delete the .json file after successful conversion
-            os.remove("export/fmc_accessrules.json")
-    else:
-        st.toast("Export failed, conversion skipped")
+    # Each page is converted to CSV as it arrives, no intermediate JSON file
+    start_step("AccessRules to CSV", fmc_export.export_csv, 'accessrules', output_format=output_format, max_age=fmc_jobs.FRESH_FOR)
 
-# --------------------- 
+# ---------------------
 
-# networkGroups
-if get_networkgroups_button:
-    with st.spinner("Exporting NetworkGroups from FMC to JSON..."):
-        export_result = subprocess.run([venv_python, 'scripts/get_networkgroups.py'], capture_output=True, text=True)
-        st.toast(f'{export_result.stdout}')
-
-    if export_result.returncode == 0:  # Check if the export script ran successfully
-        with st.spinner("Converting NetworkGroups JSON to CSV..."): 
-            convert_result = subprocess.run([venv_python, 'scripts/networkgroups_to_csv.py'], capture_output=True, text=True)
-            if convert_result.stderr:
-                st.toast("fmc_networkgroups.json not found, run Export first")
-            else:
-                st.toast(f'{convert_result.stdout}')
-                
-                # Delete the .json file after successful conversion
-                os.remove("export/fmc_networkgroups.json")
-    else:
-        st.toast("Export failed, conversion skipped")
+# networkgroups
+if export_networkgroups_button:
+    start_step("NetworkGroups to JSON", fmc_export.export_json, 'networkgroups', max_age=fmc_jobs.FRESH_FOR)
+
+if convert_networkgroups_button:
+    start_step("NetworkGroups JSON to CSV", fmc_export.convert_json, 'networkgroups', output_format=output_format)
 
 # --- single button ---
 if get_networkgroups_button:
-    with st.spinner("Exporting NetworkGroups from FMC to JSON..."):
-        export_result = subprocess.run([venv_python, 'scripts/get_networkgroups.py'], capture_output=True, text=True)
-        st.toast(f'{export_result.stdout}')
-
-    if export_result.returncode == 0:  # Check if the export script ran successfully
-        with st.spinner("Converting NetworkGroups JSON to CSV..."): 
-            convert_result = subprocess.run([venv_python, 'scripts/networkgroups_to_csv.py'], capture_output=True, text=True)
-            if convert_result.stderr:
-                st.toast("fmc_networkgroups.json not found, run Export first")
-            else:
-                st.toast(f'{convert_result.stdout}')
-                
-            # Delete the .json file after successful conversion
-            os.remove("export/fmc_networkgroups.json")
-                
-    else:
-        st.toast("Export failed, conversion skipped")
-        
+    # Delta sync fetches only new or changed objects, else each page is converted to CSV as it arrives
+    start_step("NetworkGroups to CSV", fmc_export.sync_csv if delta_sync else fmc_export.export_csv, 'networkgroups', output_format=output_format, max_age=fmc_jobs.FRESH_FOR)
+
 # ---------------------
 
 # networks
 if export_networks_button:
-    with st.spinner("Exporting Networks from FMC to JSON..."):
-        result = subprocess.run([venv_python, 'scripts/get_networks.py'], capture_output=True, text=True)        
-        st.toast(f'{result.stdout} ')
-    
+    start_step("Networks to JSON", fmc_export.export_json, 'networks', max_age=fmc_jobs.FRESH_FOR)
+
 if convert_networks_button:
-    with st.spinner("Converting Networks JSON to CSV..."):
-        result = subprocess.run([venv_python, 'scripts/networks_to_csv.py'], capture_output=True, text=True)        
-        if result.stderr:
-            st.toast(f"networks.json not found, run Export first")
-        else:      
-            st.toast(f'{result.stdout} ')
+    start_step("Networks JSON to CSV", fmc_export.convert_json, 'networks', output_format=output_format)
 
 # --- single button ---
 if get_networks_button:
-    with st.spinner("Exporting Networks from FMC to JSON..."):
-        export_result = subprocess.run([venv_python, 'scripts/get_networks.py'], capture_output=True, text=True)
-        st.toast(f'{export_result.stdout}')
-
-    if export_result.returncode == 0:  # Check if the export script ran successfully
-        with st.spinner("Converting Networks JSON to CSV..."):
-            convert_result = subprocess.run([venv_python, 'scripts/networks_to_csv.py'], capture_output=True, text=True)
-            if convert_result.stderr:
-                st.toast("fmc_networks.json not found, run Export first")
-            else:
-                st.toast(f'{convert_result.stdout}')
-            
-            # Delete the .json file after successful conversion
-            os.remove("export/fmc_networks.json")
-                              
-    else:
-        st.toast("Export failed, conversion skipped")
+    # Delta sync fetches only new or changed objects, else each page is converted to CSV as it arrives
+    start_step("Networks to CSV", fmc_export.sync_csv if delta_sync else fmc_export.export_csv, 'networks', output_format=output_format, max_age=fmc_jobs.FRESH_FOR)
+
 # ---------------------
-            
+
 # portobjectgroups
 if export_portobjectgroups_button:
-    with st.spinner("Exporting PortObjectGroups from FMC to JSON..."):
-        result = subprocess.run([venv_python, 'scripts/get_portobjectgroups.py'], capture_output=True, text=True)        
-        st.toast(f'{result.stdout} ')
-        
+    start_step("PortObjectGroups to JSON", fmc_export.export_json, 'portobjectgroups', max_age=fmc_jobs.FRESH_FOR)
+
 if convert_portobjectgroups_button:
-    with st.spinner("Converting PortObjectGroups JSON to CSV..."):
-        result = subprocess.run([venv_python, 'scripts/portobjectgroups_to_csv.py'], capture_output=True, text=True)        
-        if result.stderr:
-            st.toast(f"portobjectgroups.json not found, run Export first")
-        else:      
-            st.toast(f'{result.stdout} ')
+    start_step("PortObjectGroups JSON to CSV", fmc_export.convert_json, 'portobjectgroups', output_format=output_format)
 
 # --- single button ---
 if get_portobjectgroups_button:
-    with st.spinner("Exporting PortObjectGroups from FMC to JSON..."):
-        export_result = subprocess.run([venv_python, 'scripts/get_portobjectgroups.py'], capture_output=True, text=True)
-        st.toast(f'{export_result.stdout}')
-
-    if export_result.returncode == 0:  # Check if the export script ran successfully
-        with st.spinner("Converting PortObjectGroups JSON to CSV..."):
-            convert_result = subprocess.run([venv_python, 'scripts/portobjectgroups_to_csv.py'], capture_output=True, text=True)
-            if convert_result.stderr:
-                st.toast("fmc_portobjectgroups.json not found, run Export first")
+    # Delta sync fetches only new or changed objects, else each page is converted to CSV as it arrives
+    start_step("PortObjectGroups to CSV", fmc_export.sync_csv if delta_sync else fmc_export.export_csv, 'portobjectgroups', output_format=output_format, max_age=fmc_jobs.FRESH_FOR)
+
+# ---------------------
+
+# Age of the pre-warmed exports, a click serves them and refreshes them in the background
+if prewarmer is not None:
+    refreshed = ", ".join(f"{object_type} {format_age(finished) if finished else 'pending'}" for object_type, finished in prewarmer.refreshed().items())
+    st.caption(f"Pre-warmed every {prewarmer.interval / 60:.0f} min: {refreshed}"
+               + (f" | {prewarmer.error}" if prewarmer.error else f" | next run in {max(0, prewarmer.next_run - time.time()) / 60:.0f} min"))
+
+# Results of the jobs of this session that finished since the last run
+session_jobs = job_runner.jobs(st.session_state.job_ids)
+for job in session_jobs:
+    if job['status'] not in fmc_jobs.ACTIVE and job['id'] not in st.session_state.jobs_notified:
+        st.session_state.jobs_notified.add(job['id'])
+        for line in job['message'].splitlines():
+            st.toast(line)
+
+# Function to show the jobs of this session with live progress, polled every second while one of them runs
+def show_jobs():
+    jobs = job_runner.jobs(st.session_state.job_ids)
+    if any(job['status'] not in fmc_jobs.ACTIVE and job['id'] not in st.session_state.jobs_notified for job in jobs):
+        st.rerun()  # Whole page: show the result and refresh the exported files
+    if jobs:
+        with st.expander("Jobs", expanded=any(job['status'] in fmc_jobs.ACTIVE for job in jobs), icon=":material/work_history:"):
+            # Running jobs: pages out of paging.count, throughput, bytes, rate limit waits and ETA from the fetch layer
+            for job in jobs:
+                if job['status'] in fmc_jobs.ACTIVE:
+                    details = [fmc_progress.format_event(job['event']) if job['event'] else job['status']]
+                    if job['message']:
+                        details.append(job['message'].splitlines()[-1])
+                    st.progress(job['progress'] or 0.0, text=f"**{job['label']}**: {' | '.join(details)}")
+            rows = [{
+                'Job': job['label'],
+                'Status': job['status'],
+                'Progress': job['progress'],
+                'Time (s)': job['seconds'],
+                'Requests': job['requests'],
+                'Result': job['message'].splitlines()[-1] if job['message'] else '',
+                'Fetch': fmc_progress.format_event(job['event']) if job['event'] else ''
+            } for job in jobs]
+            st.dataframe(pd.DataFrame(rows), hide_index=True, column_config={
+                "Progress": st.column_config.ProgressColumn("Progress", min_value=0.0, max_value=1.0),
+            })
+    others = job_runner.active_count() - sum(1 for job in jobs if job['status'] in fmc_jobs.ACTIVE)
+    if others > 0:
+        st.caption(f"{others} export(s) of other users running")
+
+st.fragment(run_every=1 if any(job['status'] in fmc_jobs.ACTIVE for job in session_jobs) else None)(show_jobs)()
+
+# ---------------------
+
+# IP lookup over the exported networks and network groups
+with st.expander("IP lookup", icon=":material/search:"):
+    col1, col2 = st.columns([3, 1], vertical_alignment="bottom")
+    with col1:
+        ip_query = st.text_input("IP, CIDR or range", placeholder="10.1.2.3, 10.0.0.0/16 or 10.0.0.1-10.0.0.50", key="ip_query")
+    with col2:
+        ip_overlaps = st.toggle("Overlaps", help="List objects sharing any address with the query, not only the ones containing all of it", key="ip_overlaps")
+    if ip_query:
+        try:
+            # Saved next to the export, rebuilt only when fmc_networks.csv or fmc_networkgroups.csv changed
+            ip_index = fmc_ipindex.get_index(export_folder)
+            if ip_index is None:
+                st.info("Export Networks or NetworkGroups to csv first")
             else:
-                st.toast(f'{convert_result.stdout}')
-                
-            # Delete the .json file after successful conversion
-            os.remove("export/fmc_portobjectgroups.json")
-                
+                matches = fmc_ipindex.lookup(ip_index, ip_query, ip_overlaps)
+                if matches:
+                    st.dataframe(pd.DataFrame(matches), hide_index=True)
+                else:
+                    st.info(f"No object {'overlaps' if ip_overlaps else 'contains'} {ip_query}")
+        except ValueError as e:
+            st.error(str(e))
+
+# ---------------------
+
+# Phase breakdown of the latest export, every export writes a trace next to its file
+with st.expander("Last run timing", icon=":material/timer:"):
+    trace_file = fmc_trace.latest_trace(export_folder)
+    if trace_file is None:
+        st.info("No trace yet, run an export first")
     else:
-        st.toast("Export failed, conversion skipped")
-        
+        try:
+            trace = fmc_trace.load_trace(trace_file)
+            trace_info = trace.get('otherData', {})
+            st.caption(f"{trace_info.get('name')}, started {trace_info.get('started')}, {trace_info.get('seconds')} s ({os.path.relpath(trace_file, export_folder)})")
+            st.dataframe(pd.DataFrame(fmc_trace.summarize(trace)), hide_index=True)
+            st.caption("Busy adds up every span of a phase, Wall counts the time any of them ran (pages are fetched in parallel)")
+            with open(trace_file, 'rb') as file:
+                st.download_button(label="Download trace", data=file.read(), file_name=os.path.basename(trace_file), mime="application/json",
+                                   help="Open in chrome://tracing or ui.perfetto.dev for the per page timeline", key="download_trace", icon=":material/download:")
+        except (OSError, ValueError, KeyError) as e:
+            st.error(f"Failed to read {os.path.basename(trace_file)}: {e}")
+
 # ---------------------
 
 # Show export folder
@@ -422,12 +546,25 @@ st.divider()
 if 'delete_clicked' not in st.session_state:
     st.session_state.delete_clicked = False
 
+# Download type of the exported files, anything else is sent as binary
+mime_types = {
+    '.csv': 'text/csv',
+    '.json': 'application/json',
+    '.zip': 'application/zip',
+    '.parquet': 'application/vnd.apache.parquet',
+    '.feather': 'application/vnd.apache.arrow.file',
+}
+
 def delete_all_files():
     try:
         files = [f for f in os.listdir(export_folder) if os.path.isfile(os.path.join(export_folder, f))]
         for file in files:
             file_path = os.path.join(export_folder, file)
             os.remove(file_path)
+        # Snapshot folders of "Export all" and "All policies", the delta sync store is kept
+        snapshots = [f for f in os.listdir(export_folder) if f.startswith(('snapshot_', 'policies_')) and os.path.isdir(os.path.join(export_folder, f))]
+        for snapshot in snapshots:
+            shutil.rmtree(os.path.join(export_folder, snapshot))
         st.success("All files have been deleted successfully!")
         st.session_state.delete_clicked = False
         st.rerun()
@@ -468,19 +605,22 @@ try:
                 if os.path.isfile(full_path):
                     size = f"{os.path.getsize(full_path) / 1024:.2f} KB"
                     
-                    col1, col2, col3 = st.columns([2, 1, 1])
+                    col1, col2, col3, col4 = st.columns([2, 1, 1, 1])
                     with col1:
                         st.text(item)
                     with col2:
                         st.text(size)
                     with col3:
+                        # Age of the data, served files stay until their refresh replaces them
+                        st.text(format_age(os.path.getmtime(full_path)))
+                    with col4:
                         try:
                             with open(full_path, "rb") as f:
                                 st.download_button(
                                     label="Download",
                                     data=f,
                                     file_name=item,
-                                    mime="application/octet-stream"
+                                    mime=mime_types.get(os.path.splitext(item)[1], "application/octet-stream")
                                 )
                         except Exception as e:
                             st.error(f"Error creating download button: {str(e)}")
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark of the access rule conversion: per rule extraction vs columnar
+
+Generates synthetic access rules with generate_fmc_data.py, converts them
+with extract_rows() (the per rule Python path) and with extract_frame()
+(the columnar Arrow path), checks that both CSV outputs are byte-identical
+and prints the timings.
+
+Args:
+    --rules (int): number of synthetic rules, default 50000
+    --repeat (int): runs per path, the best one is reported, default 3
+
+Usage:
+    python benchmarks/bench_accessrules_to_csv.py --rules 50000
+"""
+
+__author__ = "Sasa Kovacic"
+__email__ = "sasa.kovacic@storm.hr"
+__version__ = "1.0"
+
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import filecmp
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+import accessrules_to_csv
+from generate_fmc_data import generate_accessrules
+
+
+# Function to time a conversion path, returns the best (extraction, total) wall times in seconds
+def time_path(build, items, csv_file, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        df = build(items)
+        extracted = time.perf_counter()
+        df.to_csv(csv_file, index=False)
+        timing = (extracted - started, time.perf_counter() - started)
+        best = timing if best is None or timing[1] < best[1] else best
+    return best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rules", type=int, default=50000, help="Number of synthetic rules")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per path, the best one is reported")
+    args = parser.parse_args()
+
+    items = generate_accessrules(args.rules)
+    with tempfile.TemporaryDirectory() as folder:
+        rows_csv = os.path.join(folder, 'rows.csv')
+        columnar_csv = os.path.join(folder, 'columnar.csv')
+
+        rows_time = time_path(lambda rules: pd.DataFrame(accessrules_to_csv.extract_rows(rules), columns=accessrules_to_csv.COLUMNS), items, rows_csv, args.repeat)
+        columnar_time = time_path(accessrules_to_csv.extract_frame, items, columnar_csv, args.repeat)
+        identical = filecmp.cmp(rows_csv, columnar_csv, shallow=False)
+
+    # to_csv is the same for both paths, extraction is where they differ
+    print(f"Rules:            {args.rules}")
+    print(f"Per rule path:    extract {rows_time[0]:.3f} s, total {rows_time[1]:.3f} s ({args.rules / rows_time[1]:,.0f} rules/s)")
+    print(f"Columnar path:    extract {columnar_time[0]:.3f} s, total {columnar_time[1]:.3f} s ({args.rules / columnar_time[1]:,.0f} rules/s)")
+    print(f"Speedup:          extract {rows_time[0] / columnar_time[0]:.2f}x, total {rows_time[1] / columnar_time[1]:.2f}x")
+    print(f"Byte-identical:   {identical}")
+    sys.exit(0 if identical else 1)
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+
+"""
+Checks that an interrupted export resumes from its page checkpoints
+
+Runs against mock_fmc.py in this process (plain HTTP, no latency):
+    1. an export whose request for one offset fails with a connection error,
+       the fetched pages must stay in the checkpoint
+    2. the same export while another run holds the checkpoint: it must
+       succeed without touching the pages of that run
+    3. the same export again: it must succeed, request only the pages that
+       are not on disk (plus the first page) and remove the checkpoint
+    4. a clean export into another folder: both CSV files must be equal
+    5. an interrupted export resumed by a run that fails with an unexpected
+       error (not a FetchError): the checkpoint must be discarded
+
+Prints one line per check and exits with 1 when any of them failed.
+
+Args:
+    --count (int): access rules served, default 20000
+    --fail-offset (int): offset whose request fails in the first run, default 12000
+
+Usage:
+    python benchmarks/check_resume.py
+"""
+
+__author__ = "Sasa Kovacic"
+__email__ = "sasa.kovacic@storm.hr"
+__version__ = "1.0"
+
+
+import os
+import sys
+import shutil
+import argparse
+import tempfile
+
+# No rate limit against the local server, set before fmc_client is imported
+os.environ['FMC_RATE_LIMIT'] = '1000000'
+os.environ['FMC_RATE_BURST'] = '1000'
+
+import requests
+import mock_fmc
+import generate_fmc_data
+import run_benchmarks
+
+sys.path.insert(0, run_benchmarks.scripts_folder)
+import fmc_export
+import fmc_client
+import fmc_checkpoint
+
+
+# Function to count the requests the mock server answered so far
+def served_requests(host):
+    return requests.get(f"http://{host}/mock/stats").json()['requests']
+
+
+# Function to run one check, returns True when it passed
+def check(name, passed, detail=''):
+    print(f"{'ok  ' if passed else 'FAIL'} {name}{f' ({detail})' if detail else ''}")
+    return passed
+
+
+# Function to wrap fmc_client.get so the request of one offset fails like a dropped WAN link (or with error)
+def failing_get(get, fail_offset, error=requests.ConnectionError("connection reset by peer")):
+    def run(url, **kwargs):
+        if f"offset={fail_offset}&" in url:
+            raise error
+        return get(url, **kwargs)
+    return run
+
+
+# Function to list the stored pages with their modification times
+def checkpoint_pages(checkpoint_folder):
+    return {os.path.join(root, name): os.path.getmtime(os.path.join(root, name))
+            for root, _, names in os.walk(checkpoint_folder) for name in names if name.startswith('page_')}
+
+
+def run_checks(count, fail_offset):
+    server = mock_fmc.start_server(run_benchmarks.served_data('accessrules', generate_fmc_data.generate('accessrules', count)),
+                                   {'static_token': run_benchmarks.TOKEN})
+    host = f"127.0.0.1:{server.server_address[1]}"
+    work_folder = tempfile.mkdtemp(prefix='fmc_resume_')
+    fmc_export.protocol = 'http'
+    fmc_export.checkpoint_folder = os.path.join(work_folder, 'checkpoints')
+    settings = {'FMC_HOST': host, 'FMC_DOMAIN_ID': generate_fmc_data.DOMAIN_ID,
+                'FMC_ACCESS_POLICY_ID': generate_fmc_data.POLICY_ID, 'FMC_TOKEN': run_benchmarks.TOKEN}
+    resumed_folder = os.path.join(work_folder, 'resumed')
+    clean_folder = os.path.join(work_folder, 'clean')
+    os.makedirs(resumed_folder)
+    os.makedirs(clean_folder)
+    results = []
+    get = fmc_client.get
+    try:
+        # 1. Interrupted run
+        fmc_client.get = failing_get(get, fail_offset)
+        try:
+            result = fmc_export.export_csv('accessrules', settings, resumed_folder)
+        finally:
+            fmc_client.get = get
+        results.append(check("interrupted export fails", not result['ok'], result['error'] and result['error'].splitlines()[0]))
+        checkpoints = checkpoint_pages(fmc_export.checkpoint_folder)
+        results.append(check("fetched pages are checkpointed", len(checkpoints) > 0, f"{len(checkpoints)} pages"))
+
+        # 2. Concurrent run of the same list URL
+        path = fmc_checkpoint.checkpoint_path(fmc_export.checkpoint_folder, fmc_export.object_url('accessrules', settings))
+        fmc_checkpoint.acquire(path)
+        try:
+            result = fmc_export.export_csv('accessrules', settings, clean_folder)
+        finally:
+            fmc_checkpoint.release(path)
+        results.append(check("concurrent export succeeds", result['ok'] and result['rows'] == count, f"{result['rows']} rows, {result['error']}"))
+        results.append(check("concurrent export leaves the checkpoint alone", checkpoint_pages(fmc_export.checkpoint_folder) == checkpoints))
+
+        # 3. Resumed run
+        before = served_requests(host)
+        result = fmc_export.export_csv('accessrules', settings, resumed_folder)
+        requested = served_requests(host) - before - 1  # The stats request itself is counted too
+        results.append(check("resumed export succeeds", result['ok'] and result['rows'] == count, f"{result['rows']} rows, {result['error']}"))
+        results.append(check("only missing pages are fetched", requested <= len(range(0, count, 1000)) - len(checkpoints),
+                             f"{requested} requests, {len(checkpoints)} pages from disk"))
+        leftover = [name for _, _, names in os.walk(fmc_export.checkpoint_folder) for name in names]
+        results.append(check("checkpoint is removed", not leftover, f"{len(leftover)} files left"))
+
+        # 4. Same file as an uninterrupted export
+        fmc_export.export_csv('accessrules', settings, clean_folder)
+        with open(fmc_export.csv_path('accessrules', resumed_folder), 'rb') as resumed, open(fmc_export.csv_path('accessrules', clean_folder), 'rb') as clean:
+            results.append(check("resumed CSV equals a clean export", resumed.read() == clean.read()))
+
+        # 5. Unexpected error while resuming
+        fmc_client.get = failing_get(get, fail_offset)
+        try:
+            fmc_export.export_csv('accessrules', settings, resumed_folder)
+            fmc_client.get = failing_get(get, fail_offset, RuntimeError("unexpected"))
+            try:
+                fmc_export.export_csv('accessrules', settings, resumed_folder)
+                error = None
+            except RuntimeError as e:
+                error = e
+        finally:
+            fmc_client.get = get
+        leftover = [name for _, _, names in os.walk(fmc_export.checkpoint_folder) for name in names]
+        results.append(check("unexpected error discards the checkpoint", error is not None and not leftover, f"{len(leftover)} files left"))
+    finally:
+        server.shutdown()
+        shutil.rmtree(work_folder, ignore_errors=True)
+    return all(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=20000, help="Access rules served")
+    parser.add_argument("--fail-offset", type=int, default=12000, help="Offset whose request fails in the first run")
+    args = parser.parse_args()
+    sys.exit(0 if run_checks(args.count, args.fail_offset) else 1)
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+
+"""
+Synthetic FMC dataset generator
+
+Generates networks, network groups, port object groups and access rules in
+the JSON shape of the FMC REST API (expanded=True), with metadata, links
+and the mix seen in real policies:
+    networks: IPv4 and IPv6 CIDRs and hosts, overridable flags, descriptions
+    networkgroups: network objects, literals and nested groups (only groups
+                   with a lower number are nested, so there are no cycles)
+    portobjectgroups: TCP, UDP, ICMPv4 and ICMPv6 port objects
+    accessrules: zones, network and port objects and literals of mixed
+                 protocols, comment histories with several entries
+
+Every object type can be generated on its own: references between types are
+derived from the object number (net-42 is always the 43rd network), so a
+rule refers to objects that exist as long as the referenced exports were
+generated with at least as many objects. The same seed and count always
+give the same data.
+
+Args:
+    --count (int): objects per object type, default 10000
+    --types (str): comma separated object types, default all
+    --seed (int): random seed, default 1
+    --output (str): folder for the fmc_<object type>.json files, default export
+
+Usage:
+    python benchmarks/generate_fmc_data.py --count 100000 --output /tmp/fmc
+
+Used by:
+    run_benchmarks.py, bench_accessrules_to_csv.py
+"""
+
+__author__ = "Sasa Kovacic"
+__email__ = "sasa.kovacic@storm.hr"
+__version__ = "1.0"
+
+
+import os
+import json
+import random
+import argparse
+
+OBJECT_TYPES = ('networks', 'networkgroups', 'portobjectgroups', 'accessrules')
+
+DOMAIN_ID = 'e276abec-e0f2-11e3-8169-6d9ed49b625f'
+POLICY_ID = '005056B6-DCA2-0ed3-0000-000268434433'
+BASE_URL = f"https://fmc/api/fmc_config/v1/domain/{DOMAIN_ID}"
+
+ZONES = 40          # Security zones used by the rules
+PORT_OBJECTS = 500  # Protocol port objects used by the groups and rules
+ACTIONS = ['ALLOW', 'BLOCK', 'TRUST', 'MONITOR', 'BLOCK_RESET']
+COMMON_PORTS = ['22', '25', '53', '80', '123', '443', '445', '1433', '3389', '8080', '8443', '1024-65535']
+USERS = ['admin', 'netops', 'secops', 'api-user']
+
+
+# Function to build the FMC style id of object number index
+def object_id(object_type, index):
+    prefix = {'networks': '0001', 'networkgroups': '0002', 'portobjectgroups': '0003', 'accessrules': '0004'}[object_type]
+    return f"005056B6-DCA2-0ed3-{prefix}-{index:012d}"
+
+
+def _metadata(rng, **extra):
+    metadata = {
+        'timestamp': 1700000000000 + rng.randint(0, 10 ** 10),
+        'lastUser': {'name': rng.choice(USERS)},
+        'domain': {'name': 'Global', 'id': DOMAIN_ID, 'type': 'Domain'}
+    }
+    metadata.update(extra)
+    return metadata
+
+
+def _network_value(rng, index):
+    if index % 20 == 7:
+        return f"2001:db8:{index % 65536:x}:{rng.randint(0, 65535):x}::/64"
+    if index % 5 == 3:
+        return f"10.{index // 65536 % 256}.{index // 256 % 256}.{index % 256}"  # Host address
+    return f"10.{index // 65536 % 256}.{index // 256 % 256}.0/{rng.choice([16, 20, 22, 24, 24, 24, 28])}"
+
+
+def network_ref(index):
+    return {'type': 'Network', 'id': object_id('networks', index), 'name': f"net-{index}"}
+
+
+def networkgroup_ref(index):
+    return {'type': 'NetworkGroup', 'id': object_id('networkgroups', index), 'name': f"netgroup-{index}"}
+
+
+# Function to describe port object number index: (name, protocol, port)
+def port_object(index):
+    protocol = ['TCP', 'TCP', 'UDP', 'ICMP', 'ICMPV6'][index % 5]
+    if protocol.startswith('ICMP'):
+        return f"icmp-{index}", protocol, ''
+    return f"{protocol.lower()}-{index}", protocol, COMMON_PORTS[index % len(COMMON_PORTS)]
+
+
+def port_ref(index):
+    name, protocol, port = port_object(index)
+    ref = {'id': f"005056B6-DCA2-0ed3-0005-{index:012d}", 'name': name, 'protocol': protocol}
+    if protocol.startswith('ICMP'):
+        ref.update({'type': 'ICMPV4Object' if protocol == 'ICMP' else 'ICMPV6Object', 'icmpType': 'Any'})
+    else:
+        ref.update({'type': 'ProtocolPortObject', 'port': port})
+    return ref
+
+
+# Function to generate network objects
+def generate_networks(count, seed=1):
+    rng = random.Random(seed)
+    items = []
+    for index in range(count):
+        items.append({
+            'id': object_id('networks', index),
+            'name': f"net-{index}",
+            'type': 'Network',
+            'value': _network_value(rng, index),
+            'overridable': rng.random() < 0.1,
+            'description': rng.choice(['', '', ' ', f"Server segment {index}", f"Imported from ASA, ticket {rng.randint(1000, 9999)}"]),
+            'links': {'self': f"{BASE_URL}/object/networks/{object_id('networks', index)}", 'parent': f"{BASE_URL}/object/networkaddresses"},
+            'metadata': _metadata(rng, readOnly={'state': False}, parentType='NetworkAddress')
+        })
+    return items
+
+
+# Function to generate network groups with objects, literals and nested groups
+def generate_networkgroups(count, seed=1, networks=None):
+    rng = random.Random(seed + 1)
+    networks = count if networks is None else networks
+    items = []
+    for index in range(count):
+        item = {
+            'id': object_id('networkgroups', index),
+            'name': f"netgroup-{index}",
+            'type': 'NetworkGroup',
+            'overridable': rng.random() < 0.05,
+            'description': rng.choice(['', ' ', f"Group {index}"]),
+            'links': {'self': f"{BASE_URL}/object/networkgroups/{object_id('networkgroups', index)}"},
+            'metadata': _metadata(rng, readOnly={'state': False})
+        }
+        objects = [network_ref(rng.randrange(networks)) for _ in range(rng.randint(1, 8))] if networks else []
+        if index and rng.random() < 0.3:
+            objects += [networkgroup_ref(rng.randrange(index)) for _ in range(rng.randint(1, 3))]
+        if objects:
+            item['objects'] = objects
+        if rng.random() < 0.3:
+            item['literals'] = [{'type': rng.choice(['Network', 'Host']), 'value': f"172.{rng.randint(16, 31)}.{rng.randint(0, 255)}.{rng.choice(['0/24', '1', '0/28'])}"}
+                                for _ in range(rng.randint(1, 4))]
+        items.append(item)
+    return items
+
+
+# Function to generate port object groups of mixed protocols
+def generate_portobjectgroups(count, seed=1):
+    rng = random.Random(seed + 2)
+    items = []
+    for index in range(count):
+        items.append({
+            'id': object_id('portobjectgroups', index),
+            'name': f"portgroup-{index}",
+            'type': 'PortObjectGroup',
+            'objects': [port_ref(rng.randrange(PORT_OBJECTS)) for _ in range(rng.randint(1, 10))],
+            'overridable': rng.random() < 0.05,
+            'description': rng.choice(['', ' ', f"Service group {index}"]),
+            'links': {'self': f"{BASE_URL}/object/portobjectgroups/{object_id('portobjectgroups', index)}"},
+            'metadata': _metadata(rng, readOnly={'state': False})
+        })
+    return items
+
+
+def _network_condition(rng, networks, networkgroups):
+    condition = {}
+    objects = []
+    for _ in range(rng.randint(0, 5)):
+        if networkgroups and rng.random() < 0.4:
+            objects.append(networkgroup_ref(rng.randrange(networkgroups)))
+        elif networks:
+            objects.append(network_ref(rng.randrange(networks)))
+    if objects:
+        condition['objects'] = objects
+    if rng.random() < 0.3:
+        condition['literals'] = [{'type': rng.choice(['Network', 'Host']), 'value': f"192.168.{rng.randint(0, 255)}.{rng.choice(['0/24', '10'])}"}
+                                 for _ in range(rng.randint(1, 3))]
+    return condition
+
+
+def _port_condition(rng, portobjectgroups):
+    condition = {}
+    objects = []
+    for _ in range(rng.randint(0, 3)):
+        if portobjectgroups and rng.random() < 0.3:
+            index = rng.randrange(portobjectgroups)
+            objects.append({'type': 'PortObjectGroup', 'id': object_id('portobjectgroups', index), 'name': f"portgroup-{index}"})
+        else:
+            objects.append(port_ref(rng.randrange(PORT_OBJECTS)))
+    if objects:
+        condition['objects'] = objects
+    if rng.random() < 0.4:
+        literals = []
+        for _ in range(rng.randint(1, 3)):
+            protocol = rng.choice(['6', '6', '17', '1', '58'])
+            if protocol in ('1', '58'):
+                literals.append({'type': 'ICMPv4PortLiteral' if protocol == '1' else 'ICMPv6PortLiteral', 'protocol': protocol, 'icmpType': rng.choice(['Any', '8', '0'])})
+            else:
+                literals.append({'type': 'PortLiteral', 'protocol': protocol, 'port': rng.choice(COMMON_PORTS)})
+        condition['literals'] = literals
+    return condition
+
+
+# Function to generate access rules that refer to the generated objects
+def generate_accessrules(count, seed=1, networks=None, networkgroups=None, portobjectgroups=None):
+    rng = random.Random(seed + 3)
+    networks = count if networks is None else networks
+    networkgroups = max(1, count // 10) if networkgroups is None else networkgroups
+    portobjectgroups = max(1, count // 50) if portobjectgroups is None else portobjectgroups
+    rules_url = f"{BASE_URL}/policy/accesspolicies/{POLICY_ID}/accessrules"
+    items = []
+    for index in range(count):
+        item = {
+            'id': object_id('accessrules', index),
+            'name': f"rule-{index}",
+            'type': 'AccessRule',
+            'action': rng.choice(ACTIONS),
+            'enabled': rng.random() < 0.95,
+            'sendEventsToFMC': rng.random() < 0.8,
+            'logBegin': False,
+            'logEnd': rng.random() < 0.7,
+            'logFiles': False,
+            'enableSyslog': False,
+            'vlanTags': {},
+            'variableSet': {'name': 'Default-Set', 'id': '76fa83ea-c972-11e2-8be8-8e45bb1343c0', 'type': 'VariableSet'},
+            'links': {'self': f"{rules_url}/{object_id('accessrules', index)}"},
+            'metadata': _metadata(rng, ruleIndex=index + 1, section=rng.choice(['Mandatory', 'Default']), category='--Undefined--',
+                                  accessPolicy={'name': 'Benchmark-Policy', 'id': POLICY_ID, 'type': 'AccessPolicy'})
+        }
+        for field in ('sourceZones', 'destinationZones'):
+            if rng.random() < 0.8:
+                item[field] = {'objects': [{'name': f"zone-{zone}", 'id': f"005056B6-DCA2-0ed3-0006-{zone:012d}", 'type': 'SecurityZone'}
+                                           for zone in rng.sample(range(ZONES), rng.randint(1, 3))]}
+        for field in ('sourceNetworks', 'destinationNetworks'):
+            condition = _network_condition(rng, networks, networkgroups)
+            if condition:
+                item[field] = condition
+        if rng.random() < 0.1:
+            item['sourcePorts'] = _port_condition(rng, portobjectgroups) or {'objects': [port_ref(0)]}
+        condition = _port_condition(rng, portobjectgroups)
+        if condition:
+            item['destinationPorts'] = condition
+        if rng.random() < 0.3:
+            item['commentHistoryList'] = [
+                {'user': {'name': rng.choice(USERS), 'type': 'User'}, 'date': f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T12:34:56.789Z",
+                 'comment': f"change {index}\nticket CHG{rng.randint(100000, 999999)}"}
+                for _ in range(rng.randint(1, 4))
+            ]
+        items.append(item)
+    return items
+
+
+# Function to generate one object type, references assume count objects of every other type
+def generate(object_type, count, seed=1):
+    if object_type == 'networks':
+        return generate_networks(count, seed)
+    if object_type == 'networkgroups':
+        return generate_networkgroups(count, seed, networks=count)
+    if object_type == 'portobjectgroups':
+        return generate_portobjectgroups(count, seed)
+    if object_type == 'accessrules':
+        return generate_accessrules(count, seed, networks=count, networkgroups=count, portobjectgroups=count)
+    raise ValueError(f"Unknown object type: {object_type}")
+
+
+# Function to write items the way fmc_export.save_json does
+def write_json(items, filename):
+    with open(filename, 'w') as file:
+        json.dump({"items": items}, file, indent=4)
+
+
+# Function to write fmc_<object type>.json of every object type into folder, returns the written files
+def write_dataset(folder, count, object_types=OBJECT_TYPES, seed=1):
+    os.makedirs(folder, exist_ok=True)
+    files = []
+    for object_type in object_types:
+        filename = os.path.join(folder, f"fmc_{object_type}.json")
+        write_json(generate(object_type, count, seed), filename)
+        files.append(filename)
+    return files
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=10000, help="Objects per object type")
+    parser.add_argument("--types", default=','.join(OBJECT_TYPES), help="Comma separated object types")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed")
+    parser.add_argument("--output", default="export", help="Folder for the JSON files")
+    args = parser.parse_args()
+
+    for filename in write_dataset(args.output, args.count, args.types.split(','), args.seed):
+        print(f"Data has been generated to {filename}")
@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+
+"""
+Local mock of the FMC REST API for offline and load testing
+
+Serves the endpoints the scripts use, with FMC semantics:
+    POST /api/fmc_platform/v1/auth/generatetoken (Basic auth, tokens in the response headers)
+    POST /api/fmc_platform/v1/auth/refreshtoken (X-auth-access-token + X-auth-refresh-token, 3 refreshes)
+    GET  /api/fmc_platform/v1/info/domain
+    GET  /api/fmc_config/v1/domain/{domain}/object/{networks|networkgroups|portobjectgroups}[/{id}]
+    GET  /api/fmc_config/v1/domain/{domain}/policy/accesspolicies[/{id}]
+    GET  /api/fmc_config/v1/domain/{domain}/policy/accesspolicies/{policy}/accessrules[/{id}]
+    GET  /mock/stats (counters of this server, no token needed)
+
+Lists page with offset/limit (default 25, at most 1000) and paging.count,
+expanded=false returns only id, name, type and links like FMC (plus
+metadata with --listing-metadata, as some FMC versions send). Every list
+and object request needs a valid X-auth-access-token, an unknown or expired
+one is answered with 401.
+
+Faults and limits for load testing:
+    --latency / --latency-per-item / --jitter: delay before each response
+    --bandwidth: response bytes per second, large pages take longer
+    --rate-limit: requests per minute before 429 (FMC: 120)
+    --max-concurrent: requests in flight before 429 (FMC: 10)
+    --burst-every / --burst-length: after every N requests the next M get 429
+    --token-lifetime: seconds until an access token expires (FMC: 1800)
+
+Data comes from the fmc_<object type>.json files in --data (a real or a
+generated export), object types without a file are generated with
+generate_fmc_data.py (--count objects each).
+
+Serves HTTPS with a self-signed certificate (made with openssl unless
+--certfile/--keyfile are given) so the scripts work unchanged with
+FMC_HOST=127.0.0.1:8443, or plain HTTP with --http.
+
+Usage:
+    python benchmarks/mock_fmc.py --count 100000 --latency 0.2 --rate-limit 120
+    python benchmarks/mock_fmc.py --data export --burst-every 50 --burst-length 5 --token-lifetime 60
+
+Used by:
+    run_benchmarks.py
+"""
+
+__author__ = "Sasa Kovacic"
+__email__ = "sasa.kovacic@storm.hr"
+__version__ = "1.0"
+
+
+import os
+import re
+import ssl
+import json
+import gzip
+import time
+import uuid
+import base64
+import random
+import argparse
+import tempfile
+import threading
+import subprocess
+from collections import deque
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import generate_fmc_data
+
+MAX_LIMIT = 1000      # FMC never returns more than 1000 items per page
+DEFAULT_LIMIT = 25    # Page size when the request has no limit
+MAX_REFRESHES = 3     # FMC lets a token be refreshed three times, then a new login is needed
+CHUNK_SIZE = 65536    # Bytes written at once when the bandwidth is limited
+
+# Simulation settings, every one can be changed with the command line option of the same name
+DEFAULTS = {
+    'latency': 0.0,           # Seconds before every response
+    'latency_per_item': 0.0,  # Extra seconds per item on the page
+    'jitter': 0.0,            # Random extra seconds, up to this much
+    'bandwidth': 0,           # Response bytes per second, 0 for unlimited
+    'rate_limit': 0,          # Requests per minute, 0 for unlimited
+    'retry_after': None,      # Retry-After sent with 429, FMC sends none
+    'max_concurrent': 0,      # Requests in flight, 0 for unlimited
+    'burst_every': 0,         # Requests between two bursts of 429, 0 for none
+    'burst_length': 0,        # Requests answered with 429 in a burst
+    'token_lifetime': 1800,   # Seconds until an access token expires
+    'gzip': True,             # Compress responses when the client accepts gzip
+    'username': 'admin',
+    'password': 'admin',
+    'static_token': None,     # Token accepted without login that never expires
+    'listing_metadata': False,  # expanded=false lists carry metadata (timestamp, lastUser) too
+}
+
+_OBJECT_PATH = re.compile(r'^/api/fmc_config/v1/domain/(?P<domain>[^/]+)/object/(?P<object_type>networks|networkgroups|portobjectgroups)(?:/(?P<object_id>[^/]+))?/?$')
+_POLICY_PATH = re.compile(r'^/api/fmc_config/v1/domain/(?P<domain>[^/]+)/policy/accesspolicies(?:/(?P<policy>[^/]+)(?P<rules>/accessrules(?:/(?P<object_id>[^/]+))?)?)?/?$')
+
+
+# Function to build the served data: {'domains': {domain id: {'name', object type: items, 'policies': {policy id: {'name', 'accessrules'}}}}}
+def load_data(folder=None, count=10000, seed=1):
+    domain = {'name': 'Global'}
+    for object_type in generate_fmc_data.OBJECT_TYPES:
+        filename = os.path.join(folder, f"fmc_{object_type}.json") if folder else None
+        if filename and os.path.exists(filename):
+            with open(filename) as file:
+                items = json.load(file)['items']
+        else:
+            items = generate_fmc_data.generate(object_type, count, seed)
+        domain[object_type] = items
+    accessrules = domain.pop('accessrules')
+    domain['policies'] = {generate_fmc_data.POLICY_ID: {'name': 'Mock-Policy', 'accessrules': accessrules}}
+    return {'domains': {generate_fmc_data.DOMAIN_ID: domain}}
+
+
+# Function to get the summary FMC returns for expanded=false
+def _summary(item, metadata=False):
+    return {key: item[key] for key in ('id', 'name', 'type', 'links') + (('metadata',) if metadata else ()) if key in item}
+
+
+class MockState:
+    """Tokens, counters and fault settings shared by all request threads"""
+
+    def __init__(self, data, settings):
+        self.data = data
+        self.settings = dict(DEFAULTS, **settings)
+        self.tokens = {}              # Access token -> {'refresh_token', 'expires', 'refreshes'}
+        self.window = deque()         # Times of the requests of the last minute, for the rate limit
+        self.requests = 0
+        self.in_flight = 0
+        self.stats = {'requests': 0, 'items': 0, 'bytes': 0, 'status': {}, 'max_in_flight': 0, 'tokens_issued': 0, 'tokens_refreshed': 0}
+        self.indexes = {}             # id(items) -> {object id: item}, built on first object request
+        self.lock = threading.Lock()
+
+    # Function to count a response by status code
+    def record(self, status, items=0, size=0):
+        with self.lock:
+            self.stats['requests'] += 1
+            self.stats['items'] += items
+            self.stats['bytes'] += size
+            self.stats['status'][str(status)] = self.stats['status'].get(str(status), 0) + 1
+
+    # Function to decide if a request is throttled, returns the 429 reason or None
+    def admit(self):
+        settings = self.settings
+        now = time.monotonic()
+        with self.lock:
+            self.requests += 1
+            if settings['burst_every'] and (self.requests - 1) % (settings['burst_every'] + settings['burst_length']) >= settings['burst_every']:
+                return "429 burst"
+            if settings['rate_limit']:
+                while self.window and now - self.window[0] >= 60:
+                    self.window.popleft()
+                if len(self.window) >= settings['rate_limit']:
+                    return "Too many requests per minute"
+                self.window.append(now)
+            if settings['max_concurrent'] and self.in_flight >= settings['max_concurrent']:
+                return "Too many concurrent requests"
+            self.in_flight += 1
+            self.stats['max_in_flight'] = max(self.stats['max_in_flight'], self.in_flight)
+        return None
+
+    def release(self):
+        with self.lock:
+            self.in_flight -= 1
+
+    # Function to issue a new access/refresh token pair
+    def issue_token(self, refresh_token=None, refreshes=0):
+        access_token = str(uuid.uuid4())
+        with self.lock:
+            self.tokens[access_token] = {
+                'refresh_token': refresh_token or str(uuid.uuid4()),
+                'expires': time.monotonic() + self.settings['token_lifetime'],
+                'refreshes': refreshes
+            }
+            self.stats['tokens_issued' if not refreshes else 'tokens_refreshed'] += 1
+            return access_token, self.tokens[access_token]['refresh_token']
+
+    # Function to replace an access token that was issued with refresh_token, None when not allowed
+    def refresh_token(self, access_token, refresh_token):
+        with self.lock:
+            token = self.tokens.get(access_token)
+            if token is None or token['refresh_token'] != refresh_token or token['refreshes'] >= MAX_REFRESHES:
+                return None
+            del self.tokens[access_token]
+        return self.issue_token(refresh_token, token['refreshes'] + 1)
+
+    def token_valid(self, access_token):
+        if access_token and access_token == self.settings['static_token']:
+            return True
+        with self.lock:
+            token = self.tokens.get(access_token)
+            return token is not None and token['expires'] > time.monotonic()
+
+    # Function to find an item by id, the id index of a list is built once
+    def find(self, items, object_id):
+        with self.lock:
+            index = self.indexes.get(id(items))
+            if index is None:
+                index = self.indexes[id(items)] = {item.get('id'): item for item in items}
+        return index.get(object_id)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive, like FMC
+    server_version = 'MockFMC/1.0'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    # Function to write a response, delayed and throttled by the settings
+    def respond(self, status, body=None, headers=None, items=0):
+        settings = self.server.state.settings
+        payload = json.dumps(body).encode() if body is not None else b''
+        compressed = settings['gzip'] and payload and 'gzip' in self.headers.get('Accept-Encoding', '')
+        if compressed:
+            payload = gzip.compress(payload, compresslevel=1)
+
+        delay = settings['latency'] + settings['latency_per_item'] * items + random.uniform(0, settings['jitter'])
+        if delay:
+            time.sleep(delay)
+
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        if payload:
+            self.send_header('Content-Type', 'application/json')
+        if compressed:
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        if settings['bandwidth']:
+            for start in range(0, len(payload), CHUNK_SIZE):
+                chunk = payload[start:start + CHUNK_SIZE]
+                self.wfile.write(chunk)
+                time.sleep(len(chunk) / settings['bandwidth'])
+        else:
+            self.wfile.write(payload)
+        self.server.state.record(status, items, len(payload))
+
+    def error(self, status, description):
+        self.respond(status, {'error': {'category': 'FRAMEWORK', 'messages': [{'description': description}], 'severity': 'ERROR'}})
+
+    def do_POST(self):
+        state = self.server.state
+        # Drain the request body so the connection can be reused
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        path = urlparse(self.path).path.rstrip('/')
+
+        if path == '/api/fmc_platform/v1/auth/generatetoken':
+            expected = base64.b64encode(f"{state.settings['username']}:{state.settings['password']}".encode()).decode()
+            if self.headers.get('Authorization') != f"Basic {expected}":
+                return self.error(401, "Unauthorized")
+            access_token, refresh_token = state.issue_token()
+        elif path == '/api/fmc_platform/v1/auth/refreshtoken':
+            tokens = state.refresh_token(self.headers.get('X-auth-access-token'), self.headers.get('X-auth-refresh-token'))
+            if tokens is None:
+                return self.error(401, "Invalid refresh token or refresh limit reached, please login again")
+            access_token, refresh_token = tokens
+        else:
+            return self.error(404, "Not found")
+
+        domains = [{'name': domain['name'], 'uuid': domain_id} for domain_id, domain in state.data['domains'].items()]
+        self.respond(204, headers={
+            'X-auth-access-token': access_token,
+            'X-auth-refresh-token': refresh_token,
+            'DOMAIN_UUID': domains[0]['uuid'],
+            'DOMAINS': json.dumps(domains)
+        })
+
+    def do_GET(self):
+        state = self.server.state
+        url = urlparse(self.path)
+        if url.path.rstrip('/') == '/mock/stats':
+            with state.lock:
+                stats = json.loads(json.dumps(state.stats))
+            return self.respond(200, stats)
+
+        reason = state.admit()
+        if reason is not None:
+            headers = {'Retry-After': str(state.settings['retry_after'])} if state.settings['retry_after'] is not None else None
+            return self.respond(429, {'error': {'category': 'FRAMEWORK', 'messages': [{'description': reason}], 'severity': 'ERROR'}}, headers)
+        try:
+            if not state.token_valid(self.headers.get('X-auth-access-token')):
+                return self.error(401, "Access token invalid.")
+            self.get_resource(url)
+        finally:
+            state.release()
+
+    # Function to answer a list or object request
+    def get_resource(self, url):
+        state = self.server.state
+        domains = state.data['domains']
+        if url.path.rstrip('/') == '/api/fmc_platform/v1/info/domain':
+            items = [{'uuid': domain_id, 'name': domain['name'], 'type': 'Domain'} for domain_id, domain in domains.items()]
+            return self.respond_list(url, items, summarize=False)
+
+        match = _OBJECT_PATH.match(url.path) or _POLICY_PATH.match(url.path)
+        domain = domains.get(match.group('domain')) if match else None
+        if domain is None:
+            return self.error(404, "Not found")
+
+        groups = match.groupdict()
+        if 'object_type' in groups:
+            items = domain[groups['object_type']]
+        elif groups['policy'] is None:
+            items = [{'id': policy_id, 'name': policy['name'], 'type': 'AccessPolicy'} for policy_id, policy in domain['policies'].items()]
+        elif groups['policy'] not in domain['policies']:
+            return self.error(404, f"Access policy {groups['policy']} not found")
+        elif groups['rules']:
+            items = domain['policies'][groups['policy']]['accessrules']
+        else:
+            policy = domain['policies'][groups['policy']]
+            return self.respond(200, {'id': groups['policy'], 'name': policy['name'], 'type': 'AccessPolicy'}, items=1)
+
+        if groups.get('object_id'):
+            item = state.find(items, groups['object_id'])
+            if item is None:
+                return self.error(404, f"Object {groups['object_id']} not found")
+            return self.respond(200, item, items=1)
+        self.respond_list(url, items)
+
+    # Function to answer one page of a list with FMC paging
+    def respond_list(self, url, items, summarize=True):
+        query = parse_qs(url.query)
+        try:
+            offset = max(0, int(query.get('offset', ['0'])[0]))
+            limit = min(MAX_LIMIT, max(1, int(query.get('limit', [str(DEFAULT_LIMIT)])[0])))
+        except ValueError:
+            return self.error(400, "Invalid offset or limit")
+
+        page = items[offset:offset + limit]
+        if summarize and query.get('expanded', ['false'])[0].lower() != 'true':
+            page = [_summary(item, self.server.state.settings['listing_metadata']) for item in page]
+        base = f"https://{self.headers.get('Host')}{url.path}"
+        paging = {'offset': offset, 'limit': limit, 'count': len(items), 'pages': -(-len(items) // limit)}
+        if offset + limit < len(items):
+            paging['next'] = [f"{base}?offset={offset + limit}&limit={limit}"]
+        body = {'links': {'self': f"{base}?{url.query}"}, 'paging': paging}
+        if page:
+            body['items'] = page  # FMC leaves out items on an empty page
+        self.respond(200, body, items=len(page))
+
+
+# Function to create a self-signed certificate with openssl, returns (certfile, keyfile)
+def self_signed_certificate(folder):
+    certfile = os.path.join(folder, 'mock_fmc.crt')
+    keyfile = os.path.join(folder, 'mock_fmc.key')
+    subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1', '-subj', '/CN=mock-fmc',
+                    '-keyout', keyfile, '-out', certfile], check=True, capture_output=True)
+    return certfile, keyfile
+
+
+# Function to start the server in a thread, returns it (server.state holds tokens and counters, server.shutdown() stops it)
+def start_server(data, settings=None, host='127.0.0.1', port=0, certfile=None, keyfile=None, verbose=False):
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.state = MockState(data, settings or {})
+    server.verbose = verbose
+    if certfile:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(certfile, keyfile)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=8443, help="Port to listen on")
+    parser.add_argument("--data", help="Folder with fmc_<object type>.json files to serve")
+    parser.add_argument("--count", type=int, default=10000, help="Objects per generated object type")
+    parser.add_argument("--http", action="store_true", help="Serve plain HTTP instead of HTTPS")
+    parser.add_argument("--certfile", help="TLS certificate, self-signed one is made when missing")
+    parser.add_argument("--keyfile", help="TLS private key")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    for key, value in DEFAULTS.items():
+        option = f"--{key.replace('_', '-')}"
+        if isinstance(value, bool) and value:
+            parser.add_argument(f"--no-{key.replace('_', '-')}", dest=key, action="store_false", help=f"Disable {key}")
+        elif isinstance(value, bool):
+            parser.add_argument(option, dest=key, action="store_true", help=f"Enable {key}")
+        else:
+            parser.add_argument(option, type=float if isinstance(value, float) else (int if isinstance(value, int) else str), default=value)
+    args = parser.parse_args()
+
+    settings = {key: getattr(args, key) for key in DEFAULTS}
+    print("Loading data...")
+    data = load_data(args.data, args.count)
+
+    with tempfile.TemporaryDirectory() as folder:
+        certfile, keyfile = args.certfile, args.keyfile
+        if not args.http and not certfile:
+            try:
+                certfile, keyfile = self_signed_certificate(folder)
+            except (OSError, subprocess.CalledProcessError) as e:
+                parser.exit(1, f"Failed to create a self-signed certificate ({e}), use --certfile/--keyfile or --http\n")
+        server = start_server(data, settings, args.host, args.port, certfile, keyfile, args.verbose)
+
+        scheme = 'http' if args.http else 'https'
+        domain = data['domains'][generate_fmc_data.DOMAIN_ID]
+        print(f"Mock FMC listening on {scheme}://{args.host}:{args.port}")
+        print(f"FMC_HOST={args.host}:{args.port} FMC_DOMAIN_ID={generate_fmc_data.DOMAIN_ID} FMC_ACCESS_POLICY_ID={generate_fmc_data.POLICY_ID}")
+        print(f"FMC_USERNAME={settings['username']} FMC_PASSWORD={settings['password']}")
+        print(', '.join(f"{len(domain[object_type])} {object_type}" for object_type in ('networks', 'networkgroups', 'portobjectgroups'))
+              + f", {len(domain['policies'][generate_fmc_data.POLICY_ID]['accessrules'])} accessrules")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.shutdown()
+            print(f"Stopped, {json.dumps(server.state.stats)}")
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+
+"""
+Throughput benchmark suite for the fetch and convert paths
+
+For every scale and object type a synthetic dataset is generated with
+generate_fmc_data.py and every path of fmc_export.py is run on it:
+    convert: exported JSON -> CSV, read in one go
+    convert_stream: exported JSON -> CSV, read incrementally
+    fetch_json: paged fetch -> JSON (the get_*.py default)
+    fetch_csv: paged fetch converted to CSV page by page (--csv)
+
+The fetch paths download from mock_fmc.py in this process, serving the
+generated items over plain HTTP with FMC paging but no latency and no rate
+limit, so only the client side is measured.
+
+Every run is a fresh interpreter, so peak memory (ru_maxrss) belongs to that
+one path. Results are written as JSON with the git version, so two runs can
+be compared with --compare.
+
+Args:
+    --scales (str): comma separated object counts, default 10000,100000
+    --types (str): comma separated object types, default all
+    --cases (str): comma separated paths, default all
+    --output (str): JSON results, default benchmarks/results/benchmark_<timestamp>.json
+    --compare (str): earlier JSON results to compare against
+
+Usage:
+    python benchmarks/run_benchmarks.py --scales 10000,100000,500000
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/benchmark_20241001_120000.json
+
+Output File Format:
+    JSON file: {"version", "python", "platform", "cpu_count", "started", "results": [
+        {"object_type", "scale", "case", "ok", "rows", "seconds", "rows_per_second",
+         "baseline_rss_mb", "peak_rss_mb", "file_mb", "error"}
+    ]}
+"""
+
+__author__ = "Sasa Kovacic"
+__email__ = "sasa.kovacic@storm.hr"
+__version__ = "1.0"
+
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime
+
+import mock_fmc
+import generate_fmc_data
+
+benchmarks_folder = os.path.dirname(os.path.abspath(__file__))
+scripts_folder = os.path.join(benchmarks_folder, '..', 'scripts')
+results_folder = os.path.join(benchmarks_folder, 'results')
+
+CASES = ('convert', 'convert_stream', 'fetch_json', 'fetch_csv')
+DEFAULT_SCALES = '10000,100000'
+TOKEN = 'bench'  # Static token of the mock server, no login needed
+
+
+# ----- One benchmark run, in its own interpreter -----
+
+def _rss_mb():
+    import resource
+    # ru_maxrss is KB on Linux and bytes on macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1048576 if sys.platform == 'darwin' else 1024)
+
+
+# Function to run one path of fmc_export.py and measure it, called in the child process
+def run_case(case, object_type, source_folder, output_folder, host):
+    # Set before fmc_export is imported: no rate limit against the local server, fixed streaming mode
+    os.environ['FMC_RATE_LIMIT'] = '1000000'
+    os.environ['FMC_RATE_BURST'] = '1000'
+    os.environ['FMC_STREAM_THRESHOLD_MB'] = '0' if case == 'convert_stream' else '1000000'
+    sys.path.insert(0, scripts_folder)
+    import fmc_export
+
+    fmc_export.protocol = 'http'
+    settings = {'FMC_HOST': host, 'FMC_DOMAIN_ID': generate_fmc_data.DOMAIN_ID,
+                'FMC_ACCESS_POLICY_ID': generate_fmc_data.POLICY_ID, 'FMC_TOKEN': TOKEN}
+    baseline = _rss_mb()
+    started = time.perf_counter()
+    if case in ('convert', 'convert_stream'):
+        # Converted next to the source JSON, network groups are resolved from fmc_networks.json there
+        result = fmc_export.convert_json(object_type, source_folder)
+    elif case == 'fetch_json':
+        result = fmc_export.export_json(object_type, settings, output_folder)
+    else:
+        result = fmc_export.export_csv(object_type, settings, output_folder)
+    seconds = time.perf_counter() - started
+
+    return {
+        'ok': result['ok'],
+        'rows': result['rows'],
+        'seconds': round(seconds, 4),
+        'rows_per_second': round(result['rows'] / seconds) if seconds else None,
+        'baseline_rss_mb': round(baseline, 1),
+        'peak_rss_mb': round(_rss_mb(), 1),
+        'file_mb': round(os.path.getsize(result['path']) / 1048576, 2) if result['path'] and os.path.exists(result['path']) else None,
+        'error': result['error']
+    }
+
+
+# Function to run one path in a fresh interpreter, returns its measurements
+def run_child(case, object_type, source_folder, output_folder, host):
+    result_file = os.path.join(output_folder, f"{case}_{object_type}.json")
+    command = [sys.executable, os.path.abspath(__file__), '--child', case, object_type, source_folder, output_folder, host, result_file]
+    process = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if process.returncode != 0 or not os.path.exists(result_file):
+        return {'ok': False, 'error': process.stderr.strip().splitlines()[-1] if process.stderr.strip() else f"exit code {process.returncode}"}
+    with open(result_file) as file:
+        return json.load(file)
+
+
+# ----- Suite -----
+
+def _git_version():
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], cwd=benchmarks_folder,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Function to build the data of the mock server with one object type (and the networks of network groups)
+def served_data(object_type, items, networks=()):
+    domain = {'name': 'Global', 'networks': list(networks), 'networkgroups': [], 'portobjectgroups': [],
+              'policies': {generate_fmc_data.POLICY_ID: {'name': 'Benchmark-Policy', 'accessrules': []}}}
+    if object_type == 'accessrules':
+        domain['policies'][generate_fmc_data.POLICY_ID]['accessrules'] = items
+    else:
+        domain[object_type] = items
+    return {'domains': {generate_fmc_data.DOMAIN_ID: domain}}
+
+
+# Function to run every case for every scale and object type, returns the results document
+def run_suite(scales, object_types, cases):
+    document = {
+        'version': _git_version(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'started': datetime.now().isoformat(timespec='seconds'),
+        'results': []
+    }
+    server = mock_fmc.start_server(served_data('networks', []), {'static_token': TOKEN})
+    host = f"127.0.0.1:{server.server_address[1]}"
+    try:
+        for scale in scales:
+            source_folder = tempfile.mkdtemp(prefix=f"fmc_bench_{scale}_")
+            try:
+                # Networks first, network groups are resolved against them
+                for object_type in sorted(object_types, key=generate_fmc_data.OBJECT_TYPES.index):
+                    items = generate_fmc_data.generate(object_type, scale)
+                    generate_fmc_data.write_json(items, os.path.join(source_folder, f"fmc_{object_type}.json"))
+                    networks = []
+                    if object_type == 'networkgroups':
+                        # Group members are resolved against the networks, fetched live by fetch_csv
+                        networks_file = os.path.join(source_folder, 'fmc_networks.json')
+                        if not os.path.exists(networks_file):
+                            generate_fmc_data.write_json(generate_fmc_data.generate('networks', scale), networks_file)
+                        with open(networks_file) as file:
+                            networks = json.load(file)['items']
+                    server.state.data = served_data(object_type, items, networks)
+                    del items, networks
+
+                    for case in cases:
+                        output_folder = tempfile.mkdtemp(prefix=f"fmc_bench_{case}_")
+                        try:
+                            measured = run_child(case, object_type, source_folder, output_folder, host)
+                        finally:
+                            shutil.rmtree(output_folder, ignore_errors=True)
+                        result = {'object_type': object_type, 'scale': scale, 'case': case}
+                        result.update(measured)
+                        document['results'].append(result)
+                        print(format_result(result), flush=True)
+                    server.state.data = served_data('networks', [])
+            finally:
+                shutil.rmtree(source_folder, ignore_errors=True)
+    finally:
+        server.shutdown()
+    return document
+
+
+def format_result(result):
+    if not result['ok']:
+        return f"{result['object_type']:<17} {result['scale']:>8} {result['case']:<15} failed: {result['error']}"
+    return (f"{result['object_type']:<17} {result['scale']:>8} {result['case']:<15} "
+            f"{result['seconds']:>8.2f} s {result['rows_per_second']:>10,} rows/s {result['peak_rss_mb']:>8.0f} MB peak")
+
+
+# Function to print the change of every result against an earlier results document
+def compare(document, previous):
+    earlier = {(r['object_type'], r['scale'], r['case']): r for r in previous['results'] if r.get('ok')}
+    print(f"Compared with {previous.get('version')} ({previous.get('started')}), ratio new/old, lower is better:")
+    for result in document['results']:
+        old = earlier.get((result['object_type'], result['scale'], result['case']))
+        if not result['ok'] or old is None:
+            continue
+        print(f"{result['object_type']:<17} {result['scale']:>8} {result['case']:<15} "
+              f"time {result['seconds'] / old['seconds']:>5.2f}x  peak memory {result['peak_rss_mb'] / old['peak_rss_mb']:>5.2f}x")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 8 and sys.argv[1] == '--child':
+        case, object_type, source_folder, output_folder, host, result_file = sys.argv[2:]
+        measured = run_case(case, object_type, source_folder, output_folder, host)
+        with open(result_file, 'w') as file:
+            json.dump(measured, file)
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scales", default=DEFAULT_SCALES, help="Comma separated object counts")
+    parser.add_argument("--types", default=','.join(generate_fmc_data.OBJECT_TYPES), help="Comma separated object types")
+    parser.add_argument("--cases", default=','.join(CASES), help="Comma separated paths: " + ', '.join(CASES))
+    parser.add_argument("--output", help="JSON results, default benchmarks/results/benchmark_<timestamp>.json")
+    parser.add_argument("--compare", help="Earlier JSON results to compare against")
+    args = parser.parse_args()
+
+    document = run_suite([int(scale) for scale in args.scales.split(',')], args.types.split(','), args.cases.split(','))
+    output = args.output or os.path.join(results_folder, f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as file:
+        json.dump(document, file, indent=4)
+    print(f"Results have been saved to {output}")
+
+    if args.compare:
+        with open(args.compare) as file:
+            compare(document, json.load(file))
@@ -7,6 +7,8 @@ Converts fmc_accessrules.json file to fmc_accessrules.csv
 Args:
     input_file (str): /export/fmc_accessrules.json
     output_file (str): /export/fmc_accessrules.csv
+    --format (str): csv | parquet | feather, default csv
+    --stream: read the JSON items incrementally, flat memory use for very large files (csv only)
 
 Returns:
     None: This script doesn't return a value, but creates an output file.
@@ -16,6 +18,8 @@ Input File Format:
 
 Output File Format:
     CSV file: fmc_accessrules.csv, CSV file with processed data
+    Parquet file: fmc_accessrules.parquet, zstd compressed (--format parquet)
+    Feather file: fmc_accessrules.feather, Arrow IPC for memory mapped reloads (--format feather)
 """
 
 __author__ = "Sasa Kovacic"
@@ -24,27 +28,25 @@ __version__ = "1.0"
 
 
 import json
+import argparse
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from fmc_formats import write_frame, output_path, FORMATS
+from fmc_jsonstream import iter_json_items
+from fmc_pipeline import write_pages_to_csv
+from fmc_trace import span
 
 json_file = 'export/fmc_accessrules.json'
 csv_file = 'export/fmc_accessrules.csv'
 
-# Load the JSON data
-with open(json_file) as json_file:
-    data = json.load(json_file)
-
-# Initialize lists to store extracted values
-names = []
-actions = []
-sourceZones = []
-destinationZones = []
-sourceNetworks = []
-destinationNetworks = []
-sourcePorts = []
-destinationPorts = []
-comments = []
-indices = []
-links = []
+# Columns of the output CSV, in order
+COLUMNS = ['Index', 'Name', 'Action', 'SourceZone', 'DestinationZone', 'SourceNetwork',
+           'DestinationNetwork', 'SourcePort', 'DestinationPort', 'Comment', 'Link']
+
+# Low cardinality columns, dictionary encoded in Parquet and Feather
+DICTIONARY_COLUMNS = ['Action', 'SourceZone', 'DestinationZone']
     
 # Helper function to safely extract protocol:port or protocol:name
 def extract_protocol_name(obj, port_type='name'):
@@ -62,20 +64,13 @@ def extract_network_name(obj, network_type='name'):
     return obj.get(network_type, '')
 
 
-# Extract desired key-value pairs from each item
-for index, item in enumerate(data['items']):
-    # Start index, extract name and action
-    indices.append(index + 1)  # Start index from 1
-    names.append(item['name'])
-    actions.append(item['action'])
-    
+# Extract desired key-value pairs from one rule, index is the rule position starting at 1
+def extract_row(index, item):
     # Extract source zones
     source_zone_names = [obj['name'] for obj in item.get('sourceZones', {}).get('objects', [])]
-    sourceZones.append(','.join(source_zone_names))
     
     # Extract destination zones
     destination_zone_names = [obj['name'] for obj in item.get('destinationZones', {}).get('objects', [])]
-    destinationZones.append(','.join(destination_zone_names))
     
     # Extract source networks (from both objects and literals)
     source_networks = []
@@ -88,8 +83,6 @@ for index, item in enumerate(data['items']):
     if 'literals' in item.get('sourceNetworks', {}):
         source_networks += [extract_network_name(literal, 'value') for literal in item['sourceNetworks']['literals']]
 
-    sourceNetworks.append(','.join(source_networks) if source_networks else '')
-
     # Extract destination networks (from both objects and literals)
     destination_networks = []
 
@@ -100,7 +93,6 @@ for index, item in enumerate(data['items']):
     # Check for 'literals' in destinationNetworks
     if 'literals' in item.get('destinationNetworks', {}):
         destination_networks += [extract_network_name(literal, 'value') for literal in item['destinationNetworks']['literals']]
-    destinationNetworks.append(','.join(destination_networks) if destination_networks else '')
 
     # Extract source ports (from both objects and literals)
     source_ports = []
@@ -113,8 +105,6 @@ for index, item in enumerate(data['items']):
     if 'literals' in item.get('sourcePorts', {}):
         source_ports += [extract_protocol_name(literal, 'port') for literal in item['sourcePorts']['literals']]
 
-    sourcePorts.append(','.join(source_ports) if source_ports else '')
-
     # Extract destination ports (from both objects and literals)
     destination_ports = []
 
@@ -126,9 +116,8 @@ for index, item in enumerate(data['items']):
     if 'literals' in item.get('destinationPorts', {}):
         destination_ports += [extract_protocol_name(literal, 'port') for literal in item['destinationPorts']['literals']]
 
-    destinationPorts.append(','.join(destination_ports) if destination_ports else '')
-
     # Extract comments (ensure it exists)
+    comment = ''  # Empty value if no comments are present
     if item.get('commentHistoryList'):
         # List to hold formatted comments
         formatted_comments = []
@@ -143,51 +132,165 @@ for index, item in enumerate(data['items']):
             formatted_comments.append(f"{date}: {comment_text}")
         
         # Join all formatted comments with a separator (e.g., " | " or any other delimiter)
-        comments.append(' | '.join(formatted_comments))
-    else:
-        comments.append('')  # Add an empty value if no comments are present
+        comment = ' | '.join(formatted_comments)
         
     # Extract links (ensure it exists)
-    if item.get('links'):
-        links.append(item['links']['self'])
-    else:
-        links.append('')
-
-# Ensure all lists are the same length
-max_length = max(len(names), len(actions), len(sourceZones), len(destinationZones), len(sourceNetworks),
-                 len(destinationNetworks), len(sourcePorts), len(destinationPorts), len(comments), len(indices))
-
-def pad_list(lst, max_length):
-    return lst + [''] * (max_length - len(lst))
-
-names = pad_list(names, max_length)
-actions = pad_list(actions, max_length)
-sourceZones = pad_list(sourceZones, max_length)
-destinationZones = pad_list(destinationZones, max_length)
-sourceNetworks = pad_list(sourceNetworks, max_length)
-destinationNetworks = pad_list(destinationNetworks, max_length)
-sourcePorts = pad_list(sourcePorts, max_length)
-destinationPorts = pad_list(destinationPorts, max_length)
-comments = pad_list(comments, max_length)
-indices = pad_list(indices, max_length)
-links = pad_list(links, max_length)
-
-# Create DataFrame from extracted data
-df = pd.DataFrame({
-    'Index': indices,
-    'Name': names,
-    'Action': actions,
-    'SourceZone': sourceZones,
-    'DestinationZone': destinationZones,
-    'SourceNetwork': sourceNetworks,
-    'DestinationNetwork': destinationNetworks,
-    'SourcePort': sourcePorts,
-    'DestinationPort': destinationPorts,
-    'Comment': comments,
-    'Link': links
-})
-
-# Export DataFrame to CSV
-df.to_csv(csv_file, index=False)
-
-print(f"Data has been exported to {csv_file}")
+    link = item['links']['self'] if item.get('links') else ''
+
+    return [
+        index,
+        item['name'],
+        item['action'],
+        ','.join(source_zone_names),
+        ','.join(destination_zone_names),
+        ','.join(source_networks),
+        ','.join(destination_networks),
+        ','.join(source_ports),
+        ','.join(destination_ports),
+        comment,
+        link
+    ]
+
+# Extract rows from a list of rules, start_index is the number of rules before them
+def extract_rows(items, start_index=0):
+    return [extract_row(start_index + position + 1, item) for position, item in enumerate(items)]
+
+# ----- Columnar conversion -----
+# The whole rule list is converted to one Arrow struct array, nested objects/literals
+# are flattened in bulk and joined back per rule, no Python loop per rule or element.
+
+# Only the fields written to the CSV, Arrow skips every other key of a rule
+_NAMED = pa.list_(pa.struct([('name', pa.string())]))
+_NETWORKS = pa.struct([
+    ('objects', _NAMED),
+    ('literals', pa.list_(pa.struct([('value', pa.string())])))
+])
+_PORTS = pa.struct([
+    ('objects', pa.list_(pa.struct([('name', pa.string()), ('protocol', pa.string())]))),
+    ('literals', pa.list_(pa.struct([('port', pa.string()), ('protocol', pa.string())])))
+])
+RULE_TYPE = pa.struct([
+    ('name', pa.string()),
+    ('action', pa.string()),
+    ('sourceZones', pa.struct([('objects', _NAMED)])),
+    ('destinationZones', pa.struct([('objects', _NAMED)])),
+    ('sourceNetworks', _NETWORKS),
+    ('destinationNetworks', _NETWORKS),
+    ('sourcePorts', _PORTS),
+    ('destinationPorts', _PORTS),
+    ('commentHistoryList', pa.list_(pa.struct([('date', pa.string()), ('comment', pa.string())]))),
+    ('links', pa.struct([('self', pa.string())]))
+])
+
+# Helper function to get a string child of a struct array, null becomes ''
+def _string_field(array, name):
+    return pc.fill_null(pc.struct_field(array, name), '')
+
+# Helper function to turn a list<struct> array into per rule strings
+def _join_list(list_array, value_fn, separator=','):
+    # Null lists become empty lists, value_fn maps the flattened structs to strings
+    values = value_fn(list_array.values)
+    rebuilt = pa.ListArray.from_arrays(pc.fill_null(list_array.offsets, 0), values)
+    return pc.fill_null(pc.binary_join(rebuilt, separator), '')
+
+# Helper function to map protocol numbers 6/17 to TCP/UDP in one step
+def _protocol_names(protocols):
+    return pc.if_else(pc.equal(protocols, '6'), 'TCP', pc.if_else(pc.equal(protocols, '17'), 'UDP', protocols))
+
+# Helper function to join objects and literals of one field the way extract_row does
+def _objects_and_literals(field, object_fn, literal_fn):
+    objects = pc.struct_field(field, 'objects')
+    literals = pc.struct_field(field, 'literals')
+    joined_objects = _join_list(objects, object_fn)
+    joined_literals = _join_list(literals, literal_fn)
+
+    # Separator only when both parts have elements
+    both = pc.and_(pc.greater(pc.fill_null(pc.list_value_length(objects), 0), 0),
+                   pc.greater(pc.fill_null(pc.list_value_length(literals), 0), 0))
+    return pc.if_else(both, pc.binary_join_element_wise(joined_objects, joined_literals, ','),
+                      pc.binary_join_element_wise(joined_objects, joined_literals, ''))
+
+def _network_column(rules, name):
+    return _objects_and_literals(
+        pc.struct_field(rules, name),
+        lambda values: _string_field(values, 'name'),
+        lambda values: _string_field(values, 'value')
+    )
+
+def _port_column(rules, name):
+    def protocol_and(key):
+        return lambda values: pc.binary_join_element_wise(
+            _protocol_names(_string_field(values, 'protocol')), _string_field(values, key), ':')
+    return _objects_and_literals(pc.struct_field(rules, name), protocol_and('name'), protocol_and('port'))
+
+def _zone_column(rules, name):
+    objects = pc.struct_field(pc.struct_field(rules, name), 'objects')
+    return _join_list(objects, lambda values: _string_field(values, 'name'))
+
+def _comment_column(rules):
+    # "date: comment", date cut to seconds and newlines flattened, joined with " | "
+    def format_comment(values):
+        date = pc.utf8_slice_codeunits(_string_field(values, 'date'), 0, 19)
+        text = pc.replace_substring(_string_field(values, 'comment'), '\n', ' ')
+        return pc.binary_join_element_wise(date, text, ': ')
+    return _join_list(pc.struct_field(rules, 'commentHistoryList'), format_comment, ' | ')
+
+# Extract all rules into a DataFrame at once, same content as extract_rows
+def extract_frame(items):
+    length = len(items)
+    rules = pa.array(items, type=RULE_TYPE)
+
+    columns = {
+        'Name': _string_field(rules, 'name'),
+        'Action': _string_field(rules, 'action'),
+        'SourceZone': _zone_column(rules, 'sourceZones'),
+        'DestinationZone': _zone_column(rules, 'destinationZones'),
+        'SourceNetwork': _network_column(rules, 'sourceNetworks'),
+        'DestinationNetwork': _network_column(rules, 'destinationNetworks'),
+        'SourcePort': _port_column(rules, 'sourcePorts'),
+        'DestinationPort': _port_column(rules, 'destinationPorts'),
+        'Comment': _comment_column(rules),
+        'Link': _string_field(pc.struct_field(rules, 'links'), 'self')
+    }
+    df = pd.DataFrame({name: column.to_numpy(zero_copy_only=False) for name, column in columns.items()})
+    df.insert(0, 'Index', np.arange(1, length + 1))
+    return df
+
+# Build the DataFrame, falls back to the per rule extraction when a rule does not fit RULE_TYPE
+def build_frame(items):
+    if items:
+        try:
+            return extract_frame(items)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            pass
+    return pd.DataFrame(extract_rows(items), columns=COLUMNS)
+
+# Convert the exported JSON file to CSV (or Parquet/Feather), returns the number of rows
+def convert_accessrules(json_file, csv_file, output_format='csv', stream=False):
+    if stream:
+        # Batches of items are converted and written as they are read, the file is never loaded whole
+        if output_format != 'csv':
+            raise ValueError("Streaming mode writes CSV only")
+        return write_pages_to_csv(iter_json_items(json_file), extract_rows, COLUMNS, csv_file)
+
+    # Load the JSON data
+    with span('json load', 'decode'):
+        with open(json_file) as file:
+            data = json.load(file)
+
+    # Create DataFrame from extracted data, the columnar path extracts and builds in one go
+    with span('extract frame', 'extract', rules=len(data['items'])):
+        df = build_frame(data['items'])
+
+    # Export DataFrame to CSV, or next to it as .parquet/.feather
+    write_frame(df, csv_file, output_format, DICTIONARY_COLUMNS)
+    return len(df)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--format", choices=list(FORMATS), default='csv', help="Output format")
+    parser.add_argument("--stream", action='store_true', help="Read the JSON items incrementally (csv only)")
+    args = parser.parse_args()
+
+    convert_accessrules(json_file, csv_file, args.format, args.stream)
+    print(f"Data has been exported to {output_path(csv_file, args.format)}")
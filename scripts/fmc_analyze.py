@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+
+"""
+Shadowing, redundancy and overlap analysis of the exported access policy
+
+Works on the rules compiled by fmc_evaluate.py (zones, resolved address
+ranges and destination port ranges of every rule) and reports:
+    Shadowed: an earlier rule matches everything this rule matches, so it never matches
+    Redundant: a later rule with the same action matches everything this rule
+               matches and no rule in between with another action overlaps it,
+               so removing it changes nothing
+    Overlap: an earlier rule with another action matches part of this rule
+             (up to OVERLAP_LIMIT per rule)
+    Possibly shadowed: not shadowed by the resolved members, but an earlier
+                       rule with unresolved members may match all of this rule
+    Never matches: a condition has no members (e.g. an empty group)
+    Unresolved: a condition has only unresolved members, the rule is not analyzed
+
+Rules are never compared pairwise. For every rule the candidates come from
+indexes over all rules:
+    overlap: sorted interval arrays with a running maximum of the ends per
+             address family and protocol, plus the zone rows of fmc_evaluate
+    containment: the packed bitset rows of fmc_evaluate at every range
+                 endpoint of the rule, ANDed (a rule containing this one
+                 must cover all of them)
+Only the candidates left are checked exactly.
+
+Disabled rules are skipped. Unresolved members (hosts, ranges, FQDNs, ...)
+are not compared, so a rule with them can match more than its compiled
+conditions:
+    - Shadowed and Redundant of a rule with unresolved members say so in
+      the Detail column, those members may fall outside the other rule
+    - a rule with unresolved members in a field counts as overlapping every
+      rule on that field, so Redundant is never reported past a rule that
+      may conflict, and Overlap also lists rules that may overlap through
+      unresolved members (the Detail column says so)
+    - a rule that is not shadowed is Possibly shadowed when an earlier rule
+      with unresolved members may overlap it
+
+Args:
+    --output (str): /export/fmc_accessrules_analysis.csv
+
+Usage:
+    python scripts/fmc_analyze.py
+
+Input File Format:
+    JSON files: fmc_accessrules.json, fmc_networks.json, fmc_networkgroups.json, fmc_portobjectgroups.json (Export buttons)
+
+Output File Format:
+    CSV file: fmc_accessrules_analysis.csv, one row per finding
+"""
+
+__author__ = "Sasa Kovacic"
+__email__ = "sasa.kovacic@storm.hr"
+__version__ = "1.0"
+
+
+import os
+import uuid
+import bisect
+import argparse
+import itertools
+import numpy as np
+from fmc_evaluate import load_policy
+from fmc_pipeline import open_csv_writer
+
+csv_file = 'export/fmc_accessrules_analysis.csv'
+
+COLUMNS = ['Index', 'Name', 'Action', 'Finding', 'Other Index', 'Other Name', 'Other Action', 'Detail']
+OVERLAP_LIMIT = 20  # Overlap rows written per rule, the last one tells how many were left out
+
+NETWORK_FIELDS = ('src_networks', 'dst_networks')
+ZONE_FIELDS = ('src_zones', 'dst_zones')
+
+
+# Function to build a packed bitset with the bits of the given rule positions set
+def _bits(rules, words):
+    mask = np.zeros(words, dtype=np.uint64)
+    rules = np.asarray(rules, dtype=np.uint64)
+    np.bitwise_or.at(mask, (rules >> np.uint64(6)).astype(np.int64), np.uint64(1) << (rules & np.uint64(63)))
+    return mask
+
+
+# Function to list the rule positions set in a packed bitset, in order
+def _positions(mask):
+    return np.flatnonzero(np.unpackbits(mask.view(np.uint8), bitorder='little'))
+
+
+# Function to get the bitset of the rules before position
+def _before(position, words):
+    mask = np.zeros(words, dtype=np.uint64)
+    mask[:position >> 6] = np.uint64(0xFFFFFFFFFFFFFFFF)
+    if position & 63:
+        mask[position >> 6] = (np.uint64(1) << np.uint64(position & 63)) - np.uint64(1)
+    return mask
+
+
+# Function to build an interval index: starts, ends, running max of the ends, rule of every interval
+def _interval_index(entries, dtype):
+    entries.sort(key=lambda entry: entry[0])
+    index = {
+        'starts': np.array([entry[0] for entry in entries], dtype=dtype),
+        'ends': np.array([entry[1] for entry in entries], dtype=dtype),
+        'rules': np.array([entry[2] for entry in entries], dtype=np.int64),
+    }
+    index['max_ends'] = np.array(list(itertools.accumulate(index['ends'], max)), dtype=dtype)
+    return index
+
+
+# Function to get the rules with an interval sharing at least one value with first..last
+def _overlapping(index, first, last):
+    low = np.searchsorted(index['max_ends'], first, 'left')
+    high = np.searchsorted(index['starts'], last, 'right')
+    if low >= high:
+        return index['rules'][:0]
+    return index['rules'][low:high][index['ends'][low:high] >= first]
+
+
+def _v6(address):
+    return address.to_bytes(16, 'big')
+
+
+# Function to build the overlap indexes of every field over the enabled rules
+def build_indexes(policy):
+    rules = policy['rules']
+    active = [i for i, rule in enumerate(rules) if rule['enabled']]
+    indexes = {}
+    for field in NETWORK_FIELDS:
+        v4 = [(first, last, i) for i in active if rules[i][field] for first, last in rules[i][field][4]]
+        v6 = [(_v6(first), _v6(last), i) for i in active if rules[i][field] for first, last in rules[i][field][6]]
+        indexes[field] = {4: _interval_index(v4, np.int64), 6: _interval_index(v6, 'S16')}
+    protocols = {}
+    for i in active:
+        for protocol, ranges in (rules[i]['dst_ports'] or {}).items():
+            protocols.setdefault(protocol, []).extend((first, last, i) for first, last in ranges)
+    indexes['dst_ports'] = {protocol: _interval_index(entries, np.int64) for protocol, entries in protocols.items()}
+    return indexes
+
+
+# Function to get the rules whose zones share a zone with the rule (zone rows already include the any zone rules)
+def _zone_overlap(policy, field, zones, everyone):
+    rows, table = policy[field]
+    if zones is None:
+        return everyone
+    return np.bitwise_or.reduce(table[[rows[zone] for zone in zones]], axis=0)
+
+
+# Function to get the rules overlapping the rule on every field, relaxed {field: rules} also overlap on that field
+def _overlap_mask(policy, indexes, rule, everyone, relaxed=None):
+    words = policy['words']
+    relaxed = relaxed or {}
+    mask = everyone.copy()
+    for field in ZONE_FIELDS:
+        mask &= _zone_overlap(policy, field, rule[field], everyone)
+    for field in NETWORK_FIELDS:
+        if rule[field] is not None and not (relaxed and field in rule['unresolved']):
+            found = [_overlapping(indexes[field][4], first, last) for first, last in rule[field][4]]
+            found += [_overlapping(indexes[field][6], _v6(first), _v6(last)) for first, last in rule[field][6]]
+            mask &= policy[f'{field}_any'][0] | _bits(np.concatenate(found) if found else [], words) | relaxed.get(field, 0)
+    if rule['dst_ports'] is not None and not (relaxed and 'dst_ports' in rule['unresolved']):
+        found = [_overlapping(indexes['dst_ports'][protocol], first, last)
+                 for protocol, ranges in rule['dst_ports'].items() for first, last in ranges]
+        mask &= policy['dst_ports'][1][0] | _bits(np.concatenate(found) if found else [], words) | relaxed.get('dst_ports', 0)
+    return mask
+
+
+# Function to get the rules covering every range endpoint of the rule, a superset of the rules containing it
+def _container_mask(policy, rule, everyone):
+    mask = everyone.copy()
+    for field in ZONE_FIELDS:
+        rows, table = policy[field]
+        if rule[field] is None:
+            mask &= table[len(rows)]  # Any zone, only rules for any zone contain it
+        else:
+            mask &= np.bitwise_and.reduce(table[[rows[zone] for zone in rule[field]]], axis=0)
+    for field in NETWORK_FIELDS:
+        if rule[field] is None:
+            mask &= policy[f'{field}_any'][0]
+            continue
+        for version in (4, 6):
+            keys, table = policy[f'{field}_v{version}']
+            for first, last in rule[field][version]:
+                probes = (first, last) if version == 4 else (_v6(first), _v6(last))
+                mask &= np.bitwise_and.reduce(table[np.searchsorted(keys, probes, 'right') - 1], axis=0)
+    tables, other = policy['dst_ports']
+    if rule['dst_ports'] is None:
+        mask &= other[0]
+    else:
+        for protocol, ranges in rule['dst_ports'].items():
+            keys, table = tables[protocol]
+            for first, last in ranges:
+                mask &= np.bitwise_and.reduce(table[np.searchsorted(keys, (first, last), 'right') - 1], axis=0)
+    return mask
+
+
+# Function to check that every range of inner lies inside one merged range of outer
+def _ranges_inside(inner, outer):
+    starts = [first for first, _ in outer]
+    for first, last in inner:
+        position = bisect.bisect_right(starts, first) - 1
+        if position < 0 or outer[position][1] < last:
+            return False
+    return True
+
+
+# Function to check exactly that rule outer matches everything rule inner matches
+def contains(outer, inner):
+    for field in ZONE_FIELDS:
+        if outer[field] is not None and (inner[field] is None or not inner[field] <= outer[field]):
+            return False
+    for field in NETWORK_FIELDS:
+        if outer[field] is not None:
+            if inner[field] is None or not all(_ranges_inside(inner[field][version], outer[field][version]) for version in (4, 6)):
+                return False
+    if outer['dst_ports'] is not None:
+        if inner['dst_ports'] is None:
+            return False
+        for protocol, ranges in inner['dst_ports'].items():
+            if protocol not in outer['dst_ports'] or not _ranges_inside(ranges, outer['dst_ports'][protocol]):
+                return False
+    return True
+
+
+# Function to check whether the bit of a rule position is set in a packed bitset
+def _has(mask, position):
+    return bool(mask[position >> 6] >> np.uint64(position & 63) & np.uint64(1))
+
+
+# Function to get the fields of a rule without a single resolved member
+def _empty_fields(rule):
+    empty = [field for field in NETWORK_FIELDS if rule[field] is not None and not rule[field][4] and not rule[field][6]]
+    if rule['dst_ports'] is not None and not rule['dst_ports']:
+        empty.append('dst_ports')
+    return empty
+
+
+# Function to analyze the compiled policy, returns the findings as rows of COLUMNS
+def analyze_policy(policy):
+    rules = policy['rules']
+    words = policy['words']
+    indexes = build_indexes(policy)
+    active = [i for i, rule in enumerate(rules) if rule['enabled']]
+    everyone = _bits(active, words)
+    # Rules with unresolved members, per field they may match more than their compiled ranges
+    unresolved = _bits([i for i in active if rules[i]['unresolved']], words)
+    relaxed = {field: _bits([i for i in active if field in rules[i]['unresolved']], words)
+               for field in NETWORK_FIELDS + ('dst_ports',)} if unresolved.any() else None
+    actions = {}
+    for i, rule in enumerate(rules):
+        actions.setdefault(rule['action'], []).append(i)
+    action_masks = {action: _bits(positions, words) for action, positions in actions.items()}
+
+    findings = []
+    for j, rule in enumerate(rules):
+        if not rule['enabled']:
+            continue
+        row = [rule['index'], rule['name'], rule['action']]
+        detail = "has unresolved members, only the resolved ones were compared" if rule['unresolved'] else ''
+
+        empty = _empty_fields(rule)
+        if empty:
+            if all(field in rule['unresolved'] for field in empty):
+                findings.append(row + ['Unresolved', '', '', '', f"only unresolved members in {', '.join(empty)}, not analyzed"])
+            else:
+                findings.append(row + ['Never matches', '', '', '', f"no members in {', '.join(empty)}"])
+            continue
+
+        before = _before(j, words)
+        overlapping = _overlap_mask(policy, indexes, rule, everyone)
+        containers = _container_mask(policy, rule, everyone) & overlapping
+        # Rules that may overlap through unresolved members, a superset of overlapping
+        possible = _overlap_mask(policy, indexes, rule, everyone, relaxed) if relaxed else overlapping
+
+        # Shadowed: the first earlier rule that contains this one
+        shadow = next((i for i in _positions(containers & before) if contains(rules[i], rule)), None)
+        if shadow is not None:
+            other = rules[shadow]
+            findings.append(row + ['Shadowed', other['index'], other['name'], other['action'], detail])
+            continue
+        suspect = next(iter(_positions(possible & before & unresolved)), None)
+        if suspect is not None:
+            other = rules[suspect]
+            findings.append(row + ['Possibly shadowed', other['index'], other['name'], other['action'],
+                                   "the other rule has unresolved members, whether it matches all of this rule is unknown"])
+
+        # Redundant: the first later rule with the same action that contains this one, no conflicting rule in between
+        later = containers & ~before & action_masks[rule['action']]
+        later[j >> 6] &= ~(np.uint64(1) << np.uint64(j & 63))
+        redundant = next((k for k in _positions(later) if contains(rules[k], rule)), None)
+        if redundant is not None:
+            between = ~before & _before(redundant, words)
+            conflicts = possible & between & ~action_masks[rule['action']]
+            if not conflicts.any():
+                other = rules[redundant]
+                findings.append(row + ['Redundant', other['index'], other['name'], other['action'], detail])
+
+        # Overlap: earlier rules with another action matching part of this rule
+        partial = _positions(possible & before & ~action_masks[rule['action']])
+        for count, i in enumerate(partial[:OVERLAP_LIMIT], start=1):
+            other = rules[i]
+            note = detail if _has(overlapping, i) else "may overlap through unresolved members"
+            if count == OVERLAP_LIMIT and len(partial) > OVERLAP_LIMIT:
+                note = '; '.join(filter(None, [note, f"{len(partial) - OVERLAP_LIMIT} more overlapping rules not listed"]))
+            findings.append(row + ['Overlap', other['index'], other['name'], other['action'], note])
+    return findings
+
+
+# Function to write the findings next to the target and move it into place, returns the number of findings
+def write_analysis(findings, csv_file):
+    part_file = f"{csv_file}.{uuid.uuid4().hex[:8]}.part"
+    with open(part_file, 'w', newline='', encoding='utf-8') as file:
+        open_csv_writer(file, COLUMNS).writerows(findings)
+    os.replace(part_file, csv_file)
+    return len(findings)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output", default=csv_file, help="CSV file with the findings")
+    args = parser.parse_args()
+
+    policy = load_policy()
+    count = write_analysis(analyze_policy(policy), args.output)
+    print(f"{count} findings have been exported to {args.output}")
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+
+"""
+On-disk page checkpoints for resumable exports
+
+The paging engine saves every page as soon as it arrives, one JSON file
+per offset, next to a meta file with the paging state of the run (list
+URL, paging.count, item count of the first page and the page size of the
+remaining pages). When an export fails (network error, 5xx, expired token)
+the pages already on disk stay there, and the next run of the same list
+URL reads them back instead of fetching them again. Only the missing
+offsets are requested from FMC.
+
+A checkpoint is used only when it still matches FMC: same paging.count
+and first page size as the fresh first page, not older than
+FMC_CHECKPOINT_MAX_AGE hours, and every stored page has exactly the number
+of items its offset should have. Anything else is discarded and fetched
+again. The checkpoint is removed once all pages were handed out.
+
+Only a failed fetch (FetchError) keeps the pages for the next run. Any
+other error, or pages left unread by the caller, discards the checkpoint,
+so a run does not keep resuming into the same failure.
+
+Checkpoints live in export/state/checkpoints/<hash of the list URL>/. The
+run using one holds <hash>.lock next to it; a second run of the same list
+URL at the same time fetches without a checkpoint instead of sharing it.
+A lock not refreshed by a saved page for LOCK_TIMEOUT seconds was left by
+a crashed run and is taken over.
+
+Used by:
+    fmc_fetch.py (iter_pages), fmc_export.py, get_accessrules.py, get_networks.py, get_networkgroups.py, get_portobjectgroups.py
+"""
+
+__author__ = "Sasa Kovacic"
+__email__ = "sasa.kovacic@storm.hr"
+__version__ = "1.0"
+
+
+import os
+import json
+import time
+import shutil
+import hashlib
+
+CHECKPOINT_MAX_AGE = float(os.getenv('FMC_CHECKPOINT_MAX_AGE', '24')) * 3600  # Older checkpoints are not resumed
+
+LOCK_TIMEOUT = 600  # Seconds without a saved page after which a lock is taken over
+
+META_FILE = 'meta.json'
+
+
+# Function to get the checkpoint folder of a list URL
+def checkpoint_path(checkpoint_folder, url_template):
+    return os.path.join(checkpoint_folder, hashlib.sha1(url_template.encode('utf-8')).hexdigest()[:16])
+
+
+def _lock_file(path):
+    return f"{path}.lock"
+
+
+# Function to claim the checkpoint for this run, False while another run uses it
+def acquire(path):
+    lock_file = _lock_file(path)
+    os.makedirs(os.path.dirname(lock_file), exist_ok=True)
+    for attempt in range(2):
+        try:
+            handle = os.open(lock_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                if attempt or time.time() - os.path.getmtime(lock_file) < LOCK_TIMEOUT:
+                    return False
+                # Left behind by a run that crashed, take it over
+                os.remove(lock_file)
+            except FileNotFoundError:
+                pass
+            continue
+        with os.fdopen(handle, 'w') as file:
+            file.write(str(os.getpid()))
+        return True
+    return False
+
+
+def release(path):
+    try:
+        os.remove(_lock_file(path))
+    except FileNotFoundError:
+        pass
+
+
+def _page_file(path, offset):
+    return os.path.join(path, f"page_{offset:09d}.json")
+
+
+# Function to write JSON next to the target and move it into place, a crash never leaves half a page
+def _write_json(data, filename):
+    part_file = f"{filename}.part"
+    with open(part_file, 'w') as file:
+        json.dump(data, file)
+    os.replace(part_file, filename)
+
+
+def _read_json(filename):
+    try:
+        with open(filename) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+# Function to start or resume the checkpoint of a run, returns (page size of the remaining pages, offsets on disk)
+def open_checkpoint(path, url_template, count, first, page_limit):
+    meta = _read_json(os.path.join(path, META_FILE))
+    if (meta and meta.get('url') == url_template and meta.get('count') == count and meta.get('first') == first
+            and time.time() - meta.get('created', 0) < CHECKPOINT_MAX_AGE):
+        stored = {int(name[5:14]) for name in os.listdir(path) if name.startswith('page_') and name.endswith('.json')}
+        return meta['limit'], stored
+
+    # New run, or FMC changed since the checkpoint was written: offsets would not line up
+    clear(path)
+    os.makedirs(path, exist_ok=True)
+    _write_json({'url': url_template, 'count': count, 'first': first, 'limit': page_limit, 'created': time.time()}, os.path.join(path, META_FILE))
+    return page_limit, set()
+
+
+def save_page(path, offset, items):
+    _write_json({'offset': offset, 'items': items}, _page_file(path, offset))
+    os.utime(_lock_file(path))  # The run is alive, keep its lock
+
+
+# Function to read a stored page, None when it is missing, broken or has not the expected number of items
+def load_page(path, offset, expected):
+    page = _read_json(_page_file(path, offset))
+    if not page or page.get('offset') != offset or len(page.get('items', [])) != expected:
+        return None
+    return page['items']
+
+
+def clear(path):
+    shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+
+"""
+Headless batch export for cron and CI, without Streamlit
+
+Fetches and converts the given object types concurrently (one thread per
+type, shared connection pool and rate budget, see fmc_export.export_all)
+into a timestamped snapshot folder under the output directory, and writes
+a JSON run summary. Runs from any working directory: paths are absolute,
+and every setting can be passed as an argument.
+
+Settings are taken from, highest first: arguments, --env-file, environment
+variables. The .env in the repository root is not read (FMC_DOTENV=1
+turns it back on), and the protocol and checkpoint folder are passed in
+the settings of the run, so other callers in the process are not affected. With a
+username and password the CLI logs in itself; its tokens are refreshed in
+memory and never written to .env. Checkpoints of failed fetches and the
+delta sync store live under <output>/state.
+
+Args:
+    --host (str): FMC host, default FMC_HOST
+    --domain (str): domain UUID, default FMC_DOMAIN_ID
+    --policy (str): access policy UUID for accessrules, default FMC_ACCESS_POLICY_ID
+    --username, --password (str): FMC login, default FMC_USERNAME/FMC_PASSWORD
+    --token (str): existing access token instead of a login, default FMC_TOKEN
+    --types (str): comma separated object types, default all
+    --output (str): output directory, default export/
+    --format (str): csv, parquet or feather, default csv
+    --workers (int): pages requested from FMC at once per object type
+    --delta-sync: fetch full details only for new or changed objects
+    --zip: pack the snapshot into <snapshot>.zip
+    --summary (str): JSON run summary, default <snapshot>/snapshot.json
+    --env-file (str): .env style file with FMC_* settings
+    --protocol (str): https (default) or http
+
+Usage:
+    python scripts/fmc_cli.py --host fmc.example.com --domain <uuid> --policy <uuid> --username api --password secret
+    python scripts/fmc_cli.py --env-file /etc/fmc.env --types networks,networkgroups --output /data/fmc --format parquet
+
+Exit codes:
+    0: every object type was exported
+    1: some object types failed, the others were exported
+    2: bad arguments or missing settings
+    3: login failed
+    4: every object type failed
+    5: unexpected error, the traceback is printed
+
+Output File Format:
+    JSON file: snapshot.json (or --summary), the export_all summary with "exit_code":
+        {"ok", "path", "seconds", "host", "domain_id", "accesspolicy_id", "created", "output_format",
+         "results": [{"object_type", "label", "ok", "rows", "seconds", "path", "error", ...}], "exit_code"}
+"""
+
+__author__ = "Sasa Kovacic"
+__email__ = "sasa.kovacic@storm.hr"
+__version__ = "1.0"
+
+
+import os
+import sys
+import json
+import argparse
+import traceback
+from dotenv import dotenv_values
+
+if __name__ == "__main__":
+    os.environ.setdefault('FMC_DOTENV', '0')  # Before the exporters are imported, they load the repository .env otherwise
+
+import get_token
+import fmc_token
+import fmc_export
+import fmc_formats
+from fmc_fetch import DEFAULT_WORKERS
+
+EXIT_OK = 0
+EXIT_PARTIAL = 1
+EXIT_USAGE = 2
+EXIT_AUTH = 3
+EXIT_FAILED = 4
+EXIT_ERROR = 5
+
+SETTING_KEYS = ('FMC_HOST', 'FMC_DOMAIN_ID', 'FMC_ACCESS_POLICY_ID', 'FMC_TOKEN', 'FMC_USERNAME', 'FMC_PASSWORD')
+
+
+# Function to check the --types argument
+def parse_types(value):
+    object_types = [object_type.strip() for object_type in value.split(',') if object_type.strip()]
+    unknown = [object_type for object_type in object_types if object_type not in fmc_export.OBJECT_TYPES]
+    if unknown or not object_types:
+        raise argparse.ArgumentTypeError(f"unknown object types: {', '.join(unknown) or value}, choose from {', '.join(fmc_export.OBJECT_TYPES)}")
+    return object_types
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Export FMC objects to CSV, Parquet or Feather without the Streamlit app")
+    parser.add_argument("--host", help="FMC host, default FMC_HOST")
+    parser.add_argument("--domain", help="Domain UUID, default FMC_DOMAIN_ID")
+    parser.add_argument("--policy", help="Access policy UUID for accessrules, default FMC_ACCESS_POLICY_ID")
+    parser.add_argument("--username", help="FMC username, default FMC_USERNAME")
+    parser.add_argument("--password", help="FMC password, default FMC_PASSWORD")
+    parser.add_argument("--token", help="Existing access token instead of a login, default FMC_TOKEN")
+    parser.add_argument("--types", type=parse_types, default=list(fmc_export.OBJECT_TYPES), help="Comma separated object types: " + ', '.join(fmc_export.OBJECT_TYPES))
+    parser.add_argument("--output", default=fmc_export.export_folder, help="Output directory, a snapshot folder is created in it")
+    parser.add_argument("--format", default='csv', choices=list(fmc_formats.FORMATS), help="Output format")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Number of pages requested from FMC at once per object type")
+    parser.add_argument("--delta-sync", action="store_true", help="NetworkGroups, Networks and PortObjectGroups: fetch full details only for new or changed objects")
+    parser.add_argument("--zip", action="store_true", help="Pack the snapshot into <snapshot>.zip")
+    parser.add_argument("--summary", help="JSON run summary, default <snapshot>/snapshot.json")
+    parser.add_argument("--env-file", help=".env style file with FMC_* settings")
+    parser.add_argument("--protocol", default="https", choices=["https", "http"], help="Protocol of the FMC REST API")
+    return parser.parse_args(argv)
+
+
+# Function to merge the settings: arguments over --env-file over environment variables (not the ones from the repository .env)
+def build_settings(args):
+    settings = {key: os.environ[key] for key in SETTING_KEYS if os.environ.get(key) and key not in get_token.dotenv_keys}
+    if args.env_file:
+        settings.update({key: value for key, value in dotenv_values(args.env_file).items() if key in SETTING_KEYS and value})
+    arguments = {'FMC_HOST': args.host, 'FMC_DOMAIN_ID': args.domain, 'FMC_ACCESS_POLICY_ID': args.policy,
+                 'FMC_TOKEN': args.token, 'FMC_USERNAME': args.username, 'FMC_PASSWORD': args.password}
+    settings.update({key: value for key, value in arguments.items() if value})
+    # A login with explicit credentials wins over a token from the environment
+    if (args.username or args.password) and not args.token:
+        settings.pop('FMC_TOKEN', None)
+    return settings
+
+
+# Function to list what is missing to run, empty when the settings are complete
+def missing_settings(settings, object_types):
+    missing = [key for key in ('FMC_HOST', 'FMC_DOMAIN_ID') if not settings.get(key)]
+    if 'accessrules' in object_types and not settings.get('FMC_ACCESS_POLICY_ID'):
+        missing.append('FMC_ACCESS_POLICY_ID')
+    if not settings.get('FMC_TOKEN') and not (settings.get('FMC_USERNAME') and settings.get('FMC_PASSWORD')):
+        missing.append('FMC_TOKEN or FMC_USERNAME/FMC_PASSWORD')
+    return missing
+
+
+# Function to get the exit code of a run summary
+def exit_code(summary):
+    failed = sum(1 for result in summary['results'] if not result['ok'])
+    if not failed:
+        return EXIT_OK
+    return EXIT_FAILED if failed == len(summary['results']) else EXIT_PARTIAL
+
+
+# Function to run the export of the parsed arguments, returns the exit code
+def run(args):
+    settings = build_settings(args)
+    missing = missing_settings(settings, args.types)
+    if missing:
+        print(f"Missing settings: {', '.join(missing)}", file=sys.stderr)
+        return EXIT_USAGE
+
+    output = os.path.abspath(args.output)
+    os.makedirs(output, exist_ok=True)
+    settings['FMC_PROTOCOL'] = args.protocol
+    settings['FMC_CHECKPOINT_FOLDER'] = os.path.join(output, 'state', 'checkpoints')
+
+    # Tokens of this run stay in memory, refresh and new logins use the credentials given here
+    tokens = fmc_token.get_manager()
+    tokens.persist = False
+    if not settings.get('FMC_TOKEN'):
+        tokens.credentials = (settings['FMC_USERNAME'], settings['FMC_PASSWORD'])
+        login = get_token.generate_auth_tokens(args.protocol, settings['FMC_HOST'], settings['FMC_USERNAME'], settings['FMC_PASSWORD'])
+        if not login:
+            print(f"Login to {settings['FMC_HOST']} failed", file=sys.stderr)
+            return EXIT_AUTH
+        settings['FMC_TOKEN'] = tokens.login(*login)
+
+    summary = fmc_export.export_all(args.types, settings, output, args.workers, args.delta_sync, args.format)
+    for result in summary['results']:
+        print(fmc_export.describe_result(result))
+    if args.zip:
+        summary['zip'] = fmc_export.zip_snapshot(summary['path'])
+
+    summary['exit_code'] = exit_code(summary)
+    summary_file = os.path.abspath(args.summary) if args.summary else os.path.join(summary['path'], 'snapshot.json')
+    try:
+        with open(summary_file, 'w') as file:
+            json.dump(summary, file, indent=4, default=str)
+    except OSError as e:
+        print(f"An error occurred while saving the summary to {summary_file}: {e}", file=sys.stderr)
+    print(f"Snapshot {summary['path']} in {summary['seconds']:.1f} s, summary saved to {summary_file}")
+    return summary['exit_code']
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        return run(args)
+    except Exception:
+        traceback.print_exc()
+        return EXIT_ERROR
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+
+"""
+Shared HTTP client for FMC REST API calls
+
+One requests.Session per process with a persistent connection pool, so
+pages reuse keep-alive connections (and their TLS sessions) instead of
+doing a TCP + TLS handshake per request. Responses are requested
+gzip-compressed, every call gets connect/read timeouts and requests and
+bytes are counted per endpoint. Every request is paced by the shared
+rate scheduler in fmc_ratelimit.py and HTTP 429 is retried here. Bytes
+and waiting are reported to the progress tracker of fmc_progress.py.
+
+Used by:
+    get_token.py, fmc_fetch.py (get_accessrules.py, get_networks.py, get_networkgroups.py, get_portobjectgroups.py)
+"""
+
+__author__ = "Sasa Kovacic"
+__email__ = "sasa.kovacic@storm.hr"
+__version__ = "1.0"
+
+
+import os
+import time
+import threading
+import requests
+import fmc_ratelimit
+import fmc_trace
+import fmc_progress
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+
+import warnings
+from requests.packages.urllib3.exceptions import InsecureRequestWarning
+
+# Suppress only the single InsecureRequestWarning from urllib3 needed
+warnings.simplefilter('ignore', InsecureRequestWarning)
+
+CONNECT_TIMEOUT = float(os.getenv('FMC_CONNECT_TIMEOUT', '10'))   # Seconds to open a connection
+READ_TIMEOUT = float(os.getenv('FMC_READ_TIMEOUT', '120'))        # Seconds to wait for a response
+POOL_SIZE = 10  # FMC accepts at most 10 concurrent connections per client
+MAX_RETRIES = 5  # Retries of a single request after HTTP 429
+
+_session = None
+_session_lock = threading.Lock()
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+# Function to create the pooled session on first use
+def get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            session.verify = False  # FMC usually runs with a self-signed certificate
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, pool_block=True)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            session.headers.update({
+                'Content-Type': 'application/json',
+                'Accept': 'application/json',
+                'Accept-Encoding': 'gzip, deflate',
+                'Connection': 'keep-alive'
+            })
+            _session = session
+    return _session
+
+
+# Function to count a request and its size for the endpoint it hit
+def _record(url, response):
+    endpoint = urlparse(url).path
+    size = len(response.content)
+    # Content-Length is the compressed size when the response was gzipped
+    wire_size = int(response.headers.get('Content-Length', size))
+    with _stats_lock:
+        stats = _stats.setdefault(endpoint, {'requests': 0, 'bytes': 0, 'wire_bytes': 0})
+        stats['requests'] += 1
+        stats['bytes'] += size
+        stats['wire_bytes'] += wire_size
+    fmc_progress.received(wire_size)
+
+
+# Function to send a request through the shared session, paced and retried on HTTP 429
+def request(method, url, headers=None, **kwargs):
+    kwargs.setdefault('timeout', (CONNECT_TIMEOUT, READ_TIMEOUT))
+    limiter = fmc_ratelimit.get_limiter()
+
+    for attempt in range(MAX_RETRIES + 1):
+        waited = time.monotonic()
+        with fmc_trace.span('rate limit', 'rate_limit'):
+            limiter.acquire()
+        fmc_progress.rate_waited(time.monotonic() - waited)
+        with fmc_trace.span(method, 'http', url=urlparse(url).path, attempt=attempt) as span_args:
+            response = get_session().request(method, url, headers=headers, **kwargs)
+            span_args.update(status=response.status_code, bytes=len(response.content))
+        _record(url, response)
+        if response.status_code != 429 or attempt == MAX_RETRIES:
+            return response
+
+        sleep_time = fmc_ratelimit.retry_delay(response, attempt)
+        print(f"Rate limit exceeded. Retrying in {sleep_time:.0f} seconds...")
+        fmc_progress.throttled(sleep_time)
+        # Pause the shared bucket so every other thread backs off as well
+        limiter.pause(sleep_time)
+
+
+def get(url, headers=None, **kwargs):
+    return request('GET', url, headers=headers, **kwargs)
+
+
+def post(url, headers=None, **kwargs):
+    return request('POST', url, headers=headers, **kwargs)
+
+
+# Function to get a copy of the per endpoint counters
+def get_stats():
+    with _stats_lock:
+        return {endpoint: dict(stats) for endpoint, stats in _stats.items()}
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+# Function to summarize the counters in one line
+def format_stats(stats=None):
+    stats = get_stats() if stats is None else stats
+    requests_total = sum(s['requests'] for s in stats.values())
+    bytes_total = sum(s['bytes'] for s in stats.values())
+    wire_total = sum(s['wire_bytes'] for s in stats.values())
+    return f"{requests_total} requests, {bytes_total / 1048576:.2f} MB ({wire_total / 1048576:.2f} MB on the wire)"
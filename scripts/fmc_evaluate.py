@@ -0,0 +1,478 @@
+#!/usr/bin/env python3
+
+"""
+Offline evaluation of flows against the exported access policy
+
+Compiles fmc_accessrules.json into per-field lookup tables and answers,
+for a (source zone, destination zone, source IP, destination IP,
+protocol, destination port) tuple, which rule matches first in policy
+order and its action.
+
+Every field has a table whose rows are packed bitsets (one bit per rule,
+64 rules per uint64 word) of the rules that match that row:
+    zones: one row per zone named in the policy, plus one for any other zone
+    networks: one row per elementary address segment (the boundaries of all
+              rule ranges cut the address space into segments), IPv4 and IPv6
+    ports: one row per elementary port segment of every protocol, plus one
+           for any other protocol
+Rules without a condition on a field have their bit set in every row of
+that field. A flow picks one row per field (binary search), the rows are
+ANDed and the lowest set bit is the first matching rule. Batches of flows
+are evaluated with NumPy over whole chunks, so a CSV of millions of flows
+is streamed through in bounded memory.
+
+The tables take rows x ceil(rules / 64) x 8 bytes, and the number of rows
+grows with the number of distinct ranges, so large policies grow about
+quadratically (50k rules with 50k distinct ranges are several GB). The
+total is checked before anything is allocated, compiling fails with a
+ValueError above FMC_EVALUATE_MAX_TABLE_MB (default 2048).
+
+Network objects are resolved with the networks and networkgroups exports
+(fmc_resolve.py), port groups with the portobjectgroups export. Members
+that cannot be resolved (hosts, ranges, FQDNs, geolocation, port objects
+without a port) are listed in policy['unresolved'] and never match, so a
+flow they would match may fall through to a later rule. Every verdict that
+passed over an enabled rule with unresolved members is marked Uncertain.
+Disabled rules never match. Only zones, networks, protocol and destination port are
+evaluated; source ports, applications, URLs and users are not part of the
+tuple and are ignored. A flow that matches no rule gets the policy default
+action (not in the export), shown as an empty action.
+
+Args:
+    --flows (str): CSV with the columns src_zone, dst_zone, src_ip, dst_ip, protocol, dst_port
+    --output (str): CSV written with the flow columns plus Rule Index, Rule Name, Action and Uncertain
+    or the tuple: src_zone dst_zone src_ip dst_ip protocol dst_port
+
+Usage:
+    python scripts/fmc_evaluate.py inside outside 10.1.2.3 8.8.8.8 tcp 443
+    python scripts/fmc_evaluate.py --flows flows.csv --output verdicts.csv
+
+Input File Format:
+    JSON files: fmc_accessrules.json, fmc_networks.json, fmc_networkgroups.json, fmc_portobjectgroups.json (Export buttons)
+"""
+
+__author__ = "Sasa Kovacic"
+__email__ = "sasa.kovacic@storm.hr"
+__version__ = "1.0"
+
+
+import os
+import json
+import uuid
+import time
+import bisect
+import argparse
+import ipaddress
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from fmc_resolve import resolve_groups, resolved_values
+from fmc_ipindex import parse_value
+from fmc_jsonstream import iter_json_items
+
+export_folder = 'export'
+
+FLOW_COLUMNS = ['src_zone', 'dst_zone', 'src_ip', 'dst_ip', 'protocol', 'dst_port']
+CHUNK_SIZE = 200000  # Flows evaluated at once in batch mode
+
+PROTOCOLS = {'tcp': 6, 'udp': 17, 'icmp': 1, 'ipv6-icmp': 58, 'icmpv6': 58, 'gre': 47, 'esp': 50, 'sctp': 132}
+MAX_PORT = 65535
+FIELDS = {'sourceNetworks': 'src_networks', 'destinationNetworks': 'dst_networks', 'destinationPorts': 'dst_ports'}
+MAX_TABLE_MB = int(os.getenv('FMC_EVALUATE_MAX_TABLE_MB', '2048'))  # Memory the compiled tables may take
+
+
+# Function to get a protocol number from '6', 'TCP' or 6, None if unknown
+def protocol_number(protocol):
+    protocol = str(protocol).strip().lower()
+    if protocol.isdigit():
+        return int(protocol)
+    return PROTOCOLS.get(protocol)
+
+
+# Function to parse a port or port range ('443', '1024-65535'), None if not a port
+def parse_ports(port):
+    try:
+        first, _, last = str(port).partition('-')
+        first, last = int(first), int(last or first)
+    except ValueError:
+        return None
+    return (first, last) if 0 <= first <= last <= MAX_PORT else None
+
+
+# Function to read the items of an exported JSON file, empty when the file is missing
+def load_items(json_file):
+    if not os.path.exists(json_file):
+        return []
+    return [item for items in iter_json_items(json_file) for item in items]
+
+
+# Function to merge overlapping or adjacent (first, last) ranges
+def _merge(ranges):
+    merged = []
+    for first, last in sorted(ranges):
+        if merged and first <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], last)
+        else:
+            merged.append([first, last])
+    return [tuple(interval) for interval in merged]
+
+
+# Function to compile the network condition of a rule: None for any, else {version: merged ranges}
+def _compile_networks(condition, lookup, unresolved, rule_name, field):
+    if not condition or not (condition.get('objects') or condition.get('literals')):
+        return None
+    ranges = {4: [], 6: []}
+    values = [literal.get('value', '') for literal in condition.get('literals', [])]
+    for obj in condition.get('objects', []):
+        member_values = lookup.get(obj.get('id')) or lookup.get(obj.get('name'))
+        if member_values is None:
+            unresolved.append((rule_name, field, obj.get('name', obj.get('id', ''))))
+            continue
+        values.extend(member_values)
+    for value in values:
+        parsed = parse_value(value)
+        if parsed is None:
+            unresolved.append((rule_name, field, value))
+            continue
+        ranges[parsed[0]].append(parsed[1:])
+    return {version: _merge(version_ranges) for version, version_ranges in ranges.items()}
+
+
+# Function to get (protocol, first port, last port) of a port literal or object, port range of None means any port
+def _port_entry(entry):
+    protocol = protocol_number(entry.get('protocol', ''))
+    if protocol is None:
+        return None
+    if entry.get('port') in (None, ''):
+        return protocol, 0, MAX_PORT  # Protocol only, e.g. ICMP or "TCP any"
+    ports = parse_ports(entry['port'])
+    return None if ports is None else (protocol, *ports)
+
+
+# Function to compile the port condition of a rule: None for any, else {protocol: merged port ranges}
+def _compile_ports(condition, port_groups, unresolved, rule_name):
+    if not condition or not (condition.get('objects') or condition.get('literals')):
+        return None
+    entries = list(condition.get('literals', []))
+    pending = list(condition.get('objects', []))
+    seen = set()
+    while pending:
+        obj = pending.pop()
+        group = (port_groups.get(obj.get('id')) or port_groups.get(obj.get('name'))) if obj.get('type') == 'PortObjectGroup' else None
+        if group is not None:
+            if id(group) not in seen:
+                seen.add(id(group))
+                pending.extend(group.get('objects', []))
+                entries.extend(group.get('literals', []))
+        else:
+            entries.append(obj)
+
+    ranges = {}
+    for entry in entries:
+        port_entry = _port_entry(entry)
+        if port_entry is None:
+            unresolved.append((rule_name, 'destinationPorts', entry.get('name', entry.get('port', ''))))
+            continue
+        ranges.setdefault(port_entry[0], []).append(port_entry[1:])
+    return {protocol: _merge(protocol_ranges) for protocol, protocol_ranges in ranges.items()}
+
+
+# Function to compile the zone condition of a rule: None for any, else set of zone names
+def _compile_zones(condition):
+    names = {obj['name'] for obj in (condition or {}).get('objects', [])}
+    return names or None
+
+
+# Function to set the bit of every rule in the given rows of a packed bitset table
+def _set_bit(table, rows, rule):
+    table[rows, rule >> 6] |= np.uint64(1) << np.uint64(rule & 63)
+
+
+# Function to get the sorted segment starts that {rule: merged ranges} cut [0, size) into
+def _segment_starts(rule_ranges, size):
+    boundaries = {0}
+    for ranges in rule_ranges.values():
+        for first, last in ranges:
+            boundaries.add(first)
+            if last + 1 < size:
+                boundaries.add(last + 1)
+    return sorted(boundaries)
+
+
+# Function to build the segment table of {rule: merged ranges} over the segment starts, any_rules match every row
+def _segment_table(starts, rule_ranges, any_rules, words):
+    table = np.zeros((len(starts), words), dtype=np.uint64)
+    for rule in any_rules:
+        _set_bit(table, slice(None), rule)
+    for rule, ranges in rule_ranges.items():
+        for first, last in ranges:
+            # Python ints, IPv6 addresses do not fit a NumPy integer
+            _set_bit(table, slice(bisect.bisect_left(starts, first), bisect.bisect_left(starts, last + 1)), rule)
+    return table
+
+
+# Function to compile the exported access rules into lookup tables
+def compile_policy(rules, networks=(), networkgroups=(), portobjectgroups=()):
+    resolved, _ = resolve_groups(networkgroups, networks)
+    lookup = {}
+    for network in networks:
+        for key in (network.get('id'), network.get('name')):
+            lookup.setdefault(key, [network.get('value', '')])
+    for group in networkgroups:
+        for key in (group.get('id'), group.get('name')):
+            lookup.setdefault(key, list(resolved_values(resolved, group)))
+    port_groups = {}
+    for group in portobjectgroups:
+        for key in (group.get('id'), group.get('name')):
+            port_groups.setdefault(key, group)
+
+    unresolved = []
+    compiled = []
+    for position, rule in enumerate(rules, start=1):
+        name = rule.get('name', '')
+        before = len(unresolved)
+        compiled.append({
+            'index': position,
+            'name': name,
+            'action': rule.get('action', ''),
+            'enabled': rule.get('enabled', True),
+            'src_zones': _compile_zones(rule.get('sourceZones')),
+            'dst_zones': _compile_zones(rule.get('destinationZones')),
+            'src_networks': _compile_networks(rule.get('sourceNetworks'), lookup, unresolved, name, 'sourceNetworks'),
+            'dst_networks': _compile_networks(rule.get('destinationNetworks'), lookup, unresolved, name, 'destinationNetworks'),
+            'dst_ports': _compile_ports(rule.get('destinationPorts'), port_groups, unresolved, name),
+        })
+        compiled[-1]['unresolved'] = tuple(sorted({FIELDS[field] for _, field, _ in unresolved[before:]}))  # Fields with unresolved members
+    return build_tables(compiled, unresolved)
+
+
+# Function to build the per field tables of compiled rules
+def build_tables(compiled, unresolved=()):
+    words = max(1, (len(compiled) + 63) // 64)
+    active = [i for i, rule in enumerate(compiled) if rule['enabled']]
+    policy = {
+        'rules': compiled,
+        'unresolved': list(unresolved),
+        'words': words,
+        'index': np.array([rule['index'] for rule in compiled] + [0], dtype=np.int64),
+        'names': np.array([rule['name'] for rule in compiled] + [''], dtype=object),
+        'actions': np.array([rule['action'] for rule in compiled] + [''], dtype=object),
+        # True once an enabled rule with unresolved members comes before the rule, the last entry is no match
+        'uncertain': np.cumsum([0] + [bool(rule['enabled'] and rule.get('unresolved')) for rule in compiled]) > 0,
+    }
+
+    # Rows of every table, checked against the memory budget before anything is allocated
+    zone_names = {field: sorted({zone for i in active if compiled[i][field] for zone in compiled[i][field]})
+                  for field in ('src_zones', 'dst_zones')}
+    network_ranges = {(field, version): {i: compiled[i][field][version] for i in active if compiled[i][field] is not None}
+                      for field in ('src_networks', 'dst_networks') for version in (4, 6)}
+    network_starts = {key: _segment_starts(rule_ranges, 1 << (32 if key[1] == 4 else 128)) for key, rule_ranges in network_ranges.items()}
+    protocols = sorted({protocol for i in active if compiled[i]['dst_ports'] for protocol in compiled[i]['dst_ports']})
+    port_ranges = {protocol: {i: compiled[i]['dst_ports'][protocol] for i in active
+                              if compiled[i]['dst_ports'] is not None and protocol in compiled[i]['dst_ports']}
+                   for protocol in protocols}
+    port_starts = {protocol: _segment_starts(rule_ranges, MAX_PORT + 1) for protocol, rule_ranges in port_ranges.items()}
+    rows = sum(len(zones) + 1 for zones in zone_names.values()) + 3  # Plus the any address rows and the other protocol row
+    rows += sum(map(len, network_starts.values())) + sum(map(len, port_starts.values()))
+    table_mb = rows * words * 8 / 2 ** 20
+    if table_mb > MAX_TABLE_MB:
+        raise ValueError(f"Compiling {len(compiled)} rules needs {table_mb:,.0f} MB of tables ({rows} rows), "
+                         f"more than FMC_EVALUATE_MAX_TABLE_MB={MAX_TABLE_MB}")
+
+    # Zones, last row is any zone not named in the policy
+    for field in ('src_zones', 'dst_zones'):
+        zones = zone_names[field]
+        rows = {zone: row for row, zone in enumerate(zones)}
+        table = np.zeros((len(zones) + 1, words), dtype=np.uint64)
+        for i in active:
+            if compiled[i][field] is None:
+                _set_bit(table, slice(None), i)
+            else:
+                _set_bit(table, [rows[zone] for zone in compiled[i][field]], i)
+        policy[field] = (rows, table)
+
+    # Networks, one segment table per IP version, plus the rules for any address (used for invalid ones)
+    for field in ('src_networks', 'dst_networks'):
+        any_rules = [i for i in active if compiled[i][field] is None]
+        any_row = np.zeros((1, words), dtype=np.uint64)
+        for i in any_rules:
+            _set_bit(any_row, slice(None), i)
+        policy[f'{field}_any'] = any_row
+        for version in (4, 6):
+            starts = network_starts[(field, version)]
+            table = _segment_table(starts, network_ranges[(field, version)], any_rules, words)
+            keys = np.array(starts, dtype=np.int64) if version == 4 else np.array([start.to_bytes(16, 'big') for start in starts], dtype='S16')
+            policy[f'{field}_v{version}'] = (keys, table)
+
+    # Ports, one segment table per protocol named in the policy plus a row for other protocols
+    any_rules = [i for i in active if compiled[i]['dst_ports'] is None]
+    ports = {}
+    for protocol in protocols:
+        starts = port_starts[protocol]
+        table = _segment_table(starts, port_ranges[protocol], any_rules, words)
+        ports[protocol] = (np.array(starts, dtype=np.int64), table)
+    other = np.zeros((1, words), dtype=np.uint64)
+    for i in any_rules:
+        _set_bit(other, slice(None), i)
+    policy['dst_ports'] = (ports, other)
+    return policy
+
+
+# Function to load and compile the policy from the JSON exports in folder
+def load_policy(folder=export_folder):
+    path = lambda object_type: os.path.join(folder, f"fmc_{object_type}.json")
+    if not os.path.exists(path('accessrules')):
+        raise FileNotFoundError(f"{path('accessrules')} not found, run Export for AccessRules first")
+    return compile_policy(
+        load_items(path('accessrules')),
+        load_items(path('networks')),
+        load_items(path('networkgroups')),
+        load_items(path('portobjectgroups'))
+    )
+
+
+# Function to get the table rows of the zones of a flow column
+def _zone_rows(policy, field, zones):
+    rows, table = policy[field]
+    return table[zones.map(rows).fillna(len(rows)).to_numpy(dtype=np.int64)]
+
+
+# Function to parse IPs into (version array, IPv4 int64 array, IPv6 S16 array), version 0 if not an IP
+def _parse_ips(ips):
+    ips = pa.array(ips.astype(str).to_numpy(dtype=object), type=pa.string())
+    ips = pc.utf8_trim_whitespace(ips)
+    versions = np.zeros(len(ips), dtype=np.int8)
+    v4 = np.zeros(len(ips), dtype=np.int64)
+    v6 = np.zeros(len(ips), dtype='S16')
+
+    # Dotted IPv4 is split and cast column wise with Arrow kernels
+    is_v4 = pc.match_substring_regex(ips, r'^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}$').to_numpy(zero_copy_only=False)
+    if is_v4.any():
+        octets = pc.cast(pc.list_flatten(pc.split_pattern(ips.filter(pa.array(is_v4)), '.')), pa.int64()).to_numpy().reshape(-1, 4)
+        valid = (octets <= 255).all(axis=1)
+        rows = np.flatnonzero(is_v4)[valid]
+        v4[rows] = (octets[valid] << np.array([24, 16, 8, 0])).sum(axis=1)
+        versions[rows] = 4
+
+    # IPv6 and anything unusual one by one, each distinct value once
+    others = np.flatnonzero(~is_v4)
+    values = ips.take(pa.array(others)).to_numpy(zero_copy_only=False)
+    codes, uniques = pd.factorize(values)
+    for code, value in enumerate(uniques):
+        try:
+            address = ipaddress.ip_address(value)
+        except ValueError:
+            continue
+        rows = others[codes == code]
+        versions[rows] = address.version
+        if address.version == 4:
+            v4[rows] = int(address)
+        else:
+            v6[rows] = int(address).to_bytes(16, 'big')
+    return versions, v4, v6
+
+
+# Function to get the table rows of the addresses of a flow column, an invalid address only matches rules for any address
+def _network_rows(policy, field, ips):
+    versions, v4, v6 = _parse_ips(ips)
+    masks = np.repeat(policy[f'{field}_any'], len(ips), axis=0)
+    for version, addresses in ((4, v4), (6, v6)):
+        keys, table = policy[f'{field}_v{version}']
+        rows = versions == version
+        if rows.any():
+            masks[rows] = table[np.searchsorted(keys, addresses[rows], 'right') - 1]
+    return masks
+
+
+# Function to get the table rows of the protocol and destination port of a flow
+def _port_rows(policy, protocols, ports):
+    tables, other = policy['dst_ports']
+    # Few distinct protocols, each is parsed once
+    codes, uniques = pd.factorize(protocols)
+    protocol_numbers = np.array([protocol_number(protocol) or -1 for protocol in uniques] + [-1], dtype=np.int64)[codes]
+    port_numbers = pd.to_numeric(ports, errors='coerce').fillna(0).to_numpy(dtype=np.int64)
+    masks = np.repeat(other, len(protocols), axis=0)
+    for protocol, (keys, table) in tables.items():
+        rows = protocol_numbers == protocol
+        if rows.any():
+            masks[rows] = table[np.searchsorted(keys, port_numbers[rows], 'right') - 1]
+    return masks
+
+
+# Function to evaluate a DataFrame of flows, returns the rule position (0 for no match) of every flow
+def evaluate_frame(policy, flows):
+    masks = _zone_rows(policy, 'src_zones', flows['src_zone'].astype(str))
+    masks &= _zone_rows(policy, 'dst_zones', flows['dst_zone'].astype(str))
+    masks &= _network_rows(policy, 'src_networks', flows['src_ip'])
+    masks &= _network_rows(policy, 'dst_networks', flows['dst_ip'])
+    masks &= _port_rows(policy, flows['protocol'].astype(str), flows['dst_port'])
+
+    # First non zero word, then its lowest set bit (x & -x is a power of two, log2 is exact)
+    nonzero = masks != 0
+    matched = nonzero.any(axis=1)
+    word = nonzero.argmax(axis=1)
+    value = masks[np.arange(len(masks)), word]
+    lowest = value & (~value + np.uint64(1))
+    bit = np.log2(np.where(matched, lowest, 1).astype(np.float64)).astype(np.int64)
+    return np.where(matched, word * 64 + bit, len(policy['rules']))
+
+
+# Function to evaluate one flow, returns {'Rule Index', 'Rule Name', 'Action', 'Uncertain'}, empty action when no rule matches
+def evaluate(policy, src_zone, dst_zone, src_ip, dst_ip, protocol, dst_port):
+    flows = pd.DataFrame([[src_zone, dst_zone, src_ip, dst_ip, protocol, dst_port]], columns=FLOW_COLUMNS)
+    rule = evaluate_frame(policy, flows)[0]
+    return {
+        'Rule Index': int(policy['index'][rule]),
+        'Rule Name': policy['names'][rule],
+        'Action': policy['actions'][rule],
+        'Uncertain': bool(policy['uncertain'][rule])
+    }
+
+
+# Function to evaluate a CSV of flows chunk by chunk and write the verdicts, returns (flows, seconds)
+def evaluate_csv(policy, flows_file, output_file, chunk_size=CHUNK_SIZE):
+    started = time.monotonic()
+    count = 0
+    part_file = f"{output_file}.{uuid.uuid4().hex[:8]}.part"
+    try:
+        reader = pd.read_csv(flows_file, dtype=str, keep_default_na=False, chunksize=chunk_size)
+        for number, flows in enumerate(reader):
+            missing = [column for column in FLOW_COLUMNS if column not in flows.columns]
+            if missing:
+                raise ValueError(f"{flows_file} is missing the columns {', '.join(missing)}")
+            rules = evaluate_frame(policy, flows)
+            flows['Rule Index'] = policy['index'][rules]
+            flows['Rule Name'] = policy['names'][rules]
+            flows['Action'] = policy['actions'][rules]
+            flows['Uncertain'] = policy['uncertain'][rules]
+            flows.to_csv(part_file, mode='w' if number == 0 else 'a', header=number == 0, index=False)
+            count += len(flows)
+        os.replace(part_file, output_file)
+    finally:
+        if os.path.exists(part_file):
+            os.remove(part_file)
+    return count, time.monotonic() - started
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("flow", nargs='*', help="src_zone dst_zone src_ip dst_ip protocol dst_port")
+    parser.add_argument("--flows", help="CSV of flows to evaluate")
+    parser.add_argument("--output", default='export/fmc_flow_verdicts.csv', help="CSV written in batch mode")
+    args = parser.parse_args()
+
+    policy = load_policy()
+    for rule_name, field, member in policy['unresolved']:
+        print(f"Unresolved {field} member in {rule_name}: {member}")
+
+    if args.flows:
+        count, seconds = evaluate_csv(policy, args.flows, args.output)
+        print(f"{count} flows evaluated in {seconds:.1f} s ({count / max(seconds, 1e-9):,.0f} flows/s), saved to {args.output}")
+    elif len(args.flow) == len(FLOW_COLUMNS):
+        result = evaluate(policy, *args.flow)
+        print(json.dumps(result) if result['Action'] else "No rule matches, default action")
+        if result['Uncertain']:
+            print("Uncertain: an earlier rule has unresolved members and might match this flow")
+    else:
+        parser.error("give the 6 flow fields or --flows")
@@ -0,0 +1,559 @@
+#!/usr/bin/env python3
+
+"""
+In-process export and convert functions for the Streamlit app
+
+Wraps the get_*.py fetch scripts and *_to_csv.py converters as plain
+function calls, so the app does not start a new interpreter (and re-import
+pandas, requests and dotenv) on every click. Settings are re-read from .env
+on every call, so a new token is picked up without restarting the app.
+Besides the .env keys, settings may hold FMC_PROTOCOL and
+FMC_CHECKPOINT_FOLDER, otherwise protocol and checkpoint_folder below apply.
+
+Every function returns a result dict:
+    object_type (str): accessrules | networkgroups | networks | portobjectgroups
+    label (str): display name, e.g. AccessRules
+    ok (bool): True when the step finished
+    rows (int): number of items fetched or rows written
+    seconds (float): wall time of the step
+    path (str): file that was written, None on failure
+    error (str): error message, None on success
+    sync (dict): delta sync summary, only for sync_json/sync_csv
+    trace (str): Chrome trace of the step (fmc_<object type>.trace.json next to the export), see fmc_trace.py
+"""
+
+__author__ = "Sasa Kovacic"
+__email__ = "sasa.kovacic@storm.hr"
+__version__ = "1.0"
+
+
+import os
+import json
+import uuid
+import pandas as pd
+import time
+import shutil
+import inspect
+import functools
+from datetime import datetime
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed, wait
+from dotenv import dotenv_values
+
+import get_token
+import get_accessrules
+import get_networkgroups
+import get_networks
+import get_portobjectgroups
+import fmc_state
+import fmc_policies
+import accessrules_to_csv
+import networkgroups_to_csv
+import networks_to_csv
+import portobjectgroups_to_csv
+import fmc_formats
+import fmc_evaluate
+import fmc_analyze
+import fmc_trace
+import fmc_token
+import fmc_progress
+from fmc_fetch import iter_pages, FetchError, DEFAULT_WORKERS
+from fmc_pipeline import write_pages_to_csv
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+dotenv_path = os.path.join(project_root, '.env')
+export_folder = os.path.join(project_root, 'export')
+checkpoint_folder = os.path.join(export_folder, 'state', 'checkpoints')  # Pages of failed exports, shared by every snapshot
+
+protocol = "https"
+
+# Object type: (display name, converter module, converter function)
+OBJECT_TYPES = {
+    'accessrules': ('AccessRules', accessrules_to_csv, accessrules_to_csv.convert_accessrules),
+    'networkgroups': ('NetworkGroups', networkgroups_to_csv, networkgroups_to_csv.convert_networkgroups),
+    'networks': ('Networks', networks_to_csv, networks_to_csv.convert_networks),
+    'portobjectgroups': ('PortObjectGroups', portobjectgroups_to_csv, portobjectgroups_to_csv.convert_portobjectgroups),
+}
+
+# Object types that can be delta synced, they have per object endpoints
+SYNC_TYPES = ('networkgroups', 'networks', 'portobjectgroups')
+
+POLICY_WORKERS = int(os.getenv('FMC_POLICY_WORKERS', '4'))  # Access policies exported at once
+STREAM_THRESHOLD = float(os.getenv('FMC_STREAM_THRESHOLD_MB', '100')) * 1024 * 1024  # Larger JSON files are converted in streaming mode
+
+
+# Function to read the FMC settings from .env
+def load_settings():
+    return {key: value for key, value in dotenv_values(dotenv_path).items() if value is not None}
+
+
+# Function to get the protocol of the FMC REST API of the settings
+def _protocol(settings):
+    return settings.get('FMC_PROTOCOL') or protocol
+
+
+# Function to get the checkpoint folder of the settings
+def _checkpoints(settings):
+    return settings.get('FMC_CHECKPOINT_FOLDER') or checkpoint_folder
+
+
+# Function to build the paged list URL of an object type
+def object_url(object_type, settings, expanded=True):
+    hostname = settings.get('FMC_HOST')
+    domain_id = settings.get('FMC_DOMAIN_ID')
+    protocol = _protocol(settings)
+    if object_type == 'accessrules':
+        return get_accessrules.accessrules_url(protocol, hostname, domain_id, settings.get('FMC_ACCESS_POLICY_ID'))
+    if object_type == 'networkgroups':
+        return get_networkgroups.networkgroups_url(protocol, hostname, domain_id, expanded)
+    if object_type == 'networks':
+        return get_networks.networks_url(protocol, hostname, domain_id, expanded)
+    if object_type == 'portobjectgroups':
+        return get_portobjectgroups.portobjectgroups_url(protocol, hostname, domain_id, expanded)
+    raise ValueError(f"Unknown object type: {object_type}")
+
+
+# Function to get the key of identical requests: step, object type, output format and the FMC target
+def request_key(step, object_type, output_format, settings):
+    return (step, object_type, output_format, settings.get('FMC_HOST'), settings.get('FMC_DOMAIN_ID'), settings.get('FMC_ACCESS_POLICY_ID'))
+
+
+def json_path(object_type, folder=export_folder):
+    return os.path.join(folder, f"fmc_{object_type}.json")
+
+
+def csv_path(object_type, folder=export_folder):
+    return os.path.join(folder, f"fmc_{object_type}.csv")
+
+
+# Function to get the converted file of an object type, .csv, .parquet or .feather
+def output_path(object_type, output_format='csv', folder=export_folder):
+    return fmc_formats.output_path(csv_path(object_type, folder), output_format)
+
+
+def trace_path(object_type, folder=export_folder):
+    return os.path.join(folder, f"fmc_{object_type}{fmc_trace.TRACE_SUFFIX}")
+
+
+def state_path(object_type, folder=export_folder):
+    return os.path.join(folder, 'state', f"fmc_{object_type}_state.json")
+
+
+# Function to write the items as JSON next to the target and move it into place, readers never see a partial file
+def save_json(items, filename):
+    part_file = f"{filename}.{uuid.uuid4().hex[:8]}.part"
+    with fmc_trace.span('write json', 'write', items=len(items)):
+        with open(part_file, 'w') as file:
+            json.dump({"items": items}, file, indent=4)
+    os.replace(part_file, filename)
+
+
+# Function to get the network objects used to resolve network group members
+def network_items(folder=export_folder, settings=None, max_workers=DEFAULT_WORKERS, state_folder=export_folder):
+    # Live exports fetch the networks too (1000 per request), so both lists are from the same moment
+    if settings and settings.get('FMC_TOKEN'):
+        items = []
+        for page in iter_pages(object_url('networks', settings), settings['FMC_TOKEN'], max_workers=max_workers):
+            items.extend(page)
+        return items
+    # Offline conversion uses the networks export, else the delta sync store the groups were synced with
+    if os.path.exists(json_path('networks', folder)):
+        return networkgroups_to_csv.load_networks(json_path('networks', folder))
+    return fmc_state.state_items(fmc_state.load_state(state_path('networks', state_folder)))
+
+
+# Function decorator to record a trace of the step and write it next to the export, nested steps add to the outer trace
+def _traced(step):
+    signature = inspect.signature(step)
+
+    @functools.wraps(step)
+    def run(*args, **kwargs):
+        arguments = signature.bind(*args, **kwargs)
+        arguments.apply_defaults()
+        object_type = arguments.arguments['object_type']
+        trace = fmc_trace.start(f"{step.__name__} {object_type}")
+        try:
+            result = step(*args, **kwargs)
+        except BaseException:
+            if trace is not None:
+                fmc_trace.finish(trace)
+            raise
+        if trace is not None:
+            result['trace'] = fmc_trace.finish(trace, trace_path(object_type, arguments.arguments['folder']), result)
+        return result
+    return run
+
+
+def _result(object_type, started, rows=0, path=None, error=None):
+    return {
+        'object_type': object_type,
+        'label': OBJECT_TYPES[object_type][0],
+        'ok': error is None,
+        'rows': rows,
+        'seconds': time.monotonic() - started,
+        'path': path,
+        'error': error
+    }
+
+
+# Function to fetch an object type from FMC and save it as JSON
+@_traced
+def export_json(object_type, settings=None, folder=export_folder, max_workers=DEFAULT_WORKERS):
+    started = time.monotonic()
+    settings = load_settings() if settings is None else settings
+    if not settings.get('FMC_TOKEN'):
+        return _result(object_type, started, error="No token found, please login first")
+
+    filename = json_path(object_type, folder)
+    try:
+        items = []
+        for page in iter_pages(object_url(object_type, settings), settings['FMC_TOKEN'], max_workers=max_workers, checkpoint_folder=_checkpoints(settings)):
+            items.extend(page)
+        save_json(items, filename)
+    except FetchError as e:
+        return _result(object_type, started, error=f"Failed to get {OBJECT_TYPES[object_type][0]}: {e}")
+    except OSError as e:
+        return _result(object_type, started, error=f"An error occurred while saving to {filename}: {e}")
+    except (ValueError, KeyError) as e:
+        return _result(object_type, started, error=f"Failed to process {OBJECT_TYPES[object_type][0]}: {type(e).__name__}: {e}")
+
+    return _result(object_type, started, rows=len(items), path=filename)
+
+
+# Function to convert a previously exported JSON file to CSV, Parquet or Feather
+@_traced
+def convert_json(object_type, folder=export_folder, output_format='csv', state_folder=export_folder):
+    started = time.monotonic()
+    filename = json_path(object_type, folder)
+    if not os.path.exists(filename):
+        return _result(object_type, started, error=f"{os.path.basename(filename)} not found, run Export first")
+
+    convert = OBJECT_TYPES[object_type][2]
+    # Large files are read incrementally so memory use stays flat, CSV only
+    stream = output_format == 'csv' and os.path.getsize(filename) > STREAM_THRESHOLD
+    try:
+        if object_type == 'networkgroups':
+            rows = convert(filename, csv_path(object_type, folder), output_format, stream, network_items(folder, state_folder=state_folder))
+        else:
+            rows = convert(filename, csv_path(object_type, folder), output_format, stream)
+    except (OSError, ValueError, KeyError) as e:
+        return _result(object_type, started, error=f"Failed to convert {os.path.basename(filename)}: {e}")
+
+    return _result(object_type, started, rows=rows, path=output_path(object_type, output_format, folder))
+
+
+# Function to find shadowed, redundant and overlapping rules in the exported access rules JSON
+def analyze_json(folder=export_folder):
+    started = time.monotonic()
+    filename = json_path('accessrules', folder)
+    if not os.path.exists(filename):
+        return _result('accessrules', started, error=f"{os.path.basename(filename)} not found, run Export first")
+
+    analysis_file = os.path.join(folder, 'fmc_accessrules_analysis.csv')
+    try:
+        # Networks, network groups and port groups JSON exports are used to resolve objects when present
+        policy = fmc_evaluate.load_policy(folder)
+        rows = fmc_analyze.write_analysis(fmc_analyze.analyze_policy(policy), analysis_file)
+    except (OSError, ValueError, KeyError) as e:
+        return _result('accessrules', started, error=f"Failed to analyze {os.path.basename(filename)}: {e}")
+
+    result = _result('accessrules', started, rows=rows, path=analysis_file)
+    result['label'] = "AccessRules analysis"
+    return result
+
+
+# Function to fetch pages and collect their rows into one DataFrame, for the columnar formats
+def _pages_to_frame(pages, extract_rows, columns):
+    rows = []
+    for items in pages:
+        with fmc_trace.span('extract rows', 'extract', items=len(items)):
+            rows.extend(extract_rows(items, len(rows)))
+    with fmc_trace.span('DataFrame', 'frame', rows=len(rows)):
+        return pd.DataFrame(rows, columns=columns)
+
+
+# Function to pass the pages through and keep their items
+def _collect(pages, items):
+    for page in pages:
+        items.extend(page)
+        yield page
+
+
+# Function to fetch an object type and convert each page straight to CSV (or Parquet/Feather), networks shares them within a run
+@_traced
+def export_csv(object_type, settings=None, folder=export_folder, max_workers=DEFAULT_WORKERS, output_format='csv', networks=None):
+    started = time.monotonic()
+    settings = load_settings() if settings is None else settings
+    if not settings.get('FMC_TOKEN'):
+        return _result(object_type, started, error="No token found, please login first")
+
+    converter = OBJECT_TYPES[object_type][1]
+    filename = output_path(object_type, output_format, folder)
+    # networks (Future): the networks export sets it to its items (None on failure),
+    # the network groups export resolves its members with them instead of fetching the networks again
+    shared = [] if object_type == 'networks' and networks is not None else None
+    try:
+        pages = iter_pages(object_url(object_type, settings), settings['FMC_TOKEN'], max_workers=max_workers, checkpoint_folder=_checkpoints(settings))
+        if shared is not None:
+            pages = _collect(pages, shared)
+        extract_rows = converter.extract_rows
+        if object_type == 'networkgroups':
+            # Nested groups can be on any page, groups are resolved once all pages are in
+            groups = [item for page in pages for item in page]
+            items = networks.result() if networks is not None else None
+            if items is None:
+                items = network_items(folder, settings, max_workers)
+            with fmc_trace.span('resolve groups', 'resolve', groups=len(groups)):
+                resolved = converter.resolve(groups, items)
+            pages = [groups]
+            extract_rows = lambda items, start_index: converter.extract_rows(items, start_index, resolved)
+        if output_format == 'csv':
+            rows = write_pages_to_csv(pages, extract_rows, converter.COLUMNS, filename)
+        else:
+            # Columnar files are written in one go, the whole table is held in memory
+            df = _pages_to_frame(pages, extract_rows, converter.COLUMNS)
+            fmc_formats.write_frame(df, csv_path(object_type, folder), output_format, converter.DICTIONARY_COLUMNS)
+            rows = len(df)
+        if shared is not None:
+            networks.set_result(shared)
+    except FetchError as e:
+        return _result(object_type, started, error=f"Failed to get {OBJECT_TYPES[object_type][0]}: {e}")
+    except OSError as e:
+        return _result(object_type, started, error=f"An error occurred while saving to {filename}: {e}")
+    except (ValueError, KeyError) as e:
+        return _result(object_type, started, error=f"Failed to process {OBJECT_TYPES[object_type][0]}: {type(e).__name__}: {e}")
+    finally:
+        # Network groups waiting for this export fetch the networks themselves
+        if shared is not None and not networks.done():
+            networks.set_result(None)
+
+    return _result(object_type, started, rows=rows, path=filename)
+
+
+# Function to delta sync an object type into the local store and save the merged JSON
+@_traced
+def sync_json(object_type, settings=None, folder=export_folder, max_workers=DEFAULT_WORKERS, state_folder=export_folder):
+    started = time.monotonic()
+    settings = load_settings() if settings is None else settings
+    if object_type not in SYNC_TYPES:
+        return _result(object_type, started, error="Delta sync is only available for object types")
+    if not settings.get('FMC_TOKEN'):
+        return _result(object_type, started, error="No token found, please login first")
+
+    source = f"{settings.get('FMC_HOST')}/{settings.get('FMC_DOMAIN_ID')}"
+    filename = json_path(object_type, folder)
+    try:
+        state = fmc_state.load_state(state_path(object_type, state_folder))
+        state, summary = fmc_state.sync_objects(
+            state, source,
+            object_url(object_type, settings, expanded=False),
+            object_url(object_type, settings, expanded=True),
+            settings['FMC_TOKEN'], max_workers
+        )
+        fmc_state.save_state(state_path(object_type, state_folder), state)
+        items = fmc_state.state_items(state)
+        save_json(items, filename)
+    except FetchError as e:
+        return _result(object_type, started, error=f"Failed to get {OBJECT_TYPES[object_type][0]}: {e}")
+    except OSError as e:
+        return _result(object_type, started, error=f"An error occurred while saving to {filename}: {e}")
+    except (ValueError, KeyError) as e:
+        return _result(object_type, started, error=f"Failed to process {OBJECT_TYPES[object_type][0]}: {type(e).__name__}: {e}")
+
+    result = _result(object_type, started, rows=len(items), path=filename)
+    result['sync'] = summary
+    return result
+
+
+# Function to delta sync an object type and rebuild its CSV (or Parquet/Feather) from the merged store
+@_traced
+def sync_csv(object_type, settings=None, folder=export_folder, max_workers=DEFAULT_WORKERS, state_folder=export_folder, output_format='csv'):
+    started = time.monotonic()
+    result = sync_json(object_type, settings, folder, max_workers, state_folder)
+    if not result['ok']:
+        return result
+
+    converted = convert_json(object_type, folder, output_format, state_folder)
+    converted['seconds'] = time.monotonic() - started
+    converted['sync'] = result['sync']
+    return converted
+
+
+# Function to wrap step so it starts once future is done, whatever its outcome
+def _after(future, step):
+    def run(*args, **kwargs):
+        wait([future])
+        return step(*args, **kwargs)
+    return run
+
+
+# Function to export several object types at once into one timestamped snapshot folder
+def export_all(object_types=None, settings=None, folder=export_folder, max_workers=DEFAULT_WORKERS, delta_sync=False, output_format='csv'):
+    started = time.monotonic()
+    object_types = list(OBJECT_TYPES) if object_types is None else object_types
+    # One settings read, so every type uses the same host, domain and token
+    settings = load_settings() if settings is None else settings
+
+    snapshot = os.path.join(folder, f"snapshot_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    os.makedirs(snapshot, exist_ok=True)
+
+    # Every type runs in its own thread, they share the connection pool, rate budget and progress tracker
+    results = []
+    # Without delta sync the networks are fetched once, by their export, and handed to the network groups
+    networks = Future() if not delta_sync and 'networks' in object_types and 'networkgroups' in object_types else None
+    with ThreadPoolExecutor(max_workers=len(object_types)) as executor:
+        futures = {}
+        # Network groups are submitted last, so they can wait for the networks of this run
+        for object_type in sorted(object_types, key=lambda object_type: object_type == 'networkgroups'):
+            if delta_sync and object_type in SYNC_TYPES:
+                step = fmc_progress.bind(sync_csv)
+                # Synced groups are resolved from the networks JSON in the snapshot, it has to be written first
+                if object_type == 'networkgroups' and 'networks' in futures:
+                    step = _after(futures['networks'], step)
+                futures[object_type] = executor.submit(step, object_type, settings, snapshot, max_workers, folder, output_format)
+            else:
+                futures[object_type] = executor.submit(fmc_progress.bind(export_csv), object_type, settings, snapshot, max_workers, output_format,
+                                                       networks if object_type in ('networks', 'networkgroups') else None)
+        object_types_of = {future: object_type for object_type, future in futures.items()}
+        for future in as_completed(object_types_of):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                # One type failing makes the run partial, the other results and the snapshot are still saved
+                results.append(_result(object_types_of[future], started, error=f"{type(e).__name__}: {e}"))
+
+    # Synced types leave their merged JSON behind, only converted files belong in the snapshot
+    for result in results:
+        if os.path.exists(json_path(result['object_type'], snapshot)):
+            os.remove(json_path(result['object_type'], snapshot))
+
+    summary = {
+        'ok': all(result['ok'] for result in results),
+        'path': snapshot,
+        'seconds': time.monotonic() - started,
+        'host': settings.get('FMC_HOST'),
+        'domain_id': settings.get('FMC_DOMAIN_ID'),
+        'accesspolicy_id': settings.get('FMC_ACCESS_POLICY_ID'),
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'output_format': output_format,
+        'results': sorted(results, key=lambda result: object_types.index(result['object_type']))
+    }
+    with open(os.path.join(snapshot, 'snapshot.json'), 'w') as file:
+        json.dump(summary, file, indent=4)
+    return summary
+
+
+# Function to export the access rules of many policies across domains in one run
+def export_policies(settings=None, folder=export_folder, max_workers=DEFAULT_WORKERS, on_done=None):
+    started = time.monotonic()
+    settings = load_settings() if settings is None else settings
+    hostname = settings.get('FMC_HOST')
+    auth_token = settings.get('FMC_TOKEN')
+    summary = {
+        'ok': False,
+        'path': None,
+        'seconds': 0.0,
+        'host': hostname,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'results': [],
+        'error': None
+    }
+    if not auth_token:
+        summary['error'] = "No token found, please login first"
+        return summary
+
+    domain_ids = fmc_policies.parse_id_list(settings.get('FMC_DOMAIN_IDS'), settings.get('FMC_DOMAIN_ID'))
+    policy_ids = fmc_policies.parse_id_list(settings.get('FMC_ACCESS_POLICY_IDS'), settings.get('FMC_ACCESS_POLICY_ID'))
+    try:
+        targets = fmc_policies.plan_targets(_protocol(settings), hostname, auth_token, domain_ids, policy_ids)
+    except FetchError as e:
+        summary['error'] = f"Failed to discover access policies: {e}"
+        return summary
+
+    # Requested policies that do not exist fail on their own, the others are still exported
+    missing = fmc_policies.missing_policies(targets, policy_ids)
+    for policy_id in missing:
+        result = _result('accessrules', started, error="Access policy not found in the selected domains")
+        result.update({'label': policy_id, 'domain_id': None, 'domain_name': None, 'policy_id': policy_id, 'policy_name': None})
+        summary['results'].append(result)
+    if not targets:
+        summary['error'] = "No access policies found" + (f": {', '.join(missing)}" if missing else "")
+        return summary
+
+    snapshot = os.path.join(folder, f"policies_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    os.makedirs(snapshot, exist_ok=True)
+
+    # Function to export one policy into its own CSV
+    def export_target(target):
+        target_started = time.monotonic()
+        filename = os.path.join(snapshot, target['filename'])
+        url = get_accessrules.accessrules_url(_protocol(settings), hostname, target['domain_id'], target['policy_id'])
+        try:
+            pages = iter_pages(url, auth_token, max_workers=max_workers, checkpoint_folder=_checkpoints(settings))
+            rows = write_pages_to_csv(pages, accessrules_to_csv.extract_rows, accessrules_to_csv.COLUMNS, filename)
+            result = _result('accessrules', target_started, rows=rows, path=filename)
+        except FetchError as e:
+            result = _result('accessrules', target_started, error=f"Failed to get access rules: {e}")
+        except OSError as e:
+            result = _result('accessrules', target_started, error=f"An error occurred while saving to {filename}: {e}")
+        except Exception as e:
+            # A bad payload or converter error fails this policy only, the others and the combined file are kept
+            result = _result('accessrules', target_started, error=f"Failed to process access rules: {type(e).__name__}: {e}")
+        result['label'] = f"{target['domain_name']} / {target['policy_name']}"
+        result.update(target)
+        return result
+
+    # Policies run in parallel, they share one token, connection pool, rate budget and progress tracker
+    with ThreadPoolExecutor(max_workers=POLICY_WORKERS) as executor:
+        futures = [executor.submit(fmc_progress.bind(export_target), target) for target in targets]
+        for future in as_completed(futures):
+            result = future.result()
+            summary['results'].append(result)
+            if on_done:
+                on_done(result, len(summary['results']), len(targets))
+
+    # Combined file in planned order, built from the per policy files
+    order = [target['policy_id'] for target in targets] + missing
+    summary['results'].sort(key=lambda result: order.index(result['policy_id']))
+    parts = [(result, result['path']) for result in summary['results'] if result['ok']]
+    combined = os.path.join(snapshot, 'fmc_accessrules_all.csv')
+    try:
+        fmc_policies.combine_policy_csvs(parts, accessrules_to_csv.COLUMNS, combined)
+    except OSError as e:
+        summary['error'] = f"An error occurred while saving to {combined}: {e}"
+        combined = None
+
+    summary['ok'] = all(result['ok'] for result in summary['results'])
+    summary['path'] = snapshot
+    summary['combined'] = combined
+    summary['seconds'] = time.monotonic() - started
+    with open(os.path.join(snapshot, 'snapshot.json'), 'w') as file:
+        json.dump(summary, file, indent=4)
+    return summary
+
+
+# Function to pack a snapshot folder into <snapshot>.zip next to it, returns the zip path
+def zip_snapshot(snapshot):
+    return shutil.make_archive(snapshot, 'zip', snapshot)
+
+
+# Function to generate a new token and store it in .env, returns True on success
+def update_token(settings=None):
+    settings = load_settings() if settings is None else settings
+    tokens = get_token.generate_auth_tokens(_protocol(settings), settings.get('FMC_HOST'), settings.get('FMC_USERNAME'), settings.get('FMC_PASSWORD'))
+    if not tokens:
+        return False
+    # Saved to .env with the refresh token, exports refresh it from there when it is about to expire
+    fmc_token.get_manager().login(*tokens)
+    return True
+
+
+# Function to describe a result in one line for st.toast
+def describe_result(result):
+    if not result['ok']:
+        return f"{result['label']}: {result['error']}"
+    text = f"{result['label']}: {result['rows']} rows in {result['seconds']:.1f} s, saved to {os.path.basename(result['path'])}"
+    sync = result.get('sync')
+    if sync:
+        mode = "delta sync" if not sync['full_refresh'] else "full refresh" if sync.get('versioned', True) else "full refresh, no timestamps in the listing"
+        text += f" ({mode}: {sync['new']} new, {sync['changed']} changed, {sync['deleted']} deleted)"
+    return text
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+
+"""
+Shared paging engine for FMC list endpoints
+
+The first page is fetched on its own to read paging.count, every remaining
+offset is planned from it and the rest of the pages are downloaded in
+parallel by a bounded worker pool. Pages are handed back in offset order,
+so item order (and the rule Index in accessrules_to_csv.py) is preserved.
+
+With a checkpoint folder every page is saved to disk as it arrives
+(fmc_checkpoint.py), so a run that failed half way with a FetchError
+continues from the pages already fetched instead of offset 0.
+
+Used by:
+    get_accessrules.py, get_networks.py, get_networkgroups.py, get_portobjectgroups.py
+"""
+
+__author__ = "Sasa Kovacic"
+__email__ = "sasa.kovacic@storm.hr"
+__version__ = "1.0"
+
+
+import os
+import time
+import requests
+import fmc_client
+import fmc_trace
+import fmc_token
+import fmc_checkpoint
+import fmc_progress
+from concurrent.futures import ThreadPoolExecutor
+
+MAX_PAGE_LIMIT = 1000       # FMC never returns more than 1000 items per page
+MIN_PAGE_LIMIT = 100        # Smallest page size the tuner will pick
+TARGET_PAGE_LATENCY = 5.0   # Seconds a single page should take at most
+MAX_WORKERS = fmc_client.POOL_SIZE
+DEFAULT_WORKERS = int(os.getenv('FMC_MAX_WORKERS', '4'))
+
+
+class FetchError(Exception):
+    """Raised when a page cannot be retrieved from FMC, status is the HTTP status when FMC answered"""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+# Function to get one JSON document, rate limiting is handled by fmc_client and token refresh by fmc_token
+def fetch_json(url, auth_token):
+    tokens = fmc_token.get_manager()
+    auth_token = tokens.token(auth_token, url)  # Refreshed first when it is about to expire
+    started = time.monotonic()
+    for attempt in range(2):
+        # Content-Type and compression headers come from the shared session
+        headers = {'X-auth-access-token': auth_token}  # Use the token retrieved by get_token.py
+
+        try:
+            response = fmc_client.get(url, headers=headers)
+        except requests.RequestException as e:
+            raise FetchError(f"An error occurred: {e}")
+
+        # Expired token: retry the page once with a refreshed one
+        if response.status_code != 401 or attempt:
+            break
+        auth_token = tokens.renew(auth_token, url)
+        if auth_token is None:
+            break
+
+    if response.status_code == 200:
+        # An HTML error page or a truncated body is a failed fetch, not a converter or save error
+        try:
+            with fmc_trace.span('response json', 'decode'):
+                data = response.json()
+        except ValueError as e:
+            raise FetchError(f"Invalid JSON from {url}: {e}")
+        return data, time.monotonic() - started
+
+    if response.status_code == 401:
+        raise FetchError(f"token expired, please login again\n{response.text}", response.status_code)
+    raise FetchError(f"HTTP {response.status_code}\n{response.text}", response.status_code)
+
+
+# Function to get a single page of a list endpoint
+def fetch_page(url_template, offset, limit, auth_token):
+    return fetch_json(url_template.format(offset=offset, limit=limit), auth_token)
+
+
+# Function to pick the page size for the remaining pages from the first page latency
+def tune_page_limit(latency, limit, target_latency=TARGET_PAGE_LATENCY):
+    if latency <= target_latency:
+        return limit
+
+    # Shrink pages so each one takes roughly target_latency, more pages run in parallel
+    tuned = int(limit * target_latency / latency) // MIN_PAGE_LIMIT * MIN_PAGE_LIMIT
+    return max(MIN_PAGE_LIMIT, min(limit, tuned))
+
+
+# Function to plan offsets of the remaining pages from paging.count
+def plan_offsets(first_offset, count, limit):
+    return list(range(first_offset, count, limit))
+
+
+# Function to get a page and save it to the checkpoint before it is handed back
+def _fetch_and_save(path, url_template, offset, limit, auth_token):
+    data, latency = fetch_page(url_template, offset, limit, auth_token)
+    try:
+        fmc_checkpoint.save_page(path, offset, data.get('items', []))
+    except OSError as e:
+        print(f"Page {offset} could not be checkpointed: {e}")
+    return data, latency
+
+
+# Function to yield pages of items in offset order, resumed from checkpoint_folder when given
+def iter_pages(url_template, auth_token, limit=MAX_PAGE_LIMIT, max_workers=DEFAULT_WORKERS, checkpoint_folder=None):
+    max_workers = max(1, min(max_workers, MAX_WORKERS))
+    limit = min(limit, MAX_PAGE_LIMIT)
+
+    # First page tells us how many items there are in total
+    data, latency = fetch_page(url_template, 0, limit, auth_token)
+    items = data.get('items', [])
+    count = data.get('paging', {}).get('count')
+    if count is None:
+        # No paging info, fall back to walking pages one after another
+        fmc_progress.unplanned()
+        fmc_progress.page_done(len(items))
+        yield items
+        offset = len(items)
+        while len(items) == limit:
+            data, _ = fetch_page(url_template, offset, limit, auth_token)
+            items = data.get('items', [])
+            fmc_progress.page_done(len(items))
+            yield items
+            offset += len(items)
+        return
+
+    page_limit = tune_page_limit(latency, limit)
+    path, stored = None, set()
+    if checkpoint_folder:
+        # A resumed run keeps the page size of the checkpoint, so the stored offsets line up
+        path = fmc_checkpoint.checkpoint_path(checkpoint_folder, url_template)
+        try:
+            if not fmc_checkpoint.acquire(path):
+                print("Pages will not be checkpointed: another export of this list is running")
+                path = None
+        except OSError as e:
+            print(f"Pages will not be checkpointed: {e}")
+            path = None
+    if path is not None:
+        try:
+            page_limit, stored = fmc_checkpoint.open_checkpoint(path, url_template, count, len(items), page_limit)
+        except OSError as e:
+            print(f"Pages will not be checkpointed: {e}")
+            fmc_checkpoint.release(path)
+            path = None
+
+    try:
+        yield from _iter_planned(url_template, auth_token, items, count, page_limit, max_workers, path, stored)
+    except FetchError:
+        # Fetched pages stay on disk, the next run continues from them
+        raise
+    except BaseException:
+        # Unexpected error or pages left unread: the checkpoint is not resumed
+        if path is not None:
+            fmc_checkpoint.clear(path)
+        raise
+    finally:
+        if path is not None:
+            fmc_checkpoint.release(path)
+
+
+# Function to yield the first page and the planned offsets in order, stored offsets are read from path
+def _iter_planned(url_template, auth_token, items, count, page_limit, max_workers, path, stored):
+    offsets = plan_offsets(len(items), count, page_limit)
+    fmc_progress.planned(len(offsets) + 1, count)
+    fmc_progress.page_done(len(items))
+    yield items
+
+    stored &= set(offsets)
+    if stored:
+        print(f"Resuming from checkpoint: {len(stored)} of {len(offsets)} pages already on disk")
+
+    # Workers record into the caller's trace and progress
+    fetch = fmc_progress.bind(fmc_trace.bind(fetch_page if path is None else lambda *args: _fetch_and_save(path, *args)))
+
+    # Function to get the items of a queued entry: a stored offset or a page in flight
+    def take(entry):
+        if isinstance(entry, int):
+            return _stored_page(path, entry, page_limit, count, fetch, url_template, auth_token)
+        data, _ = entry.result()
+        return data.get('items', [])
+
+    # Keep at most max_workers pages in flight and hand them back in order
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Stored pages are queued by offset and read when their turn comes, the rest are fetched
+        pending = []
+        in_flight = 0
+        for offset in offsets:
+            if offset in stored:
+                pending.append(offset)
+            else:
+                pending.append(executor.submit(fetch, url_template, offset, page_limit, auth_token))
+                in_flight += 1
+            while in_flight > max_workers:
+                entry = pending.pop(0)
+                in_flight -= not isinstance(entry, int)
+                items = take(entry)
+                fmc_progress.page_done(len(items))
+                yield items
+
+        for entry in pending:
+            items = take(entry)
+            fmc_progress.page_done(len(items))
+            yield items
+
+    # Every page was handed out, nothing left to resume
+    if path is not None:
+        fmc_checkpoint.clear(path)
+
+
+# Function to read a page from the checkpoint, fetched again when it does not hold the expected items
+def _stored_page(path, offset, page_limit, count, fetch, url_template, auth_token):
+    with fmc_trace.span('checkpoint page', 'decode', offset=offset):
+        items = fmc_checkpoint.load_page(path, offset, min(page_limit, count - offset))
+    if items is None:
+        data, _ = fetch(url_template, offset, page_limit, auth_token)
+        items = data.get('items', [])
+    return items
+
+
+# Function to get all items of a list endpoint, None on failure (fetched pages stay in checkpoint_folder)
+def fetch_all_items(url_template, auth_token, object_name, limit=MAX_PAGE_LIMIT, max_workers=DEFAULT_WORKERS, checkpoint_folder=None):
+    all_items = []
+    try:
+        for items in iter_pages(url_template, auth_token, limit, max_workers, checkpoint_folder):
+            all_items.extend(items)
+    except FetchError as e:
+        print(f"Failed to get {object_name}: {e}")
+        if checkpoint_folder:
+            print("Pages fetched so far are checkpointed, run again to continue")
+        return None
+
+    return all_items
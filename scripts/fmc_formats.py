@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+
+"""
+Output formats of the converters: CSV, Parquet and Feather
+
+CSV stays the default and is written exactly as before with pandas. The
+columnar formats are meant for analytics that reload the exports many
+times a day:
+    parquet: zstd compressed, smallest files
+    feather: Arrow IPC file, uncompressed so it can be memory mapped and
+             reloaded without parsing or copying
+
+Low cardinality columns (zones, action, type) are dictionary encoded in
+both columnar formats, so they come back as pandas categories.
+
+Usage:
+    import pyarrow.feather as feather
+    df = feather.read_table('export/fmc_accessrules.feather', memory_map=True).to_pandas()
+
+Used by:
+    accessrules_to_csv.py, networks_to_csv.py, networkgroups_to_csv.py, portobjectgroups_to_csv.py, fmc_export.py
+"""
+
+__author__ = "Sasa Kovacic"
+__email__ = "sasa.kovacic@storm.hr"
+__version__ = "1.0"
+
+
+import os
+import uuid
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import pyarrow.feather as feather
+from fmc_trace import span
+
+# Output format: file extension
+FORMATS = {
+    'csv': '.csv',
+    'parquet': '.parquet',
+    'feather': '.feather',
+}
+
+PARQUET_COMPRESSION = 'zstd'
+
+
+# Function to get the output file of a format, the CSV path with the extension of the format
+def output_path(csv_file, output_format='csv'):
+    if output_format not in FORMATS:
+        raise ValueError(f"Unknown output format: {output_format}")
+    return os.path.splitext(csv_file)[0] + FORMATS[output_format]
+
+
+# Function to convert one DataFrame column, mixed values (e.g. True and '') are kept as their CSV text
+def _column_array(series):
+    try:
+        return pa.array(series, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return pa.array(series.where(series.isna(), series.astype(str)), from_pandas=True)
+
+
+# Function to build an Arrow table from the DataFrame, dictionary_columns are dictionary encoded
+def frame_to_table(df, dictionary_columns=()):
+    arrays = []
+    for column in df.columns:
+        array = _column_array(df[column])
+        if column in dictionary_columns and pa.types.is_string(array.type):
+            array = pc.dictionary_encode(array)
+        arrays.append(array)
+    return pa.Table.from_arrays(arrays, names=list(df.columns))
+
+
+# Function to write the DataFrame in the given format, returns the written file
+def write_frame(df, csv_file, output_format='csv', dictionary_columns=()):
+    output_file = output_path(csv_file, output_format)
+
+    # Write next to the target and move it into place only when complete, the name is unique per writer
+    part_file = f"{output_file}.{uuid.uuid4().hex[:8]}.part"
+    try:
+        if output_format == 'csv':
+            with span('to_csv', 'write', rows=len(df)):
+                df.to_csv(part_file, index=False)
+        else:
+            with span(f"write {output_format}", 'write', rows=len(df)):
+                table = frame_to_table(df, dictionary_columns)
+                if output_format == 'parquet':
+                    pq.write_table(table, part_file, compression=PARQUET_COMPRESSION)
+                else:
+                    feather.write_feather(table, part_file, compression='uncompressed')
+        os.replace(part_file, output_file)
+    finally:
+        if os.path.exists(part_file):
+            os.remove(part_file)
+    return output_file
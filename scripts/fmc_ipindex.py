@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+
+"""
+IP reverse lookup: which network objects and groups contain an IP or CIDR
+
+Builds an index from the exported fmc_networks.csv and fmc_networkgroups.csv
+(the Resolved Value column, so nested groups are included). Every value
+(host, CIDR or range) becomes an integer interval; IPv4 and IPv6 are kept
+in separate NumPy arrays sorted by start, with the running maximum of the
+ends next to them. A query is two binary searches plus one vectorized
+compare over the candidates left between them:
+    contains: objects whose range covers the whole query
+    overlaps: objects sharing at least one address with the query
+
+IPv4 bounds are int64, IPv6 bounds are 16 byte big-endian strings (S16),
+which sort and compare like the 128-bit numbers they hold. FQDNs and names
+that are not addresses are skipped.
+
+The index is saved as export/state/fmc_ipindex.npz together with the size
+and modification time of the CSV files it was built from, and is rebuilt
+only when one of them changes.
+
+Args:
+    query (str): IP, CIDR or range (a-b)
+    --overlaps: list overlapping objects instead of containing ones
+
+Usage:
+    python scripts/fmc_ipindex.py 10.1.2.3
+    python scripts/fmc_ipindex.py 10.0.0.0/16 --overlaps
+
+Used by:
+    app.py (IP lookup)
+"""
+
+__author__ = "Sasa Kovacic"
+__email__ = "sasa.kovacic@storm.hr"
+__version__ = "1.0"
+
+
+import os
+import csv
+import argparse
+import ipaddress
+import itertools
+import uuid
+import numpy as np
+
+export_folder = 'export'
+
+MAX_RESULTS = 1000  # Rows returned by one query, most specific objects first
+
+# Sources of the index: (CSV file name, column with the values)
+SOURCES = [
+    ('fmc_networks.csv', 'Value'),
+    ('fmc_networkgroups.csv', 'Resolved Value'),
+]
+
+
+# Function to parse a host, CIDR or range into (version, first address, last address), None if not an address
+def parse_value(value):
+    value = value.strip()
+    try:
+        if '-' in value:
+            first, last = (ipaddress.ip_address(part.strip()) for part in value.split('-', 1))
+            if first.version != last.version or first > last:
+                return None
+            return first.version, int(first), int(last)
+        network = ipaddress.ip_network(value, strict=False)
+        return network.version, int(network.network_address), int(network.broadcast_address)
+    except ValueError:
+        return None
+
+
+# Function to convert an address to the key type of its family
+def _key(version, address):
+    return address if version == 4 else address.to_bytes(16, 'big')
+
+
+# NumPy drops the trailing zero bytes of S16 items, they are padded back
+def _address(version, key):
+    return int(key) if version == 4 else int.from_bytes(bytes(key).ljust(16, b'\0'), 'big')
+
+
+# Function to read (object name, type, value) from the exported CSV files
+def _read_values(folder):
+    for filename, column in SOURCES:
+        path = os.path.join(folder, filename)
+        if not os.path.exists(path):
+            continue
+        with open(path, newline='', encoding='utf-8') as file:
+            for row in csv.DictReader(file):
+                # CSV files from before the Resolved Value column only have the direct values
+                values = row.get(column) if row.get(column) is not None else row.get('Value', '')
+                for value in values.split(','):
+                    if value.strip():
+                        yield row['Object Name'], row['Type'], value.strip()
+
+
+# Function to get the signature of the source files, the index is rebuilt when it changes
+def source_signature(folder):
+    signature = []
+    for filename, _ in SOURCES:
+        path = os.path.join(folder, filename)
+        if os.path.exists(path):
+            stat = os.stat(path)
+            signature.append(f"{filename}:{stat.st_size}:{stat.st_mtime_ns}")
+    return signature
+
+
+# Function to build the index arrays from the exported CSV files
+def build_index(folder=export_folder):
+    names, types, values = [], [], []
+    intervals = {4: [], 6: []}
+    for name, object_type, value in _read_values(folder):
+        parsed = parse_value(value)
+        if parsed is None:
+            continue  # FQDN or unresolved member name
+        version, first, last = parsed
+        intervals[version].append((_key(version, first), _key(version, last), len(names)))
+        names.append(name)
+        types.append(object_type)
+        values.append(value)
+
+    index = {
+        'names': np.array(names, dtype=str),
+        'types': np.array(types, dtype=str),
+        'values': np.array(values, dtype=str),
+        'sources': np.array(source_signature(folder), dtype=str),
+    }
+    for version, dtype in ((4, np.int64), (6, 'S16')):
+        rows = intervals[version]
+        starts = np.array([row[0] for row in rows], dtype=dtype)
+        order = np.argsort(starts, kind='stable')
+        ends = np.array([row[1] for row in rows], dtype=dtype)[order]
+        index[f'v{version}_start'] = starts[order]
+        index[f'v{version}_end'] = ends
+        # Running maximum of the ends, nondecreasing so it can be binary searched too
+        if version == 4:
+            index[f'v{version}_max_end'] = np.maximum.accumulate(ends) if len(ends) else ends
+        else:
+            index[f'v{version}_max_end'] = np.array(list(itertools.accumulate(ends, max)), dtype=dtype)
+        index[f'v{version}_entry'] = np.array([row[2] for row in rows], dtype=np.int64)[order]
+    return index
+
+
+def index_path(folder=export_folder):
+    return os.path.join(folder, 'state', 'fmc_ipindex.npz')
+
+
+# Function to write the index next to the target and move it into place
+def save_index(index, index_file):
+    os.makedirs(os.path.dirname(index_file), exist_ok=True)
+    part_file = f"{index_file}.{uuid.uuid4().hex[:8]}.part.npz"  # Unique per writer, np.savez keeps the .npz suffix
+    np.savez(part_file, **index)
+    os.replace(part_file, index_file)
+
+
+# Function to read a saved index, None when the file is missing or broken
+def load_index(index_file):
+    try:
+        with np.load(index_file) as data:
+            return {key: data[key] for key in data.files}
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+# Function to get an up to date index, rebuilt only when the exported CSV files changed, None without exports
+def get_index(folder=export_folder):
+    signature = source_signature(folder)
+    if not signature:
+        return None
+    index = load_index(index_path(folder))
+    if index is None or list(index['sources']) != signature:
+        index = build_index(folder)
+        save_index(index, index_path(folder))
+    return index
+
+
+# Function to find the objects containing (or overlapping) an IP, CIDR or range, most specific first
+def lookup(index, query, overlaps=False, max_results=MAX_RESULTS):
+    parsed = parse_value(query)
+    if parsed is None:
+        raise ValueError(f"Not an IP address, CIDR or range: {query}")
+    version, first, last = parsed
+    starts = index[f'v{version}_start']
+    ends = index[f'v{version}_end']
+
+    # contains: start <= first and end >= last, overlaps: start <= last and end >= first
+    start_limit = _key(version, last if overlaps else first)
+    end_limit = _key(version, first if overlaps else last)
+    low = np.searchsorted(index[f'v{version}_max_end'], end_limit, 'left')
+    high = np.searchsorted(starts, start_limit, 'right')
+    if low >= high:
+        return []
+    candidates = np.arange(low, high)[ends[low:high] >= end_limit]
+
+    if version == 4:
+        matches = candidates[np.argsort(ends[candidates] - starts[candidates], kind='stable')]
+    else:
+        matches = sorted(candidates, key=lambda i: _address(version, ends[i]) - _address(version, starts[i]))
+    results = []
+    for i in matches[:max_results]:
+        entry = index[f'v{version}_entry'][i]
+        results.append({
+            'Object Name': str(index['names'][entry]),
+            'Type': str(index['types'][entry]),
+            'Value': str(index['values'][entry]),
+        })
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("query", help="IP, CIDR or range (a-b)")
+    parser.add_argument("--overlaps", action="store_true", help="List overlapping objects instead of containing ones")
+    args = parser.parse_args()
+
+    index = get_index()
+    if index is None:
+        print("No fmc_networks.csv or fmc_networkgroups.csv found, export them first")
+    else:
+        for result in lookup(index, args.query, args.overlaps):
+            print(f"{result['Object Name']}\t{result['Type']}\t{result['Value']}")
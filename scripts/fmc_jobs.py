@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+
+"""
+Background job runner for the app
+
+Exports run in a worker pool instead of the Streamlit script thread, so a
+page rerun (another click, a sidebar edit) neither blocks on nor restarts
+a running export. One runner is shared by every session of the process
+(app.py keeps it with st.cache_resource), so several users can run exports
+at the same time; they share the connection pool and rate budget of
+fmc_client.py.
+
+Every submitted function gets its Job as first argument and can report
+progress and a result line with job.update(). Page level progress comes
+from the fetch layer: every job runs with a fmc_progress.py tracker, its
+latest event (pages, items per second, bytes, waiting, ETA) is kept with
+the job. The job table keeps the status (queued, running, done, failed),
+progress, message and result of every job, the page polls it with jobs().
+
+Exports write fixed paths (export/fmc_<type>.csv), so identical requests
+are single-flight: request() with a key (step, object type, format, FMC
+host, domain and policy) joins the job already running for that key
+instead of starting a second FMC export over the same files, and every
+session that joined gets its result. A key whose job finished less than
+max_age seconds ago (FMC_FRESH_MINUTES for FMC exports) reuses that result
+as long as its file is still there. An older result, up to stale_for
+seconds (FMC_STALE_MINUTES), is served right away while a new job
+revalidates it in the background (stale-while-revalidate). When that job
+fails, the older result stays served, flagged stale with the error, and
+the next request revalidates it again. Different
+steps over the same file (Get .csv with and without Delta sync) have
+different keys and can run at once: every writer uses its own temporary
+file and moves it into place, the last one to finish wins.
+
+Used by:
+    app.py
+"""
+
+__author__ = "Sasa Kovacic"
+__email__ = "sasa.kovacic@storm.hr"
+__version__ = "1.0"
+
+
+import os
+import time
+import uuid
+import threading
+import traceback
+import fmc_progress
+from concurrent.futures import ThreadPoolExecutor
+
+JOB_WORKERS = int(os.getenv('FMC_JOB_WORKERS', '4'))  # Jobs run at once, across all sessions
+JOB_HISTORY = 50  # Finished jobs kept in the table
+FRESH_FOR = float(os.getenv('FMC_FRESH_MINUTES', '5')) * 60  # Seconds an export result is reused for identical requests
+STALE_FOR = float(os.getenv('FMC_STALE_MINUTES', '1440')) * 60  # Seconds an older result is served while it is refreshed
+
+ACTIVE = ('queued', 'running')
+
+
+class Job:
+    """One background job, updated by its worker and read by the page"""
+
+    def __init__(self, label):
+        self.id = uuid.uuid4().hex[:12]
+        self.label = label
+        self.status = 'queued'
+        self.progress = None        # 0.0 - 1.0 set by the job function, None to follow the page progress
+        self.event = None           # Latest fmc_progress event
+        self.message = ''
+        self.result = None          # Return value of the job function
+        self.error = None
+        self.key = None             # Requests with the same key share this job
+        self.requests = 1
+        self.served = None          # Finished job whose result was served while this one revalidates it
+        self.stale = False          # Revalidation failed, served keeps the previous result
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self._lock = threading.Lock()
+
+    # Function to report progress and/or a status line from the job function
+    def update(self, progress=None, message=None):
+        with self._lock:
+            if progress is not None:
+                self.progress = max(0.0, min(1.0, progress))
+            if message is not None:
+                self.message = message
+
+    # Function to keep the latest progress event of the fetch layer
+    def report(self, event):
+        with self._lock:
+            self.event = event
+
+    @property
+    def active(self):
+        return self.status in ACTIVE
+
+    # Function to get a consistent copy of the job for the page
+    def snapshot(self):
+        with self._lock:
+            end = self.finished or time.time()
+            return {
+                'id': self.id,
+                'label': self.label,
+                'status': self.status,
+                'progress': self.progress if self.progress is not None else (self.event or {}).get('fraction'),
+                'event': self.event,
+                'message': self.message,
+                'error': self.error,
+                'result': self.result,
+                'requests': self.requests,
+                'stale': self.stale,
+                'submitted': self.submitted,
+                'seconds': round(end - self.started, 1) if self.started else None
+            }
+
+
+# Function to check if a finished job can answer a new request: done within max_age seconds and its file still there
+def _fresh(job, max_age):
+    if job.status != 'done' or not max_age or time.time() - job.finished > max_age:
+        return False
+    path = job.result.get('path') if isinstance(job.result, dict) else None
+    return path is None or os.path.exists(path)
+
+
+class JobRunner:
+    """Worker pool and job table shared by every session"""
+
+    def __init__(self, max_workers=JOB_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='fmc-job')
+        self.table = {}
+        self.keys = {}              # Request key -> id of its latest job
+        self._lock = threading.Lock()
+
+    # Function to queue func(job, *args, **kwargs), returns the Job right away
+    def submit(self, label, func, *args, **kwargs):
+        job = Job(label)
+        with self._lock:
+            self.table[job.id] = job
+            self._prune()
+        self.executor.submit(self._run, job, func, args, kwargs)
+        return job
+
+    # Function to run func for key once: returns (job, 'joined', None) while one runs, (job, 'reused', None) within max_age,
+    # (new job, 'revalidating', served job) within stale_for, served is the result to show meanwhile, else (new job, 'started', None)
+    def request(self, key, label, func, *args, max_age=0, stale_for=0, **kwargs):
+        with self._lock:
+            job = self.table.get(self.keys.get(key))
+            if job is not None and (job.active or _fresh(job, max_age)):
+                with job._lock:
+                    job.requests += 1
+                return job, 'joined' if job.active else 'reused', None
+
+            # A failed revalidation still holds the result it was refreshing
+            if job is not None and job.status == 'failed' and job.served is not None:
+                job = job.served
+            stale = job if job is not None and _fresh(job, stale_for) else None
+            job = Job(label)
+            job.key = key
+            job.served = stale
+            self.table[job.id] = job
+            self.keys[key] = job.id
+            self._prune()
+        self.executor.submit(self._run, job, func, args, kwargs)
+        # The refresh clears job.served once it is done, the caller keeps the served job it got here
+        return job, 'started' if stale is None else 'revalidating', stale
+
+    # Function to get the latest done job of a key (the served one while it revalidates or after its refresh failed), None when there is none
+    def latest(self, key):
+        with self._lock:
+            job = self.table.get(self.keys.get(key))
+        if job is not None and job.status != 'done':
+            job = job.served
+        return job if job is not None and job.status == 'done' else None
+
+    def _run(self, job, func, args, kwargs):
+        with job._lock:
+            job.status = 'running'
+            job.started = time.time()
+        fmc_progress.start(job.report)
+        try:
+            result = func(job, *args, **kwargs)
+            ok = not isinstance(result, dict) or result.get('ok', True)
+            error = result.get('error') if isinstance(result, dict) else None
+        except Exception as e:
+            # The worker keeps running, the error goes to the job table
+            traceback.print_exc()
+            result, ok, error = None, False, f"{type(e).__name__}: {e}"
+        finally:
+            fmc_progress.finish()
+        with job._lock:
+            job.result = result
+            job.error = error
+            job.status = 'done' if ok else 'failed'
+            if ok:
+                job.progress = 1.0
+            if not job.message:
+                job.message = error or f"{job.label} finished"
+            job.finished = time.time()
+            if ok:
+                job.served = None  # Replaced by this result
+            elif job.served is not None:
+                # The previous result stays served, flagged with the error of its refresh
+                job.stale = True
+                job.message += f"\nRefresh failed, still serving the result of {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(job.served.finished))}"
+
+    # Function to drop the oldest finished jobs once the table is longer than JOB_HISTORY
+    def _prune(self):
+        finished = [job for job in self.table.values() if not job.active]
+        for job in sorted(finished, key=lambda job: job.submitted)[:max(0, len(self.table) - JOB_HISTORY)]:
+            del self.table[job.id]
+            if self.keys.get(job.key) == job.id:
+                del self.keys[job.key]
+
+    def get(self, job_id):
+        return self.table.get(job_id)
+
+    # Function to get snapshots of the given jobs (all when None), newest first
+    def jobs(self, job_ids=None):
+        with self._lock:
+            jobs = list(self.table.values()) if job_ids is None else [self.table[job_id] for job_id in job_ids if job_id in self.table]
+        return sorted((job.snapshot() for job in jobs), key=lambda job: job['submitted'], reverse=True)
+
+    def active_count(self):
+        with self._lock:
+            return sum(1 for job in self.table.values() if job.active)
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+
+"""
+Incremental reader for the items array of exported JSON files
+
+Walks the top-level "items" array of fmc_<object type>.json and yields it
+in batches of decoded items, reading the file in fixed size chunks. Only
+one chunk and one batch are held in memory, so the *_to_csv.py converters
+can convert files of any size with flat memory use (--stream). Other
+top-level keys (links, paging) are skipped.
+
+Uses only the standard json decoder (raw_decode over the buffered text).
+
+Used by:
+    accessrules_to_csv.py, networks_to_csv.py, networkgroups_to_csv.py, portobjectgroups_to_csv.py, fmc_export.py
+"""
+
+__author__ = "Sasa Kovacic"
+__email__ = "sasa.kovacic@storm.hr"
+__version__ = "1.0"
+
+
+import json
+import time
+import fmc_trace
+
+CHUNK_SIZE = 1 << 20  # Characters read from the file at once
+BATCH_SIZE = 1000  # Items yielded at once, same as one FMC page
+
+_WHITESPACE = ' \t\n\r'
+
+
+class _Reader:
+    def __init__(self, file, chunk_size):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    # Function to read the next chunk, drops the consumed part of the buffer
+    def fill(self):
+        if self.eof:
+            return False
+        chunk = self.file.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    # Function to get the next character that is not whitespace, without consuming it
+    def peek(self):
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ''
+
+    # Function to consume one expected character
+    def expect(self, characters):
+        character = self.peek()
+        if not character or character not in characters:
+            raise ValueError(f"Expected one of {characters!r} at character {self.pos}, found {character!r}")
+        self.pos += 1
+        return character
+
+    # Function to decode the next JSON value, reads more until the value is complete
+    def value(self, decoder):
+        self.peek()
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.buffer, self.pos)
+                # A value that ends with the buffer (e.g. a number) may continue in the next chunk
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            if not self.fill():
+                continue  # End of file reached, decode once more and raise if still incomplete
+
+
+# Function to yield the items of the top-level "items" array in lists of batch_size
+def iter_json_items(json_file, batch_size=BATCH_SIZE, chunk_size=CHUNK_SIZE):
+    decoder = json.JSONDecoder()
+    with open(json_file, encoding='utf-8') as file:
+        reader = _Reader(file, chunk_size)
+        reader.expect('{')
+        if reader.peek() == '}':
+            raise KeyError('items')
+
+        while True:
+            key = reader.value(decoder)
+            reader.expect(':')
+            if key != 'items':
+                reader.value(decoder)  # Skip links, paging and other keys
+            else:
+                reader.expect('[')
+                batch = []
+                started = time.perf_counter()
+                if reader.peek() == ']':
+                    reader.pos += 1
+                else:
+                    while True:
+                        batch.append(reader.value(decoder))
+                        if len(batch) >= batch_size:
+                            fmc_trace.record('json batch', 'decode', started, items=len(batch))
+                            yield batch
+                            batch = []
+                            started = time.perf_counter()
+                        if reader.expect(',]') == ']':
+                            break
+                if batch:
+                    fmc_trace.record('json batch', 'decode', started, items=len(batch))
+                    yield batch
+                return
+            if reader.expect(',}') == '}':
+                raise KeyError('items')
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+
+"""
+Streaming fetch-to-CSV pipeline
+
+A producer thread pulls pages from the paging engine while the caller
+converts each page with the converter's extract_rows() and writes it to
+an open CSV writer. Network time and conversion time overlap and only a
+few pages are held in memory, no matter how large the export is. No
+intermediate JSON file is written.
+
+The CSV is written exactly as the *_to_csv.py converters write it with
+pandas (same columns, quoting and line endings).
+
+When the conversion or the write fails, the producer is told to stop: it
+closes the page iterator (its fetch pool and checkpoint are released) and
+ends instead of waiting on the full queue forever.
+
+Used by:
+    get_accessrules.py, get_networks.py, get_networkgroups.py, get_portobjectgroups.py (--csv), fmc_export.py
+"""
+
+__author__ = "Sasa Kovacic"
+__email__ = "sasa.kovacic@storm.hr"
+__version__ = "1.0"
+
+
+import os
+import csv
+import uuid
+import queue
+import threading
+import fmc_trace
+import fmc_progress
+from fmc_fetch import FetchError
+
+QUEUE_SIZE = 2  # Pages waiting for conversion while the next ones download
+PUT_TIMEOUT = 0.5  # Seconds between checks of the stop event while the queue is full
+
+_DONE = object()
+
+
+# Function to queue an item for the consumer, False when it stopped reading
+def _put(page_queue, item, stop):
+    while not stop.is_set():
+        try:
+            page_queue.put(item, timeout=PUT_TIMEOUT)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+# Function to run the page iterator in a producer thread, until it is done or stop is set
+def _produce(pages, page_queue, stop):
+    try:
+        for items in pages:
+            if not _put(page_queue, items, stop):
+                return
+        _put(page_queue, _DONE, stop)
+    except Exception as e:
+        _put(page_queue, e, stop)
+    finally:
+        # A generator can only be closed by the thread running it
+        if hasattr(pages, 'close'):
+            pages.close()
+
+
+# Function to drop the pages nobody will read
+def _drain(page_queue):
+    while True:
+        try:
+            page_queue.get_nowait()
+        except queue.Empty:
+            return
+
+
+# Function to write the header and rows with the same dialect pandas to_csv uses
+def open_csv_writer(file, columns):
+    writer = csv.writer(file, lineterminator=os.linesep, quoting=csv.QUOTE_MINIMAL)
+    writer.writerow(columns)
+    return writer
+
+
+# Function to convert pages into csv_file as they arrive, returns the row count, raises on failure
+def write_pages_to_csv(pages, extract_rows, columns, csv_file):
+    page_queue = queue.Queue(maxsize=QUEUE_SIZE)
+    stop = threading.Event()
+    producer = threading.Thread(target=fmc_progress.bind(fmc_trace.bind(_produce)), args=(pages, page_queue, stop), daemon=True)
+    producer.start()
+
+    # Write next to the target and move it into place only when complete, the name is unique per writer
+    part_file = f"{csv_file}.{uuid.uuid4().hex[:8]}.part"
+    row_count = 0
+    try:
+        with open(part_file, 'w', newline='', encoding='utf-8') as file:
+            writer = open_csv_writer(file, columns)
+            while True:
+                items = page_queue.get()
+                if items is _DONE:
+                    break
+                if isinstance(items, Exception):
+                    raise items
+                with fmc_trace.span('extract rows', 'extract', items=len(items)):
+                    rows = extract_rows(items, row_count)
+                with fmc_trace.span('write csv', 'write', rows=len(rows)):
+                    writer.writerows(rows)
+                row_count += len(items)
+        os.replace(part_file, csv_file)
+    finally:
+        # Stops a producer that is still fetching and waits until its page iterator is closed
+        stop.set()
+        _drain(page_queue)
+        producer.join()
+        if os.path.exists(part_file):
+            os.remove(part_file)
+
+    return row_count
+
+
+# Function to convert pages into csv_file as they arrive, returns the row count or None on failure
+def stream_to_csv(pages, extract_rows, columns, csv_file, object_name):
+    try:
+        row_count = write_pages_to_csv(pages, extract_rows, columns, csv_file)
+    except FetchError as e:
+        print(f"Failed to get {object_name}: {e}")
+        return None
+    except Exception as e:
+        print(f"An error occurred while saving to {csv_file}: {e}")
+        return None
+
+    print(f"Data has been exported to {csv_file}")
+    return row_count
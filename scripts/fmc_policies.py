@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+
+"""
+Discovery of FMC domains and access policies for multi-policy exports
+
+Domains and policies are either listed explicitly or discovered through
+the API ('all'):
+    FMC_DOMAIN_IDS: comma separated domain UUIDs or 'all', defaults to FMC_DOMAIN_ID
+    FMC_ACCESS_POLICY_IDS: comma separated policy IDs or 'all', defaults to FMC_ACCESS_POLICY_ID
+
+A child domain also lists the policies inherited from its ancestors, so a
+policy is exported only once, under the first domain it is seen in
+(Global comes first). Explicit policy IDs found in none of the domains are
+reported as failed, and policies whose names give the same file name get
+their ID appended.
+
+Used by:
+    fmc_export.py (export_policies)
+"""
+
+__author__ = "Sasa Kovacic"
+__email__ = "sasa.kovacic@storm.hr"
+__version__ = "1.0"
+
+
+import re
+import csv
+from fmc_fetch import iter_pages, FetchError
+from fmc_pipeline import open_csv_writer
+
+# Columns put in front of the access rule columns in the combined CSV
+POLICY_COLUMNS = ['Domain', 'Policy']
+
+
+# Function to read a comma separated id list, 'all' means discover through the API
+def parse_id_list(value, default=None):
+    value = (value or default or '').strip()
+    if value.lower() == 'all':
+        return 'all'
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def domains_url(protocol, hostname):
+    return f"{protocol}://{hostname}/api/fmc_platform/v1/info/domain?offset={{offset}}&limit={{limit}}"
+
+
+def accesspolicies_url(protocol, hostname, domain_id):
+    return f"{protocol}://{hostname}/api/fmc_config/v1/domain/{domain_id}/policy/accesspolicies?offset={{offset}}&limit={{limit}}"
+
+
+# Function to list domains as [{'id', 'name'}]
+def discover_domains(protocol, hostname, auth_token):
+    domains = []
+    for page in iter_pages(domains_url(protocol, hostname), auth_token):
+        domains.extend({'id': item['uuid'], 'name': item.get('name', item['uuid'])} for item in page)
+    return domains
+
+
+# Function to list access policies of a domain as [{'id', 'name'}]
+def discover_policies(protocol, hostname, domain_id, auth_token):
+    policies = []
+    for page in iter_pages(accesspolicies_url(protocol, hostname, domain_id), auth_token):
+        policies.extend({'id': item['id'], 'name': item.get('name', item['id'])} for item in page)
+    return policies
+
+
+# Function to get the (domain, policy) pairs to export
+def plan_targets(protocol, hostname, auth_token, domain_ids, policy_ids):
+    # Domain names are only cosmetic, explicit ids still work if the listing fails
+    try:
+        known_domains = discover_domains(protocol, hostname, auth_token)
+    except FetchError:
+        known_domains = []
+    if domain_ids == 'all':
+        domains = known_domains
+    else:
+        names = {domain['id']: domain['name'] for domain in known_domains}
+        domains = [{'id': domain_id, 'name': names.get(domain_id, domain_id)} for domain_id in domain_ids]
+
+    targets = []
+    seen = set()
+    for domain in domains:
+        policies = discover_policies(protocol, hostname, domain['id'], auth_token)
+        if policy_ids != 'all':
+            policies = [policy for policy in policies if policy['id'] in policy_ids]
+        for policy in policies:
+            if policy['id'] in seen:
+                continue  # Inherited from a parent domain, already planned there
+            seen.add(policy['id'])
+            targets.append({
+                'domain_id': domain['id'],
+                'domain_name': domain['name'],
+                'policy_id': policy['id'],
+                'policy_name': policy['name']
+            })
+
+    # Names that differ only in characters replaced by policy_filename() would overwrite each other
+    used = set()
+    for target in targets:
+        filename = policy_filename(target)
+        if filename.lower() in used:
+            filename = policy_filename(target, with_id=True)
+        used.add(filename.lower())
+        target['filename'] = filename
+    return targets
+
+
+# Function to list the explicitly requested policy ids that were found in none of the domains
+def missing_policies(targets, policy_ids):
+    if policy_ids == 'all':
+        return []
+    planned = {target['policy_id'] for target in targets}
+    return [policy_id for policy_id in policy_ids if policy_id not in planned]
+
+
+# Function to build a file name safe on every platform from the domain and policy names (and the policy id)
+def policy_filename(target, with_id=False):
+    name = f"{target['domain_name']}_{target['policy_name']}"
+    if with_id:
+        name = f"{name}_{target['policy_id']}"
+    return f"fmc_accessrules_{re.sub(r'[^A-Za-z0-9._-]+', '_', name).strip('_')}.csv"
+
+
+# Function to append per policy CSV files into one CSV with Domain and Policy columns
+def combine_policy_csvs(parts, columns, combined_file):
+    with open(combined_file, 'w', newline='', encoding='utf-8') as file:
+        writer = open_csv_writer(file, POLICY_COLUMNS + columns)
+        for target, csv_file in parts:
+            prefix = [target['domain_name'], target['policy_name']]
+            with open(csv_file, newline='', encoding='utf-8') as part:
+                reader = csv.reader(part)
+                next(reader, None)  # Skip the header of the per policy file
+                writer.writerows(prefix + row for row in reader)
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+"""
+Scheduled pre-warming of exports
+
+Optional in-process scheduler for the app: every FMC_PREWARM_MINUTES it
+exports the object types in FMC_PREWARM_TYPES to FMC_PREWARM_FORMAT, the
+same step as the "Get .csv" buttons. The exports are submitted to the
+shared job runner with the request key of those buttons, so a click while
+a pre-warm runs joins it, and a click after it finished gets the exported
+file right away: within FMC_FRESH_MINUTES as it is, later it is served
+while a new export revalidates it in the background (see fmc_jobs.py).
+
+Settings and token are read from .env on every run, a run without a token
+is skipped. Pre-warming is off while FMC_PREWARM_TYPES is empty.
+
+Used by:
+    app.py
+"""
+
+__author__ = "Sasa Kovacic"
+__email__ = "sasa.kovacic@storm.hr"
+__version__ = "1.0"
+
+
+import os
+import time
+import threading
+
+import fmc_jobs
+import fmc_export
+
+PREWARM_TYPES = [object_type.strip() for object_type in os.getenv('FMC_PREWARM_TYPES', '').split(',') if object_type.strip()]
+PREWARM_INTERVAL = float(os.getenv('FMC_PREWARM_MINUTES', '30')) * 60  # Seconds between two runs
+PREWARM_FORMAT = os.getenv('FMC_PREWARM_FORMAT', 'csv')
+
+
+# Function to export one object type as a job, its result line is shown like the buttons' one
+def _refresh(job, object_type, output_format):
+    result = fmc_export.export_csv(object_type, output_format=output_format)
+    job.update(message=fmc_export.describe_result(result))
+    return result
+
+
+class Prewarmer:
+    """Background thread submitting the pre-warm exports on an interval"""
+
+    def __init__(self, runner, object_types, interval=PREWARM_INTERVAL, output_format=PREWARM_FORMAT):
+        self.runner = runner
+        self.object_types = object_types
+        self.interval = interval
+        self.output_format = output_format
+        self.last_run = None
+        self.next_run = time.time()  # First run right after start
+        self.error = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name='fmc-prewarm', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.wait(max(0.0, self.next_run - time.time())):
+            try:
+                self.run_once()
+            except Exception as e:
+                # The schedule keeps running, the next run may succeed
+                self.error = f"{type(e).__name__}: {e}"
+                print(f"Pre-warm failed: {self.error}")
+            self.next_run = time.time() + self.interval
+
+    # Function to submit the export of every configured type, returns the jobs (running ones are joined)
+    def run_once(self):
+        self.last_run = time.time()
+        settings = fmc_export.load_settings()
+        if not settings.get('FMC_TOKEN'):
+            self.error = "No token found, please login first"
+            return []
+
+        self.error = None
+        jobs = []
+        for object_type in self.object_types:
+            key = fmc_export.request_key('export_csv', object_type, self.output_format, settings)
+            label = f"{fmc_export.OBJECT_TYPES[object_type][0]} to CSV (pre-warm)"
+            job, _, _ = self.runner.request(key, label, _refresh, object_type, self.output_format, max_age=fmc_jobs.FRESH_FOR)
+            jobs.append(job)
+        return jobs
+
+    # Function to get the finished time of the latest export of every type, None when there is none yet
+    def refreshed(self):
+        settings = fmc_export.load_settings()
+        refreshed = {}
+        for object_type in self.object_types:
+            job = self.runner.latest(fmc_export.request_key('export_csv', object_type, self.output_format, settings))
+            refreshed[object_type] = job.finished if job is not None else None
+        return refreshed
+
+
+# Function to start pre-warming with the settings from the environment, None when it is off
+def start(runner, object_types=None):
+    object_types = PREWARM_TYPES if object_types is None else object_types
+    unknown = [object_type for object_type in object_types if object_type not in fmc_export.OBJECT_TYPES]
+    if unknown:
+        print(f"Unknown object types in FMC_PREWARM_TYPES: {', '.join(unknown)}")
+    object_types = [object_type for object_type in object_types if object_type in fmc_export.OBJECT_TYPES]
+    if not object_types:
+        return None
+    return Prewarmer(runner, object_types).start()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+
+"""
+Live progress events of exports
+
+While a tracker is active the fetch layer publishes what it is doing:
+    pages and items planned from paging.count of the first page (fmc_fetch.py)
+    pages and items done, as they are handed out in order (fmc_fetch.py)
+    bytes received on the wire (fmc_client.py)
+    seconds paused after HTTP 429, and seconds the workers waited for the
+    shared rate limiter, 429 pauses included (fmc_client.py)
+After every event the callback gets a snapshot with items per second and
+an ETA, so a slow export shows whether it is throughput bound (items per
+second low, no waiting) or rate limited (waiting grows).
+
+Like fmc_trace.py a tracker belongs to the thread that started it, worker
+threads report into it when their function is wrapped with bind(). Several
+fetches in one tracker (Export all, All policies, the networks fetched for
+network groups) add up. Without an active tracker every event is a no-op.
+
+Used by:
+    fmc_jobs.py (one tracker per job), fmc_fetch.py, fmc_client.py, fmc_export.py
+"""
+
+__author__ = "Sasa Kovacic"
+__email__ = "sasa.kovacic@storm.hr"
+__version__ = "1.0"
+
+
+import time
+import threading
+
+_local = threading.local()
+
+
+class Progress:
+    """Counters of one tracked run, updated from any thread"""
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.started = time.monotonic()
+        self.pages_done = 0
+        self.pages_total = 0
+        self.items_done = 0
+        self.items_total = 0
+        self.unplanned = 0          # Fetches without paging.count, their size is unknown
+        self.bytes = 0
+        self.throttled = 0.0        # Seconds paused after HTTP 429
+        self.rate_wait = 0.0        # Seconds waiting for the shared rate limiter, added up over the workers
+        self._lock = threading.Lock()
+
+    # Function to apply a change to the counters and publish the new state
+    def _update(self, **changes):
+        with self._lock:
+            for key, value in changes.items():
+                setattr(self, key, getattr(self, key) + value)
+            event = self._snapshot()
+        if self.callback:
+            self.callback(event)
+
+    def _snapshot(self):
+        elapsed = time.monotonic() - self.started
+        rate = self.items_done / elapsed if elapsed > 0 else 0.0
+        known = self.pages_total > 0 and not self.unplanned
+        fraction = min(1.0, self.items_done / self.items_total) if known and self.items_total else None
+        remaining = max(0, self.items_total - self.items_done)
+        return {
+            'pages_done': self.pages_done,
+            'pages_total': self.pages_total if known else None,
+            'items_done': self.items_done,
+            'items_total': self.items_total if known else None,
+            'bytes': self.bytes,
+            'throttled': round(self.throttled, 1),
+            'rate_wait': round(self.rate_wait, 1),
+            'elapsed': round(elapsed, 1),
+            'items_per_second': round(rate, 1),
+            'fraction': fraction,
+            'eta': round(remaining / rate, 1) if fraction is not None and rate > 0 else None
+        }
+
+    def snapshot(self):
+        with self._lock:
+            return self._snapshot()
+
+
+# Function to get the tracker of the current thread, None when nothing is tracked
+def current():
+    return getattr(_local, 'progress', None)
+
+
+# Function to start tracking in this thread, callback(event) gets every new state
+def start(callback=None):
+    _local.progress = Progress(callback)
+    return _local.progress
+
+
+def finish():
+    _local.progress = None
+
+
+# Function to wrap func so it reports into the current tracker when run in another thread
+def bind(func):
+    progress = current()
+    if progress is None:
+        return func
+
+    def run(*args, **kwargs):
+        previous = current()
+        _local.progress = progress
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _local.progress = previous
+    return run
+
+
+# ----- Events -----
+
+# Function to add the pages and items of a fetch once paging.count is known, pages include the first one
+def planned(pages, items):
+    progress = current()
+    if progress is not None:
+        progress._update(pages_total=pages, items_total=items)
+
+
+# Function to mark a fetch whose total is unknown (no paging.count), the ETA is left out from then on
+def unplanned():
+    progress = current()
+    if progress is not None:
+        progress._update(unplanned=1)
+
+
+def page_done(items):
+    progress = current()
+    if progress is not None:
+        progress._update(pages_done=1, items_done=items)
+
+
+def received(size):
+    progress = current()
+    if progress is not None:
+        progress._update(bytes=size)
+
+
+def throttled(seconds):
+    progress = current()
+    if progress is not None:
+        progress._update(throttled=seconds)
+
+
+def rate_waited(seconds):
+    progress = current()
+    if progress is not None and seconds > 0:
+        progress._update(rate_wait=seconds)
+
+
+# Function to describe an event in one line, e.g. for a progress bar
+def format_event(event):
+    parts = []
+    if event['pages_total']:
+        parts.append(f"{event['pages_done']}/{event['pages_total']} pages")
+    elif event['pages_done']:
+        parts.append(f"{event['pages_done']} pages")
+    parts.append(f"{event['items_per_second']:,.0f} items/s")
+    parts.append(f"{event['bytes'] / 1048576:.1f} MB")
+    if event['throttled']:
+        parts.append(f"{event['throttled']:.0f} s paused by HTTP 429")
+    if event['rate_wait']:
+        parts.append(f"{event['rate_wait']:.0f} s waited for the rate limiter")
+    if event['eta'] is not None:
+        minutes, seconds = divmod(int(event['eta']), 60)
+        parts.append(f"ETA {minutes}:{seconds:02d}")
+    return ", ".join(parts)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+"""
+Process wide rate scheduler for the FMC REST API
+
+FMC allows 120 requests per minute per client and answers HTTP 429 once
+the budget is used up. Every request in the process takes a token from
+one shared bucket first, so concurrent fetches together stay inside the
+budget instead of each one tripping the limiter. The bucket holds a small
+burst and refills with the rest of the budget, so no 60 second window
+ever sees more than FMC_RATE_LIMIT requests.
+
+When FMC still answers 429, the delay is taken from Retry-After if present,
+otherwise exponential backoff with jitter, and the whole bucket is paused
+for that long so other threads back off too.
+
+Used by:
+    fmc_client.py
+"""
+
+__author__ = "Sasa Kovacic"
+__email__ = "sasa.kovacic@storm.hr"
+__version__ = "1.0"
+
+
+import os
+import time
+import random
+import threading
+from email.utils import parsedate_to_datetime
+
+RATE_LIMIT = int(os.getenv('FMC_RATE_LIMIT', '120'))   # Requests per minute allowed by FMC
+RATE_BURST = int(os.getenv('FMC_RATE_BURST', '10'))    # Requests that may go out back to back
+BACKOFF_BASE = 10    # Seconds of the first backoff without Retry-After
+BACKOFF_MAX = 120    # FMC resets its counter every minute, never wait longer than that
+
+
+class TokenBucket:
+    """Thread safe token bucket, tokens may go negative to queue waiters in order"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate            # Tokens added per second
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.total_wait = 0.0       # Seconds spent waiting for a token or a 429 pause
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    # Take one token, sleep until it is available, return seconds waited
+    def acquire(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            self.total_wait += wait
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    # Push every following request back by the given number of seconds
+    def pause(self, seconds):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+# Function to get the bucket shared by all requests of this process
+def get_limiter():
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            limit = max(1, RATE_LIMIT)
+            burst = max(1, min(RATE_BURST, limit - 1))
+            # Refill at least one token a minute, with FMC_RATE_LIMIT=1 the burst would otherwise leave a rate of 0
+            _limiter = TokenBucket(max(1, limit - burst) / 60, burst)
+    return _limiter
+
+
+# Function to read Retry-After, given either as seconds or as an HTTP date
+def parse_retry_after(value):
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+# Function to get how long to wait after HTTP 429
+def retry_delay(response, attempt):
+    delay = parse_retry_after(response.headers.get('Retry-After'))
+    if delay is not None:
+        return min(delay, BACKOFF_MAX)
+
+    # Equal jitter: half of the exponential step is fixed, half is random
+    step = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt)
+    return step / 2 + random.uniform(0, step / 2)
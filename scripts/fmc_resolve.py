@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+
+"""
+Flattens FMC network groups into the addresses they effectively cover
+
+Builds the group -> member graph from the networkgroups export and looks
+up plain network objects in the networks export. Every group is resolved
+to its literals plus the values of its network objects plus everything
+its nested groups resolve to, in member order without duplicates.
+
+Groups are resolved bottom up, one strongly connected component at a time
+(Tarjan), so a subgroup shared by many parents is resolved only once and
+a cycle (A -> B -> A) is detected instead of recursing forever. All groups
+of a cycle resolve to the same set.
+
+Members that cannot be looked up (hosts, ranges and FQDNs are not part of
+the networks export) keep their value when FMC sends one, else their name.
+
+Used by:
+    networkgroups_to_csv.py (Resolved Value column), fmc_export.py, get_networkgroups.py
+"""
+
+__author__ = "Sasa Kovacic"
+__email__ = "sasa.kovacic@storm.hr"
+__version__ = "1.0"
+
+
+# Function to get the graph key of a group or member reference, id with name as fallback
+def _key(obj):
+    return obj.get('id') or obj.get('name')
+
+
+# Function to build the graph: group key -> (members as (is group, value or group key), nested group keys)
+def build_graph(groups, networks=()):
+    group_keys = {}
+    for group in groups:
+        group_keys[_key(group)] = _key(group)
+        group_keys.setdefault(group.get('name'), _key(group))
+    network_values = {}
+    for network in networks:
+        value = network.get('value', network.get('name'))
+        network_values[network.get('id')] = value
+        network_values.setdefault(network.get('name'), value)
+
+    graph = {}
+    for group in groups:
+        # Literals first, then objects, the same order as the Value column
+        members = [(False, literal['value']) for literal in group.get('literals', [])]
+        subgroups = []
+        for obj in group.get('objects', []):
+            subgroup = group_keys.get(obj.get('id')) or (group_keys.get(obj.get('name')) if obj.get('type') == 'NetworkGroup' else None)
+            if subgroup is not None:
+                members.append((True, subgroup))
+                subgroups.append(subgroup)
+            else:
+                members.append((False, network_values.get(obj.get('id')) or network_values.get(obj.get('name')) or obj.get('value') or obj.get('name', '')))
+        graph[_key(group)] = (members, subgroups)
+    return graph
+
+
+# Function to split the graph into strongly connected components, dependencies first (iterative Tarjan)
+def _components(graph):
+    index = {}
+    lowlink = {}
+    stack = []
+    on_stack = set()
+    components = []
+    counter = 0
+
+    for root in graph:
+        if root in index:
+            continue
+        work = [(root, iter(graph[root][1]))]
+        index[root] = lowlink[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        while work:
+            node, children = work[-1]
+            for child in children:
+                if child not in index:
+                    index[child] = lowlink[child] = counter
+                    counter += 1
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(graph[child][1])))
+                    break
+                if child in on_stack:
+                    lowlink[node] = min(lowlink[node], index[child])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(component)
+    return components
+
+
+# Function to resolve every group, returns ({group key: dict of values in order}, [cycles as lists of group names])
+def resolve_groups(groups, networks=()):
+    graph = build_graph(groups, networks)
+    names = {_key(group): group.get('name', _key(group)) for group in groups}
+    resolved = {}
+    cycles = []
+    for component in _components(graph):
+        in_component = set(component)
+        if len(component) > 1 or component[0] in graph[component[0]][1]:
+            cycles.append([names[node] for node in reversed(component)])
+
+        # Nested groups outside the component are already resolved, dicts keep member order and merge in C
+        group_members = [member for node in reversed(component) for member in graph[node][0]
+                         if not member[0] or member[1] not in in_component]
+        if len(group_members) == 1 and group_members[0][0]:
+            values = resolved[group_members[0][1]]  # Plain wrapper of one group, share its values
+        else:
+            values = {}
+            for is_group, member in group_members:
+                if is_group:
+                    values.update(resolved[member])
+                else:
+                    values[member] = None
+        for node in component:
+            resolved[node] = values
+    return resolved, cycles
+
+
+# Function to get the resolved values of one group item
+def resolved_values(resolved, group):
+    return resolved.get(_key(group), {})
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+
+"""
+Local object store for delta sync of FMC objects
+
+Keeps the last exported objects keyed by id, together with the version
+seen in the non-expanded listing (metadata timestamp and last user, name
+and type). A sync pulls the cheap non-expanded listing, fetches full
+details only for new or changed ids, drops deleted ids (also the ones
+answered with 404 by their detail fetch, deleted after the listing) and
+keeps the listing order, so the *_to_csv.py converters can rebuild from
+the merged store.
+
+Only the metadata timestamp shows a changed value. When the listing has
+no timestamp for every object (most FMC versions leave metadata out of
+the non-expanded listing) the sync is a full expanded fetch, so it never
+serves stale values. A full expanded fetch is also done when there is no
+store yet, the store is older than FMC_SYNC_MAX_AGE hours or too many ids
+changed.
+
+Args:
+    state_file (str): /export/state/fmc_<object type>_state.json
+
+Used by:
+    fmc_export.py (Delta sync in app.py)
+"""
+
+__author__ = "Sasa Kovacic"
+__email__ = "sasa.kovacic@storm.hr"
+__version__ = "1.0"
+
+
+import os
+import json
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import fmc_trace
+import fmc_progress
+from fmc_fetch import iter_pages, fetch_json, FetchError, DEFAULT_WORKERS
+
+SYNC_MAX_AGE = float(os.getenv('FMC_SYNC_MAX_AGE', '24')) * 3600  # Seconds before a full refresh is forced
+DETAIL_FETCH_LIMIT = 200  # More changed ids than this are cheaper to get with a full expanded fetch
+
+
+# Function to read the store, empty store when the file is missing or broken
+def load_state(state_file):
+    try:
+        with open(state_file) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+# Function to write the store next to the target and move it into place
+def save_state(state_file, state):
+    os.makedirs(os.path.dirname(state_file), exist_ok=True)
+    part_file = f"{state_file}.{uuid.uuid4().hex[:8]}.part"
+    with open(part_file, 'w') as file:
+        json.dump(state, file)
+    os.replace(part_file, state_file)
+
+
+# Function to get the version of a listing entry, compared between syncs
+def listing_version(entry):
+    metadata = entry.get('metadata') or {}
+    return [
+        metadata.get('timestamp'),
+        (metadata.get('lastUser') or {}).get('name'),
+        entry.get('name'),
+        entry.get('type')
+    ]
+
+
+# Function to check if the listing shows value changes: every entry has a metadata timestamp
+def listing_versioned(listing):
+    return all((entry.get('metadata') or {}).get('timestamp') for entry in listing)
+
+
+# Function to get the full object, None when it was deleted since the listing
+def fetch_detail(url, auth_token):
+    try:
+        return fetch_json(url, auth_token)[0]
+    except FetchError as e:
+        if e.status == 404:
+            return None
+        raise
+
+
+# Function to check if the store can be used as a base for a delta sync
+def needs_full_refresh(state, source):
+    if not state.get('objects') or state.get('source') != source:
+        return True
+    return time.time() - state.get('full_refresh_at', 0) > SYNC_MAX_AGE
+
+
+# Function to bring the store up to date, returns (state, summary)
+def sync_objects(state, source, list_url, expanded_url, auth_token, max_workers=DEFAULT_WORKERS):
+    # Cheap listing with id, name and type of every object
+    listing = []
+    for page in iter_pages(list_url, auth_token, max_workers=max_workers):
+        listing.extend(page)
+    versions = {entry['id']: listing_version(entry) for entry in listing}
+
+    objects = state.get('objects', {}) if state.get('source') == source else {}
+    changed = [object_id for object_id, version in versions.items()
+               if object_id not in objects or objects[object_id]['version'] != version]
+    deleted = [object_id for object_id in objects if object_id not in versions]
+    versioned = listing_versioned(listing)
+    summary = {
+        'listed': len(listing),
+        'new': sum(1 for object_id in changed if object_id not in objects),
+        'changed': sum(1 for object_id in changed if object_id in objects),
+        'deleted': len(deleted),
+        'fetched': 0,
+        'versioned': versioned,
+        # Without timestamps a changed value looks unchanged, only a full fetch is current
+        'full_refresh': not versioned or needs_full_refresh(state, source) or len(changed) > DETAIL_FETCH_LIMIT
+    }
+
+    if summary['full_refresh']:
+        items = {}
+        for page in iter_pages(expanded_url, auth_token, max_workers=max_workers):
+            items.update((item['id'], item) for item in page)
+        summary['fetched'] = len(items)
+        state = {'source': source, 'full_refresh_at': time.time()}
+    else:
+        # Full details only for new or changed ids, one request per object
+        base_url = list_url.split('?')[0]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            details = list(executor.map(fmc_progress.bind(fmc_trace.bind(lambda object_id: fetch_detail(f"{base_url}/{object_id}", auth_token))), changed))
+        items = {item['id']: item for item in details if item is not None}
+        summary['fetched'] = len(items)
+        # Deleted between the listing and the detail fetch
+        for object_id, item in zip(changed, details):
+            if item is None:
+                del versions[object_id]
+                summary['new' if object_id not in objects else 'changed'] -= 1
+                summary['deleted'] += 1
+        items.update((object_id, objects[object_id]['item']) for object_id in versions if object_id not in items)
+        state = {'source': source, 'full_refresh_at': state['full_refresh_at']}
+
+    # Keep the listing order so the CSV matches a full export
+    state['synced_at'] = time.time()
+    state['order'] = [object_id for object_id in versions if object_id in items]
+    state['objects'] = {object_id: {'version': versions[object_id], 'item': items[object_id]} for object_id in state['order']}
+    return state, summary
+
+
+# Function to get the merged objects in listing order
+def state_items(state):
+    return [state['objects'][object_id]['item'] for object_id in state.get('order', [])]
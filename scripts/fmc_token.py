@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+
+"""
+Shared FMC token manager with automatic refresh
+
+FMC access tokens expire after 30 minutes. A token can be refreshed three
+times with its refresh token (POST /api/fmc_platform/v1/auth/refreshtoken
+with X-auth-access-token and X-auth-refresh-token), after that a new login
+is needed. One manager per process holds the current token pair:
+    - before a request, a token older than FMC_TOKEN_REFRESH_AFTER seconds
+      is refreshed first
+    - a request answered with 401 gets a refreshed token and is retried
+    - concurrent requests share one refresh: the first thread refreshes,
+      the others wait for the lock and continue with its token
+    - after the third refresh (or when refresh fails) it logs in again with
+      FMC_USERNAME/FMC_PASSWORD from .env when they are set
+    - when both fail, requests fail fast for FMC_TOKEN_RENEW_BACKOFF
+      seconds instead of each one trying again while holding the lock
+
+Callers keep passing the token they read from .env, every token the
+manager replaced maps to the current one. New tokens are saved to .env
+(FMC_TOKEN, FMC_REFRESH_TOKEN, FMC_TOKEN_ISSUED, FMC_TOKEN_REFRESHES), so
+the app and other processes continue with them instead of opening another
+FMC session. The headless CLI turns persist off and sets its own
+credentials, its tokens then stay in memory and .env is not used.
+
+Used by:
+    fmc_fetch.py (every page request), fmc_export.py (login), fmc_cli.py
+"""
+
+__author__ = "Sasa Kovacic"
+__email__ = "sasa.kovacic@storm.hr"
+__version__ = "1.0"
+
+
+import os
+import time
+import threading
+from urllib.parse import urlparse
+from dotenv import dotenv_values
+
+import get_token
+
+REFRESH_AFTER = float(os.getenv('FMC_TOKEN_REFRESH_AFTER', '1500'))  # Token age that triggers a refresh, FMC tokens expire after 1800 seconds
+MAX_REFRESHES = 3  # Refreshes FMC allows per login
+RENEW_BACKOFF = float(os.getenv('FMC_TOKEN_RENEW_BACKOFF', '60'))  # Seconds a failed refresh and login are not tried again
+
+
+class TokenManager:
+    """Current token pair of the process, refreshed by one thread at a time"""
+
+    def __init__(self):
+        self.access_token = None
+        self.refresh_token = None
+        self.issued = None          # time.time() of the login or last refresh, None when unknown
+        self.refreshes = 0
+        self.replaced = {}          # Old access token -> the token that replaced it
+        self.foreign = set()        # Tokens that are not from .env, passed through unchanged
+        self.loaded = False
+        self.persist = True         # Tokens come from and are saved to .env
+        self.credentials = None     # (username, password) for a new login, else FMC_USERNAME/FMC_PASSWORD from .env
+        self.failed_at = None       # time.monotonic() of the last failed renewal, None after a new token
+        self._lock = threading.Lock()
+
+    # Function to adopt the token pair saved in .env, when it is newer than ours
+    def _load_env(self):
+        self.loaded = True
+        if not self.persist:
+            return
+        settings = {key: value for key, value in dotenv_values(get_token.dotenv_path).items() if value is not None}
+        token = settings.get('FMC_TOKEN')
+        if token and token != self.access_token and token not in self.replaced:
+            if self.access_token:
+                self.replaced[self.access_token] = token
+            self.access_token = token
+            self.failed_at = None
+            self.refresh_token = settings.get('FMC_REFRESH_TOKEN') or None
+            issued = settings.get('FMC_TOKEN_ISSUED')
+            self.issued = float(issued) if issued else None
+            self.refreshes = int(settings.get('FMC_TOKEN_REFRESHES') or 0)
+
+    # Function to follow the replaced tokens to the current one
+    def _resolve(self, auth_token):
+        seen = set()
+        while auth_token in self.replaced and auth_token not in seen:
+            seen.add(auth_token)
+            auth_token = self.replaced[auth_token]
+        return auth_token
+
+    # Function to store a new token pair and save it to .env
+    def _store(self, access_token, refresh_token, refreshes):
+        if self.access_token and self.access_token != access_token:
+            self.replaced[self.access_token] = access_token
+        self.access_token = access_token
+        self.refresh_token = refresh_token
+        self.failed_at = None
+        self.issued = time.time()
+        self.refreshes = refreshes
+        if self.persist:
+            get_token.save_token_to_env(access_token, refresh_token, refreshes, self.issued)
+        return access_token
+
+    # Function to set the token pair of a new login
+    def login(self, access_token, refresh_token):
+        with self._lock:
+            self.loaded = True  # Newer than anything in .env
+            return self._store(access_token, refresh_token, 0)
+
+    # Function to get a new token from FMC: refresh while allowed, else log in again, None when both fail
+    def _renew(self, url):
+        if self.failed_at is not None and time.monotonic() - self.failed_at < RENEW_BACKOFF:
+            return None  # Failed a moment ago, FMC is not asked again for every request
+        parsed = urlparse(url)
+        if self.refresh_token and self.refreshes < MAX_REFRESHES:
+            tokens = get_token.refresh_auth_tokens(parsed.scheme, parsed.netloc, self.access_token, self.refresh_token)
+            if tokens:
+                print(f"Token refreshed ({self.refreshes + 1} of {MAX_REFRESHES})")
+                return self._store(tokens[0], tokens[1], self.refreshes + 1)
+
+        credentials = self.credentials
+        if credentials is None and self.persist:
+            settings = dotenv_values(get_token.dotenv_path)
+            credentials = (settings.get('FMC_USERNAME'), settings.get('FMC_PASSWORD'))
+        if credentials and credentials[0] and credentials[1]:
+            tokens = get_token.generate_auth_tokens(parsed.scheme, parsed.netloc, *credentials)
+            if tokens:
+                print("Logged in again, the token could not be refreshed")
+                return self._store(tokens[0], tokens[1], 0)
+        self.failed_at = time.monotonic()
+        print(f"Token could not be renewed, not trying again for {RENEW_BACKOFF:.0f} s")
+        return None
+
+    # Function to get the token to send instead of auth_token, refreshed first when it is about to expire
+    def token(self, auth_token, url):
+        with self._lock:
+            if auth_token in self.foreign:
+                return auth_token
+            if not self.loaded or (auth_token != self.access_token and auth_token not in self.replaced):
+                self._load_env()
+            current = self._resolve(auth_token)
+            if current != self.access_token:
+                self.foreign.add(auth_token)  # Not a token of this FMC login, e.g. passed on the command line
+                return auth_token
+            if self.issued is not None and time.time() - self.issued > REFRESH_AFTER:
+                return self._renew(url) or current
+            return current
+
+    # Function to replace a token FMC answered 401 to, returns the token to retry with or None
+    def renew(self, failed_token, url):
+        with self._lock:
+            self._load_env()
+            current = self._resolve(failed_token)
+            if current != failed_token:
+                return current  # Another request already refreshed it
+            if failed_token != self.access_token:
+                return None
+            return self._renew(url)
+
+
+_manager = TokenManager()
+
+
+def get_manager():
+    return _manager
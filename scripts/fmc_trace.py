@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+
+"""
+Per-phase timing traces of exports, in the Chrome trace-event format
+
+While a trace is active every phase of the export records a span:
+    http: one HTTP request (one page), waiting for FMC and downloading
+    rate_limit: waiting for the shared rate limiter (and 429 pauses)
+    decode: JSON decode (a response, json.load or a batch of a streamed file)
+    resolve: flattening network groups
+    extract: row extraction
+    frame: DataFrame build
+    write: to_csv, Parquet, Feather or JSON write
+The whole step is one more span of category export.
+
+A trace belongs to the thread that started it. Worker threads (paging
+engine, streaming pipeline) record into it when their function is wrapped
+with bind(). Without an active trace span() only checks a thread local, so
+the scripts run as before.
+
+The trace file opens in chrome://tracing or https://ui.perfetto.dev, and
+summarize() gives the per phase breakdown shown in the app.
+
+Used by:
+    fmc_export.py, fmc_client.py, fmc_fetch.py, fmc_pipeline.py, fmc_jsonstream.py, fmc_formats.py, *_to_csv.py, app.py
+"""
+
+__author__ = "Sasa Kovacic"
+__email__ = "sasa.kovacic@storm.hr"
+__version__ = "1.0"
+
+
+import os
+import glob
+import json
+import time
+import uuid
+import threading
+import contextlib
+from datetime import datetime
+
+PHASES = ['http', 'rate_limit', 'decode', 'resolve', 'extract', 'frame', 'write']
+TRACE_SUFFIX = '.trace.json'
+
+_local = threading.local()
+
+
+class Trace:
+    """Spans of one export step, recorded from any thread"""
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.perf_counter()
+        self.started_at = datetime.now().isoformat(timespec='seconds')
+        self.events = []
+        self.threads = {}
+        self._lock = threading.Lock()
+
+    # Function to add a complete span, start and end are time.perf_counter() values
+    def add(self, name, category, start, end, args=None):
+        thread = threading.current_thread()
+        event = {
+            'name': name,
+            'cat': category,
+            'ph': 'X',
+            'ts': round((start - self.started) * 1e6, 1),  # Microseconds since the trace started
+            'dur': round((end - start) * 1e6, 1),
+            'pid': os.getpid(),
+            'tid': thread.ident
+        }
+        if args:
+            event['args'] = args
+        with self._lock:
+            self.threads.setdefault(thread.ident, thread.name)
+            self.events.append(event)
+
+
+# Function to get the trace of the current thread, None when nothing is recorded
+def current():
+    return getattr(_local, 'trace', None)
+
+
+# Function to start a trace in this thread, None when one is already active (nested steps add to it)
+def start(name):
+    if current() is not None:
+        return None
+    _local.trace = Trace(name)
+    return _local.trace
+
+
+# Function to stop the trace and write it to trace_file, returns the file or None when it could not be written
+def finish(trace, trace_file=None, result=None):
+    _local.trace = None
+    ended = time.perf_counter()
+    trace.add(trace.name, 'export', trace.started, ended)
+    if trace_file is None:
+        return None
+
+    names = [{'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': tid, 'args': {'name': name}} for tid, name in trace.threads.items()]
+    document = {
+        'traceEvents': names + sorted(trace.events, key=lambda event: event['ts']),
+        'displayTimeUnit': 'ms',
+        'otherData': {'name': trace.name, 'started': trace.started_at, 'seconds': round(ended - trace.started, 3), 'result': result}
+    }
+    part_file = f"{trace_file}.{uuid.uuid4().hex[:8]}.part"
+    try:
+        with open(part_file, 'w') as file:
+            json.dump(document, file, default=str)
+        os.replace(part_file, trace_file)
+    except OSError as e:
+        print(f"An error occurred while saving the trace to {trace_file}: {e}")
+        return None
+    return trace_file
+
+
+# Function to record the block as a span, yields a dict the block can add span args to
+@contextlib.contextmanager
+def span(name, category, **args):
+    trace = current()
+    if trace is None:
+        yield args
+        return
+    started = time.perf_counter()
+    try:
+        yield args
+    finally:
+        trace.add(name, category, started, time.perf_counter(), args)
+
+
+# Function to record a span that started at started (time.perf_counter()) and ends now, for generators
+def record(name, category, started, **args):
+    trace = current()
+    if trace is not None:
+        trace.add(name, category, started, time.perf_counter(), args)
+
+
+# Function to wrap func so it records into the current trace when run in another thread
+def bind(func):
+    trace = current()
+    if trace is None:
+        return func
+
+    def run(*args, **kwargs):
+        previous = current()
+        _local.trace = trace
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _local.trace = previous
+    return run
+
+
+# ----- Reading traces -----
+
+def load_trace(trace_file):
+    with open(trace_file) as file:
+        return json.load(file)
+
+
+# Function to get the newest trace file in folder and its snapshot folders, None when there is none
+def latest_trace(folder):
+    files = glob.glob(os.path.join(folder, f"*{TRACE_SUFFIX}")) + glob.glob(os.path.join(folder, '*', f"*{TRACE_SUFFIX}"))
+    return max(files, key=os.path.getmtime) if files else None
+
+
+# Function to get the seconds covered by a list of (start, end) intervals, overlaps counted once
+def _covered(intervals):
+    total = 0.0
+    current_start = current_end = None
+    for start, end in sorted(intervals):
+        if current_end is None or start > current_end:
+            if current_end is not None:
+                total += current_end - current_start
+            current_start, current_end = start, end
+        else:
+            current_end = max(current_end, end)
+    if current_end is not None:
+        total += current_end - current_start
+    return total
+
+
+# Function to summarize a trace per phase: spans, busy seconds (all spans) and wall seconds (time any span ran)
+def summarize(document):
+    spans = [event for event in document['traceEvents'] if event.get('ph') == 'X']
+    total = sum(event['dur'] for event in spans if event['cat'] == 'export') / 1e6
+    rows = []
+    for phase in PHASES + sorted({event['cat'] for event in spans} - set(PHASES) - {'export'}):
+        phase_spans = [event for event in spans if event['cat'] == phase]
+        if not phase_spans:
+            continue
+        wall = _covered([(event['ts'] / 1e6, (event['ts'] + event['dur']) / 1e6) for event in phase_spans])
+        rows.append({
+            'Phase': phase,
+            'Spans': len(phase_spans),
+            'Busy (s)': round(sum(event['dur'] for event in phase_spans) / 1e6, 3),
+            'Wall (s)': round(wall, 3),
+            'Share of step': f"{wall / total:.0%}" if total else ''
+        })
+    return rows
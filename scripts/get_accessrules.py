@@ -19,13 +19,17 @@ __version__ = "1.0"
 
 
 import os
-import requests
+import argparse
 import json
-import time
+import fmc_client
 from dotenv import load_dotenv
+from fmc_fetch import fetch_all_items, iter_pages, DEFAULT_WORKERS
+from fmc_pipeline import stream_to_csv
+from accessrules_to_csv import extract_rows, COLUMNS
 
 # Load environment variables from the .env file
-load_dotenv()
+if os.getenv('FMC_DOTENV') != '0':  # The headless CLI reads only its own environment
+    load_dotenv()
 
 hostname = os.getenv('FMC_HOST')
 accesspolicy_id = os.getenv('FMC_ACCESS_POLICY_ID')
@@ -34,60 +38,22 @@ auth_token = os.getenv('FMC_TOKEN')  # Load the token generated by get_token.py
 
 protocol = "https"
 filename = "export/fmc_accessrules.json"
+csv_filename = "export/fmc_accessrules.csv"
+checkpoint_folder = "export/state/checkpoints"  # Pages of failed runs, a rerun continues from them
 
-import warnings
-from requests.packages.urllib3.exceptions import InsecureRequestWarning
-
-# Suppress only the single InsecureRequestWarning from urllib3 needed
-warnings.simplefilter('ignore', InsecureRequestWarning)
+# Function to build the paged list URL
+def accessrules_url(protocol, hostname, domain_id, accesspolicy_id):
+    return f"{protocol}://{hostname}/api/fmc_config/v1/domain/{domain_id}/policy/accesspolicies/{accesspolicy_id}/accessrules?expanded=True&offset={{offset}}&limit={{limit}}"
 
 # Function to get AccessRules from AccessPolicy with pagination and retry mechanism
-def get_accessrules(protocol, hostname, domain_id, accesspolicy_id, auth_token):
-    url_template = f"{protocol}://{hostname}/api/fmc_config/v1/domain/{domain_id}/policy/accesspolicies/{accesspolicy_id}/accessrules?expanded=True&offset={{offset}}&limit={{limit}}"
-    offset = 0
-    limit = 1000  # Number of items to return in each request
-    all_items = []
-    
-    while True:
-        url = url_template.format(offset=offset, limit=limit)
-        
-        # Define the headers
-        headers = {
-            'Content-Type': 'application/json',
-            'X-auth-access-token': auth_token # Use the token retrieved by get_token.py
-        }
-        
-        try:
-            # Make the GET request
-            response = requests.get(url, headers=headers, verify=False)
-            
-            # Check if the request was successful
-            if response.status_code == 200:
-                data = response.json()
-                items = data.get('items', [])
-                all_items.extend(items)
-                
-                if len(items) < limit:
-                    # If fewer items than limit are returned, this is the last page
-                    break
-                else:
-                    offset += limit  # Move to the next page
-            
-            elif response.status_code == 429:
-                print(f"Rate limit exceeded. Retrying in {sleep_time} seconds...")
-                sleep_time = 120
-                time.sleep(sleep_time)
-                
-            else:
-                #print(f"Failed to get access rules: {response.status_code}")
-                print("Failed to get access rules: token expired, please login again")
-                print(response.text)
-                return None
-        except requests.RequestException as e:
-            print(f"An error occurred: {e}")
-            return None
-    
-    return all_items
+def get_accessrules(protocol, hostname, domain_id, accesspolicy_id, auth_token, max_workers=DEFAULT_WORKERS):
+    url_template = accessrules_url(protocol, hostname, domain_id, accesspolicy_id)
+    return fetch_all_items(url_template, auth_token, "access rules", max_workers=max_workers, checkpoint_folder=checkpoint_folder)
+
+# Function to fetch access rules and convert each page straight to CSV
+def stream_accessrules_to_csv(protocol, hostname, domain_id, accesspolicy_id, auth_token, csv_filename, max_workers=DEFAULT_WORKERS):
+    pages = iter_pages(accessrules_url(protocol, hostname, domain_id, accesspolicy_id), auth_token, max_workers=max_workers, checkpoint_folder=checkpoint_folder)
+    return stream_to_csv(pages, extract_rows, COLUMNS, csv_filename, "access rules")
 
 # Function to save data to JSON
 def save_to_json(data, filename):
@@ -98,19 +64,28 @@ def save_to_json(data, filename):
     except Exception as e:
         print(f"An error occurred while saving to {filename}: {e}")
 
-def retrieve_and_save_accessrules(protocol, hostname, domain_id, accesspolicy_id, auth_token, filename):
+def retrieve_and_save_accessrules(protocol, hostname, domain_id, accesspolicy_id, auth_token, filename, max_workers=DEFAULT_WORKERS):
     # Get accessrules
-    access_rules = get_accessrules(protocol, hostname, domain_id, accesspolicy_id, auth_token)
+    access_rules = get_accessrules(protocol, hostname, domain_id, accesspolicy_id, auth_token, max_workers)
       
     if access_rules:
         print("Access Rules retrieved successfully.")
+        print(f"Received {fmc_client.format_stats()}")
         save_to_json({"items": access_rules}, filename)
     else:
         print("Failed to retrieve access rules.")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Number of pages requested from FMC at once")
+    parser.add_argument("--csv", action="store_true", help="Convert each page to CSV as it arrives, without the intermediate JSON file")
+    args = parser.parse_args()
+
     # Use the token loaded from the .env file
     if auth_token:
-        retrieve_and_save_accessrules(protocol, hostname, domain_id, accesspolicy_id, auth_token, filename)
+        if args.csv:
+            stream_accessrules_to_csv(protocol, hostname, domain_id, accesspolicy_id, auth_token, csv_filename, args.workers)
+        else:
+            retrieve_and_save_accessrules(protocol, hostname, domain_id, accesspolicy_id, auth_token, filename, args.workers)
     else:
         print("No token found. Please run get_token.py to generate a token.")
\ No newline at end of file
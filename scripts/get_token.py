@@ -7,7 +7,8 @@ Returns:
     Token: Generated access token
 
 Output File Format:
-    .env file: saves the token to the .env file under FMC_TOKEN
+    .env file: saves the token to the .env file under FMC_TOKEN, with the
+    refresh token, issue time and refresh count used by fmc_token.py
 """
 
 __author__ = "Sasa Kovacic"
@@ -16,16 +17,21 @@ __version__ = "1.0"
 
 
 import os
+import time
 import requests
 import base64
-from dotenv import load_dotenv
+import fmc_client
+from dotenv import load_dotenv, dotenv_values
 
 # Get the path to the root directory (assuming scripts are in a 'scripts' subfolder)
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 
-# Load environment variables from the .env file in the root directory
+# Load environment variables from the .env file in the root directory, not for the headless CLI (FMC_DOTENV=0)
 dotenv_path = os.path.join(project_root, '.env')
-load_dotenv(dotenv_path)
+dotenv_keys = set()  # Keys the .env added to the environment, they were not set by the caller
+if os.getenv('FMC_DOTENV') != '0':
+    dotenv_keys = {key for key in dotenv_values(dotenv_path) if key not in os.environ}
+    load_dotenv(dotenv_path)
 
 hostname = os.getenv('FMC_HOST')
 username = os.getenv('FMC_USERNAME')
@@ -33,34 +39,27 @@ password = os.getenv('FMC_PASSWORD')
 
 protocol = "https"
 
-# Suppress any SSL warnings
-import warnings
-from requests.packages.urllib3.exceptions import InsecureRequestWarning
-warnings.simplefilter('ignore', InsecureRequestWarning)
-
-# Function to generate auth token
-def generate_auth_token(protocol, hostname, username, password):
+# Function to generate auth token, returns (access token, refresh token) or None
+def generate_auth_tokens(protocol, hostname, username, password):
     url = f"{protocol}://{hostname}/api/fmc_platform/v1/auth/generatetoken"
     
     # Encode the credentials
     credentials = f"{username}:{password}"
     encoded_credentials = base64.b64encode(credentials.encode('utf-8')).decode('utf-8')
     
-    # Define the headers
+    # Define the headers, Content-Type comes from the shared session
     headers = {
-        'Content-Type': 'application/json',
         'Authorization': f'Basic {encoded_credentials}'
     }
     
     try:
-        # Make the POST request with SSL verification disabled
-        response = requests.post(url, headers=headers, verify=False)
+        # Make the POST request through the shared session (SSL verification disabled)
+        response = fmc_client.post(url, headers=headers)
         
         # Check if the request was successful
         if response.status_code == 204:
-            # Extract the token from the response headers
-            auth_token = response.headers.get('X-auth-access-token')
-            return auth_token
+            # Extract the tokens from the response headers
+            return response.headers.get('X-auth-access-token'), response.headers.get('X-auth-refresh-token')
         else:
             print(f"Failed to generate token: {response.status_code}")
             print(response.text)
@@ -69,41 +68,76 @@ def generate_auth_token(protocol, hostname, username, password):
         print(f"An error occurred: {e}")
         return None
 
-# Function to update or add the token in the .env file
-def save_token_to_env(token):
+# Function to generate auth token, returns only the access token
+def generate_auth_token(protocol, hostname, username, password):
+    tokens = generate_auth_tokens(protocol, hostname, username, password)
+    return tokens[0] if tokens else None
+
+# Function to refresh a token pair (FMC allows 3 refreshes per login), returns (access token, refresh token) or None
+def refresh_auth_tokens(protocol, hostname, auth_token, refresh_token):
+    url = f"{protocol}://{hostname}/api/fmc_platform/v1/auth/refreshtoken"
+    headers = {
+        'X-auth-access-token': auth_token,
+        'X-auth-refresh-token': refresh_token
+    }
+
+    try:
+        response = fmc_client.post(url, headers=headers)
+        if response.status_code == 204:
+            return response.headers.get('X-auth-access-token'), response.headers.get('X-auth-refresh-token') or refresh_token
+        print(f"Failed to refresh token: {response.status_code}")
+        print(response.text)
+        return None
+    except requests.RequestException as e:
+        print(f"An error occurred: {e}")
+        return None
+
+# Function to update or add variables in the .env file
+def save_values_to_env(values):
     try:
         # Read the current contents of the .env file
         with open(dotenv_path, 'r') as env_file:
             lines = env_file.readlines()
 
-        # Check if TOKEN exists, and replace it if necessary
-        token_updated = False
+        # Replace the existing variables, the last line may have no line break
+        pending = dict(values)
         with open(dotenv_path, 'w') as env_file:
             for line in lines:
-                if line.startswith("FMC_TOKEN="):
-                    # Replace the existing token
-                    env_file.write(f"FMC_TOKEN='{token}'\n")
-                    token_updated = True
+                key = line.split('=', 1)[0]
+                if '=' in line and key in pending:
+                    env_file.write(f"{key}='{pending.pop(key)}'\n")
                 else:
                     # Write other lines unchanged
-                    env_file.write(line)
-            
-            # If TOKEN was not found, append it
-            if not token_updated:
-                env_file.write(f"FMC_TOKEN='{token}'\n")
+                    env_file.write(line if line.endswith('\n') else f"{line}\n")
 
-        print(f"Token successfully saved to .env")
+            # Append the variables that were not found
+            for key, value in pending.items():
+                env_file.write(f"{key}='{value}'\n")
+        return True
     except Exception as e:
-        print(f"An error occurred while saving the token: {e}")
+        print(f"An error occurred while saving to .env: {e}")
+        return False
+
+# Function to update or add the token in the .env file, with its refresh token, issue time and refresh count
+def save_token_to_env(token, refresh_token='', refreshes=0, issued=None):
+    values = {
+        'FMC_TOKEN': token,
+        'FMC_REFRESH_TOKEN': refresh_token or '',
+        'FMC_TOKEN_ISSUED': f"{time.time() if issued is None else issued:.0f}",
+        'FMC_TOKEN_REFRESHES': str(refreshes)
+    }
+    if save_values_to_env(values):
+        print(f"Token successfully saved to .env")
 
 if __name__ == "__main__":
     # Step 1: Generate auth token
-    token = generate_auth_token(protocol, hostname, username, password)
+    tokens = generate_auth_tokens(protocol, hostname, username, password)
 
-    if token:
+    if tokens:
+        token, refresh_token = tokens
         print(f"Auth Token: {token}")
 
         # Step 2: Save the token to the .env file in the project root
-        save_token_to_env(token)
+        save_token_to_env(token, refresh_token)
     else:
         print("Failed to retrieve auth token.")
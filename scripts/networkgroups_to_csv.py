@@ -7,15 +7,22 @@ Converts fmc_networkgroups.json file to fmc_networkgroups.csv
 Args:
     input_file (str): /export/fmc_networkgroups.json
     output_file (str): /export/fmc_networkgroups.csv
+    networks_file (str): /export/fmc_networks.json, optional, used to resolve network objects to their value
+    --format (str): csv | parquet | feather, default csv
+    --stream: read the JSON items incrementally, flat memory use for very large files (csv only)
 
 Returns:
     None: This script doesn't return a value, but creates an output file.
 
 Input File Format:
     JSON file: fmc_networkgroups.json, file exported from FMC
+    JSON file: fmc_networks.json, file exported from FMC (optional)
 
 Output File Format:
-    CSV file: fmc_networkgroups.csv, CSV file with processed data
+    CSV file: fmc_networkgroups.csv, CSV file with processed data,
+              Resolved Value holds every address the group covers through nested groups
+    Parquet file: fmc_networkgroups.parquet, zstd compressed (--format parquet)
+    Feather file: fmc_networkgroups.feather, Arrow IPC for memory mapped reloads (--format feather)
 """
 
 __author__ = "Sasa Kovacic"
@@ -23,51 +30,96 @@ __email__ = "sasa.kovacic@storm.hr"
 __version__ = "1.0"
 
 
+import os
 import pandas as pd
 import json
+import argparse
+from fmc_formats import write_frame, output_path, FORMATS
+from fmc_jsonstream import iter_json_items
+from fmc_pipeline import write_pages_to_csv
+from fmc_trace import span
+from fmc_resolve import resolve_groups, resolved_values
 
 json_file = 'export/fmc_networkgroups.json'
 csv_file = 'export/fmc_networkgroups.csv'
+networks_file = 'export/fmc_networks.json'
 
-# Load the JSON data
-with open(json_file) as json_file:
-    data = json.load(json_file)
-
-# Initialize lists to store extracted values
-names = []
-values = []
-types = []
-overrides = []
-descriptions = []
-links = []
-
-# Extract the desired fields from each item
-for item in data['items']:
-    # Extract name, value, type, and other fields
-    names.append(item.get('name', ''))
-    types.append(item.get('type', ''))
-    overrides.append(item.get('overridable', ''))
-    descriptions.append(item.get('description', ''))
-    
+# Columns of the output CSV, in order
+COLUMNS = ['Object Name', 'Value', 'Resolved Value', 'Type', 'Override', 'Object Description', 'Link']
+
+# Low cardinality columns, dictionary encoded in Parquet and Feather
+DICTIONARY_COLUMNS = ['Type']
+
+# Extract name, value, type, and other fields from one item, resolved comes from resolve_groups()
+def extract_row(item, resolved=None):
     # For literals (if available), concatenate all values
     literal_values = [literal['value'] for literal in item.get('literals', [])]
     object_values = [obj['name'] for obj in item.get('objects', [])]
-    values.append(', '.join(literal_values + object_values))
-    
-    # Extract the 'self' link
-    links.append(item.get('links', {}).get('self', ''))
-
-# Create a DataFrame from the extracted data
-df = pd.DataFrame({
-    'Object Name': names,
-    'Value': values,
-    'Type': types,
-    'Override': overrides,
-    'Object Description': descriptions,
-    'Link': links
-})
-
-# Export DataFrame to CSV
-df.to_csv(csv_file, index=False)
-
-print(f"Data has been exported to {csv_file}")
+
+    return [
+        item.get('name', ''),
+        ', '.join(literal_values + object_values),
+        ', '.join(resolved_values(resolved, item)) if resolved is not None else '',
+        item.get('type', ''),
+        item.get('overridable', ''),
+        item.get('description', ''),
+        item.get('links', {}).get('self', '')  # Extract the 'self' link
+    ]
+
+# Extract rows from a list of items, start_index is kept for the common converter signature
+def extract_rows(items, start_index=0, resolved=None):
+    return [extract_row(item, resolved) for item in items]
+
+# Load the network objects used to resolve group members, empty when the file is missing
+def load_networks(networks_file):
+    if not networks_file or not os.path.exists(networks_file):
+        return []
+    return [item for items in iter_json_items(networks_file) for item in items]
+
+# Flatten every group into the addresses it covers, cycles are reported and resolved once
+def resolve(groups, networks):
+    resolved, cycles = resolve_groups(groups, networks)
+    for cycle in cycles:
+        print(f"Network group cycle: {' -> '.join(cycle + cycle[:1])}")
+    return resolved
+
+# Convert the exported JSON file to CSV (or Parquet/Feather), returns the number of rows
+def convert_networkgroups(json_file, csv_file, output_format='csv', stream=False, networks=None):
+    networks = [] if networks is None else networks
+    if stream:
+        # Batches of items are converted and written as they are read, the file is never loaded whole
+        if output_format != 'csv':
+            raise ValueError("Streaming mode writes CSV only")
+        # First pass keeps only the membership of each group, nested groups can be anywhere in the file
+        graph_keys = ('id', 'name', 'type', 'literals', 'objects')
+        groups = [{key: item[key] for key in graph_keys if key in item} for items in iter_json_items(json_file) for item in items]
+        with span('resolve groups', 'resolve', groups=len(groups)):
+            resolved = resolve(groups, networks)
+        del groups
+        return write_pages_to_csv(iter_json_items(json_file), lambda items, start_index: extract_rows(items, start_index, resolved), COLUMNS, csv_file)
+
+    # Load the JSON data
+    with span('json load', 'decode'):
+        with open(json_file) as file:
+            data = json.load(file)
+
+    # Create a DataFrame from the extracted data
+    with span('resolve groups', 'resolve', groups=len(data['items'])):
+        resolved = resolve(data['items'], networks)
+    with span('extract rows', 'extract'):
+        rows = extract_rows(data['items'], 0, resolved)
+    with span('DataFrame', 'frame', rows=len(rows)):
+        df = pd.DataFrame(rows, columns=COLUMNS)
+
+    # Export DataFrame to CSV, or next to it as .parquet/.feather
+    write_frame(df, csv_file, output_format, DICTIONARY_COLUMNS)
+    return len(df)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--format", choices=list(FORMATS), default='csv', help="Output format")
+    parser.add_argument("--stream", action='store_true', help="Read the JSON items incrementally (csv only)")
+    args = parser.parse_args()
+
+    convert_networkgroups(json_file, csv_file, args.format, args.stream, load_networks(networks_file))
+    print(f"Data has been exported to {output_path(csv_file, args.format)}")
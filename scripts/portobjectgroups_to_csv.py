@@ -7,6 +7,8 @@ Converts fmc_portobjectgroups.json file to fmc_portobjectgroups.csv
 Args:
     input_file (str): /export/fmc_portobjectgroups.json
     output_file (str): /export/fmc_portobjectgroups.csv
+    --format (str): csv | parquet | feather, default csv
+    --stream: read the JSON items incrementally, flat memory use for very large files (csv only)
 
 Returns:
     None: This script doesn't return a value, but creates an output file.
@@ -16,6 +18,8 @@ Input File Format:
 
 Output File Format:
     CSV file: fmc_portobjectgroups.csv, CSV file with processed data
+    Parquet file: fmc_portobjectgroups.parquet, zstd compressed (--format parquet)
+    Feather file: fmc_portobjectgroups.feather, Arrow IPC for memory mapped reloads (--format feather)
 """
 
 __author__ = "Sasa Kovacic"
@@ -24,50 +28,69 @@ __version__ = "1.0"
 
 
 import json
+import argparse
 import pandas as pd
+from fmc_formats import write_frame, output_path, FORMATS
+from fmc_jsonstream import iter_json_items
+from fmc_pipeline import write_pages_to_csv
+from fmc_trace import span
 
 json_file = 'export/fmc_portobjectgroups.json'
 csv_file = 'export/fmc_portobjectgroups.csv'
 
-# Load the JSON data
-with open(json_file) as json_file:
-    data = json.load(json_file)
-
-# Initialize lists to store extracted values
-names = []
-values = []
-types = []
-overrides = []
-descriptions = []
-links = []
-
-# Extract the desired fields from each item
-for item in data['items']:
-    # Extract name, value, type, and other fields
-    names.append(item.get('name', ''))
-    types.append(item.get('type', ''))
-    overrides.append(item.get('overridable', ''))
-    descriptions.append(item.get('description', ''))
-    
+# Columns of the output CSV, in order
+COLUMNS = ['Object Name', 'Value', 'Type', 'Override', 'Object Description', 'Link']
+
+# Low cardinality columns, dictionary encoded in Parquet and Feather
+DICTIONARY_COLUMNS = ['Type']
+
+# Extract name, value, type, and other fields from one item
+def extract_row(item):
     # For literals (if available), concatenate all values
     literal_values = [literal['value'] for literal in item.get('literals', [])]
     object_values = [obj['name'] for obj in item.get('objects', [])]
-    values.append(', '.join(literal_values + object_values))
-    
-    # Extract the 'self' link
-    links.append(item.get('links', {}).get('self', ''))
-
-# Create a DataFrame from the extracted data
-df = pd.DataFrame({
-    'Object Name': names,
-    'Value': values,
-    'Type': types,
-    'Override': overrides,
-    'Object Description': descriptions,
-    'Link': links
-})
-
-# Export DataFrame to CSV
-df.to_csv(csv_file, index=False)
-
-print(f"Data has been exported to {csv_file}")
+
+    return [
+        item.get('name', ''),
+        ', '.join(literal_values + object_values),
+        item.get('type', ''),
+        item.get('overridable', ''),
+        item.get('description', ''),
+        item.get('links', {}).get('self', '')  # Extract the 'self' link
+    ]
+
+# Extract rows from a list of items, start_index is kept for the common converter signature
+def extract_rows(items, start_index=0):
+    return [extract_row(item) for item in items]
+
+# Convert the exported JSON file to CSV (or Parquet/Feather), returns the number of rows
+def convert_portobjectgroups(json_file, csv_file, output_format='csv', stream=False):
+    if stream:
+        # Batches of items are converted and written as they are read, the file is never loaded whole
+        if output_format != 'csv':
+            raise ValueError("Streaming mode writes CSV only")
+        return write_pages_to_csv(iter_json_items(json_file), extract_rows, COLUMNS, csv_file)
+
+    # Load the JSON data
+    with span('json load', 'decode'):
+        with open(json_file) as file:
+            data = json.load(file)
+
+    # Create a DataFrame from the extracted data
+    with span('extract rows', 'extract'):
+        rows = extract_rows(data['items'])
+    with span('DataFrame', 'frame', rows=len(rows)):
+        df = pd.DataFrame(rows, columns=COLUMNS)
+
+    # Export DataFrame to CSV, or next to it as .parquet/.feather
+    write_frame(df, csv_file, output_format, DICTIONARY_COLUMNS)
+    return len(df)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--format", choices=list(FORMATS), default='csv', help="Output format")
+    parser.add_argument("--stream", action='store_true', help="Read the JSON items incrementally (csv only)")
+    args = parser.parse_args()
+
+    convert_portobjectgroups(json_file, csv_file, args.format, args.stream)
+    print(f"Data has been exported to {output_path(csv_file, args.format)}")